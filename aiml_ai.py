@@ -1,63 +1,222 @@
-import requests
-import random
+import os
+import json
+import asyncio
 
-# 🔑 Sua chave AIML API
-AIML_API_KEY = "2f2e19b9f82b41f98d33ce4ada84af58"
+import http_client
+from cache import TTLCache
 
-# ⚙️ Controle: False = legenda fake (teste) | True = AIML API
-USE_AIML = False  
+# 🔑 Chave AIML API (só via env)
+AIML_API_KEY = os.getenv("AIML_API_KEY")
+AIML_API_URL = os.getenv("AIML_API_URL", "https://api.aimlapi.com/v1/chat/completions")
+AIML_MODEL = os.getenv("AIML_MODEL", "gpt-4")
 
-def gerar_legenda_divertida(nome, preco, loja):
+# ⚙️ Controle: 0 = legenda fake (teste) | 1 = AIML API
+USE_AIML = os.getenv("USE_AIML", "0") == "1"
+if USE_AIML and not AIML_API_KEY:
+    print("⚠️ USE_AIML=1 sem AIML_API_KEY: usando a legenda de template")
+    USE_AIML = False
+
+# ===============================
+# CACHE, LOTE E PRAZO
+# ===============================
+# A legenda de um (loja, produto, preço) é gerada uma vez e fica em
+# cache. Pedidos que chegam juntos vão numa única chamada de completions
+# e, se a resposta passar do prazo, o usuário recebe a legenda de
+# template (a chamada continua e abastece o cache para a próxima vez).
+AIML_CAPTION_TTL = float(os.getenv("AIML_CAPTION_TTL", "86400"))
+AIML_DEADLINE = float(os.getenv("AIML_DEADLINE", "3"))
+AIML_TIMEOUT = float(os.getenv("AIML_TIMEOUT", "20"))
+AIML_BATCH_SIZE = int(os.getenv("AIML_BATCH_SIZE", "8"))
+AIML_BATCH_WAIT = float(os.getenv("AIML_BATCH_WAIT_MS", "50")) / 1000
+
+STORE_NAMES = {
+    "shopee": "Shopee",
+    "mercadolivre": "Mercado Livre",
+    "magalu": "Magalu",
+    "amazon": "Amazon",
+}
+
+_captions = TTLCache(
+    maxsize=int(os.getenv("AIML_CAPTION_CACHE_SIZE", "5000")),
+    ttl=AIML_CAPTION_TTL,
+)
+
+caption_stats = {
+    "requests": 0,
+    "batches": 0,
+    "errors": 0,
+    "deadline_fallbacks": 0,
+}
+
+
+def legenda_template(nome, preco, loja):
+    return f"🛒 {nome} na {loja} por {preco}! Aproveite essa oferta 😍"
+
+
+def _build_prompt(products):
+    lines = "\n".join(
+        f"{i}. Produto: {nome} | Preço: {preco} | Loja: {loja}"
+        for i, (nome, preco, loja) in enumerate(products, 1)
+    )
+    return (
+        f"Você é um social media criativo. Crie uma legenda divertida e curta (1-2 frases) "
+        f"para cada produto de venda online abaixo.\n\n"
+        f"{lines}\n\n"
+        f"Regras: Use emojis, estilo social media, sem hashtags, leve e engraçado. "
+        f"Responda só com um array JSON de {len(products)} strings, na mesma ordem."
+    )
+
+
+def _parse_captions(content: str, expected: int) -> list:
+    start, end = content.find("["), content.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("resposta sem array JSON")
+
+    captions = json.loads(content[start:end + 1])
+    if not isinstance(captions, list) or len(captions) != expected:
+        raise ValueError(f"esperava {expected} legendas, veio {len(captions)}")
+
+    return [c.strip() if isinstance(c, str) and c.strip() else None for c in captions]
+
+
+async def _complete_batch(products) -> list:
+    resp = await http_client.post(
+        AIML_API_URL,
+        headers={
+            "Authorization": f"Bearer {AIML_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": AIML_MODEL,
+            "messages": [{"role": "user", "content": _build_prompt(products)}],
+            "max_tokens": 80 * len(products),
+            "temperature": 0.9,
+            "top_p": 0.9
+        },
+        timeout=AIML_TIMEOUT,
+    )
+    resp.raise_for_status()
+
+    choice = (resp.json().get("choices") or [{}])[0]
+    content = (choice.get("message") or {}).get("content") or choice.get("text") or ""
+    return _parse_captions(content, len(products))
+
+
+class CaptionBatcher:
+    """
+    Junta pedidos por até AIML_BATCH_WAIT (ou AIML_BATCH_SIZE itens) e
+    manda numa única chamada. Pedidos iguais em andamento compartilham
+    o mesmo future.
+    """
+
+    def __init__(self, max_batch: int, max_wait: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._futures = {}
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+
+    def submit(self, key, product) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._queue.append((key, product))
+
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        caption_stats["batches"] += 1
+        try:
+            captions = await _complete_batch([product for _, product in batch])
+        except Exception as e:
+            print("Erro ao gerar legendas com AIML API:", e)
+            caption_stats["errors"] += 1
+            captions = [None] * len(batch)
+
+        for (key, _), caption in zip(batch, captions):
+            if caption:
+                _captions.set(key, caption)
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(caption)
+
+
+_batcher = CaptionBatcher(AIML_BATCH_SIZE, AIML_BATCH_WAIT)
+
+
+def start_caption(nome, preco, loja):
+    """
+    Dispara a geração sem esperar (ex.: logo após o parse, enquanto o
+    adapter ainda encurta o link); gerar_legenda_divertida reaproveita.
+    """
+    if USE_AIML and nome and _captions.get((loja, nome, preco)) is None:
+        _batcher.submit((loja, nome, preco), (nome, preco, loja))
+
+
+async def gerar_legenda_divertida(nome, preco, loja, deadline: float | None = None):
     """
     Gera uma legenda divertida.
     Se USE_AIML=False, retorna legenda fake sem chamar API.
     """
-    if not USE_AIML:
+    template = legenda_template(nome, preco, loja)
+    if not USE_AIML or not nome:
         # 🔹 Legenda fake para não gastar créditos durante os testes
-        return f"🛒 {nome} na {loja} por {preco}! Aproveite essa oferta 😍"
-    
-    # Se USE_AIML=True, usa a API normalmente
-    unique_id = random.randint(1000, 9999)  # garante unicidade por produto
-    prompt = (
-        f"Você é um social media criativo. Crie uma legenda divertida e curta (1-2 frases) "
-        f"para um produto de venda online, única para este produto.\n\n"
-        f"Produto: {nome}\nPreço: {preco}\nLoja: {loja}\nID: {unique_id}\n\n"
-        f"Regras: Use emojis, estilo social media, sem hashtags, leve e engraçado."
-    )
+        return template
+
+    key = (loja, nome, preco)
+    cached = _captions.get(key)
+    if cached is not None:
+        return cached
+
+    caption_stats["requests"] += 1
+    future = _batcher.submit(key, (nome, preco, loja))
 
     try:
-        response = requests.post(
-            "https://api.aimlapi.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {AIML_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-4",
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 120,
-                "temperature": 0.9,
-                "top_p": 0.9
-            }
+        caption = await asyncio.wait_for(
+            asyncio.shield(future),
+            AIML_DEADLINE if deadline is None else deadline,
         )
+    except asyncio.TimeoutError:
+        caption_stats["deadline_fallbacks"] += 1
+        return template
 
-        data = response.json()
-        print("🔍 DEBUG AIML:", data)
+    return caption or template
 
-        if "choices" in data and len(data["choices"]) > 0:
-            choice = data["choices"][0]
-            content = None
 
-            if "message" in choice and "content" in choice["message"]:
-                content = choice["message"]["content"]
-            elif "text" in choice:
-                content = choice["text"]
+async def add_ai_caption(result: dict, store: str):
+    """
+    Coloca result["ai_caption"] num resultado de scrape bem-sucedido.
+    """
+    if not USE_AIML or not isinstance(result, dict) or result.get("error"):
+        return
 
-            if content:
-                return content.strip()
+    nome = result.get("title") or result.get("name")
+    preco = result.get("price") or result.get("price_pix")
+    result["ai_caption"] = await gerar_legenda_divertida(
+        nome, preco, STORE_NAMES.get(store, store)
+    )
 
-        return f"Não perca este incrível {nome} da {loja}!"
 
-    except Exception as e:
-        print("Erro ao gerar legenda com AIML API:", e, response.text if 'response' in locals() else "")
-        return f"🔥 Promoção incrível de {nome} esperando por você!"
+def ai_caption_stats() -> dict:
+    return {**_captions.stats(), **caption_stats}
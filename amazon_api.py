@@ -1,7 +1,11 @@
-import httpx
-from bs4 import BeautifulSoup
 import re
 
+import http_client
+from block_detect import BlockedPage
+from ratelimit import CircuitOpenError
+from aiml_ai import start_caption
+from html_extract import xpath, has_class, parse_html, first, get_text
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                   "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -9,31 +13,68 @@ HEADERS = {
     "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
 }
 
+# Versão do extrator no cache de páginas: mude ao alterar parse_amazon_page
+PAGE_CACHE_TAG = "amazon-1"
 
-async def get_amazon_product_info(product_url: str):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(product_url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
+# Seletores (compilados no import)
+SELECTORS = {
+    "title": xpath("//h1[@id='title']"),
+    "price": xpath(f"//span[{has_class('a-price')}]"),
+    "price_offscreen": xpath(f".//span[{has_class('a-offscreen')}]"),
+    "old_price": xpath(f"//span[{has_class('a-text-price')}]"),
+}
+
+HI_RES_IMAGE = re.compile('"hiRes":"(.+?)"')
+
+
+def parse_amazon_page(html) -> dict:
+    doc = parse_html(html)
 
-        # Título (usando #title)
-        title_tag = soup.find("h1", {"id": "title"})
-        title = title_tag.text.strip() if title_tag else "Título não encontrado"
+    # Título (usando #title)
+    title_tag = first(doc, SELECTORS["title"])
+    title = get_text(title_tag).strip() if title_tag is not None else "Título não encontrado"
 
-        # Imagens (usando regex, mais robusto)
-        images = re.findall('"hiRes":"(.+?)"', resp.text)
-        image = images[0] if images else None
+    # Imagens (usando regex, mais robusto)
+    image_match = HI_RES_IMAGE.search(html)
+    image = image_match.group(1) if image_match else None
 
-        # Preço (com desconto, usando .a-price)
-        price_tag = soup.find("span", {"class": "a-price"})
-        price = price_tag.find("span", class_="a-offscreen").text.strip() if price_tag and price_tag.find("span", class_="a-offscreen") else None
+    # Preço (com desconto, usando .a-price)
+    price = None
+    price_tag = first(doc, SELECTORS["price"])
+    offscreen = first(price_tag, SELECTORS["price_offscreen"])
+    if offscreen is not None:
+        price = get_text(offscreen).strip()
 
-        # Preço antigo (se disponível)
-        old_price = None
-        old_price_tag = soup.find("span", {"class": "a-text-price"})
-        if old_price_tag:
-            old_price = old_price_tag.text.strip()
+    # Preço antigo (se disponível)
+    old_price = None
+    old_price_tag = first(doc, SELECTORS["old_price"])
+    if old_price_tag is not None:
+        old_price = get_text(old_price_tag).strip()
+
+    return {
+        "title": title,
+        "image": image,
+        "price": price,
+        "original_value": old_price,
+    }
+
+
+async def get_amazon_product_info(product_url: str):
+    try:
+        # fetch + parse (ou 304 do cache de páginas)
+        fields = await http_client.fetch_fields(
+            product_url,
+            lambda html, doc: parse_amazon_page(html),
+            store="amazon",
+            tag=PAGE_CACHE_TAG,
+            headers=HEADERS,
+            timeout=15
+        )
+        title = fields["title"]
+        image = fields["image"]
+        price = fields["price"]
+        old_price = fields["original_value"]
+        start_caption(title, price, "Amazon")
 
         # Monta caption no mesmo formato
         caption = f"📦 {title}\n"
@@ -43,9 +84,6 @@ async def get_amazon_product_info(product_url: str):
             caption += f"💰 {price}"
         else:
             caption += "💰 Preço não disponível"
-            
-            print(resp.text)  # Adicione antes de criar o BeautifulSoup
-        soup = BeautifulSoup(resp.text, 'html.parser')
 
         # Retorna os dados no formato esperado
         return {
@@ -56,7 +94,9 @@ async def get_amazon_product_info(product_url: str):
             "image": image,
             "url": product_url,
         }
-        
+
+    except (BlockedPage, CircuitOpenError):
+        raise
 
     except Exception as e:
         return {
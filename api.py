@@ -1,29 +1,161 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import hmac
 import json
+import time
+import asyncio
+import threading
 import traceback
+from collections import OrderedDict
 
-from product_info_router import get_product_info
+import http_client
+from cache import TTLCache
+from product_info_router import (
+    get_product_info,
+    get_products_info,
+    iter_products_info,
+    singleflight_stats,
+)
+from stores import store_for_url, ADAPTERS, WARMUP_URLS
+from url_resolver import resolver_stats
+from product_cache import product_cache_stats
+from aiml_ai import ai_caption_stats
+from ratelimit import governor_stats
+from block_detect import block_stats
+from page_cache import page_cache, page_cache_stats
+from scrape_log import (
+    ScrapeLog,
+    SCRAPE_LOG_ENABLED,
+    SCRAPE_LOG_COLLECTION,
+    SCRAPE_LOG_QUEUE,
+    SCRAPE_LOG_BATCH,
+    SCRAPE_LOG_INTERVAL,
+)
+import price_refresh
+import metrics
+from metrics import span
 
 # ===============================
-# FIREBASE INIT (RENDER SAFE)
+# FIREBASE INIT (RENDER SAFE, SOB DEMANDA)
 # ===============================
-if not firebase_admin._apps:
-    firebase_json = os.getenv("FIREBASE_SERVICE_ACCOUNT")
+# firebase_admin/google-cloud são pesados: só carregam na primeira
+# consulta ao Firestore, não no boot do worker.
+_db = None
+_db_lock = threading.Lock()
 
-    if not firebase_json:
-        raise Exception("FIREBASE_SERVICE_ACCOUNT não configurado")
 
-    cred_dict = json.loads(firebase_json)
-    cred = credentials.Certificate(cred_dict)
-    firebase_admin.initialize_app(cred)
+def get_db():
+    global _db
+    if _db is not None:
+        return _db
 
-db = firestore.client()
+    with _db_lock:
+        if _db is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
 
-app = FastAPI()
+            if not firebase_admin._apps:
+                firebase_json = os.getenv("FIREBASE_SERVICE_ACCOUNT")
+
+                if not firebase_json:
+                    raise Exception("FIREBASE_SERVICE_ACCOUNT não configurado")
+
+                cred_dict = json.loads(firebase_json)
+                cred = credentials.Certificate(cred_dict)
+                firebase_admin.initialize_app(cred)
+
+            _db = firestore.client()
+
+    return _db
+
+# ===============================
+# REGISTRO DE SCRAPES (WRITE-BEHIND)
+# ===============================
+# Todo produto raspado vai para o Firestore (dashboard) sem atrasar a
+# resposta: fila + WriteBatch em segundo plano (scrape_log.py).
+scrape_log = ScrapeLog(
+    get_db,
+    SCRAPE_LOG_COLLECTION,
+    SCRAPE_LOG_QUEUE,
+    SCRAPE_LOG_BATCH,
+    SCRAPE_LOG_INTERVAL,
+)
+
+# ===============================
+# TELEGRAM (WEBHOOK)
+# ===============================
+# Com TELEGRAM_WEBHOOK_URL definido o bot roda dentro da API: o Telegram
+# faz POST em /telegram/webhook e o update entra na mesma Application do
+# bot.py (sem segundo processo nem long polling). Sem
+# TELEGRAM_WEBHOOK_SECRET o modo webhook não liga: qualquer um poderia
+# mandar updates falsos para o endpoint.
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+
+_telegram = None
+
+
+async def start_telegram_webhook():
+    global _telegram
+    if not TELEGRAM_WEBHOOK_URL:
+        return
+    if not TELEGRAM_WEBHOOK_SECRET:
+        print("⚠️ TELEGRAM_WEBHOOK_URL sem TELEGRAM_WEBHOOK_SECRET: modo webhook desligado")
+        return
+
+    # python-telegram-bot só carrega quando o modo webhook está ligado
+    import bot
+
+    application = bot.build_application(updater=False)
+    await application.initialize()
+    await application.bot.set_webhook(
+        url=TELEGRAM_WEBHOOK_URL,
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        allowed_updates=["message"],
+    )
+    await application.start()
+    _telegram = application
+    print("🤖 Bot Telegram em modo webhook:", TELEGRAM_WEBHOOK_URL)
+
+
+async def stop_telegram_webhook():
+    global _telegram
+    if _telegram is None:
+        return
+
+    application, _telegram = _telegram, None
+    try:
+        await application.stop()
+        await application.shutdown()
+    except Exception as e:
+        print("⚠️ Erro ao encerrar bot Telegram:", e)
+
+# ===============================
+# LIFESPAN (POOL HTTP)
+# ===============================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.startup()
+    try:
+        await start_telegram_webhook()
+        if price_refresh.PRICE_REFRESH_ENABLED:
+            price_refresh.refresher.start()
+        if SCRAPE_LOG_ENABLED:
+            scrape_log.start()
+        yield
+    finally:
+        await price_refresh.refresher.stop()
+        await stop_telegram_webhook()
+        # flush do registro de scrapes antes de fechar o resto
+        await scrape_log.stop()
+        stop_shopee_config_watches()
+        await http_client.shutdown()
+        page_cache.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # ===============================
 # MODELS
@@ -32,25 +164,113 @@ class ScrapeRequest(BaseModel):
     url: str
     uid: str
 
+class BatchScrapeRequest(BaseModel):
+    urls: list[str]
+    uid: str
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+
 # ===============================
 # FIRESTORE - CONFIG SHOPEE
 # ===============================
+# Credenciais quase nunca mudam: ficam em cache por uid (inclusive
+# "sem config", com TTL menor) e um listener on_snapshot atualiza a
+# entrada assim que o documento muda no Firestore.
+SHOPEE_CONFIG_TTL = float(os.getenv("SHOPEE_CONFIG_TTL", "3600"))
+SHOPEE_CONFIG_NEGATIVE_TTL = float(os.getenv("SHOPEE_CONFIG_NEGATIVE_TTL", "60"))
+SHOPEE_CONFIG_MAX_WATCHES = int(os.getenv("SHOPEE_CONFIG_MAX_WATCHES", "500"))
+SHOPEE_CONFIG_WATCH = os.getenv("SHOPEE_CONFIG_WATCH", "1") == "1"
+
+_shopee_configs = TTLCache(
+    maxsize=int(os.getenv("SHOPEE_CONFIG_CACHE_SIZE", "10000")),
+    ttl=SHOPEE_CONFIG_TTL,
+)
+_shopee_watches = OrderedDict()
+_shopee_watches_lock = threading.Lock()
+
+
+def _shopee_config_ref(uid: str):
+    return (
+        get_db().collection("users")
+        .document(uid)
+        .collection("shopee")
+        .document("config")
+    )
+
+
+def _cache_shopee_config(uid: str, doc):
+    if doc is None or not doc.exists:
+        config = (None, None)
+        _shopee_configs.set(uid, config, ttl=SHOPEE_CONFIG_NEGATIVE_TTL)
+        return config
+
+    data = doc.to_dict()
+    config = (data.get("app_id"), data.get("secret"))
+    _shopee_configs.set(uid, config)
+    return config
+
+
+def _watch_shopee_config(uid: str, ref):
+    def on_change(docs, changes, read_time):
+        _cache_shopee_config(uid, docs[0] if docs else None)
+
+    with _shopee_watches_lock:
+        if uid in _shopee_watches:
+            _shopee_watches.move_to_end(uid)
+            return
+
+        _shopee_watches[uid] = ref.on_snapshot(on_change)
+
+        while len(_shopee_watches) > SHOPEE_CONFIG_MAX_WATCHES:
+            evicted, watch = _shopee_watches.popitem(last=False)
+            watch.unsubscribe()
+            # sem listener a entrada não acompanha mais o Firestore
+            _shopee_configs.pop(evicted)
+
+
+def _touch_shopee_watch(uid: str):
+    # uid em uso: listener vai para o fim da fila de despejo
+    with _shopee_watches_lock:
+        if uid in _shopee_watches:
+            _shopee_watches.move_to_end(uid)
+
+
+def stop_shopee_config_watches():
+    with _shopee_watches_lock:
+        while _shopee_watches:
+            _, watch = _shopee_watches.popitem()
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print("⚠️ Erro ao encerrar listener Shopee:", e)
+
+
+metrics.register_cache("resolver", resolver_stats)
+metrics.register_cache("product", product_cache_stats)
+metrics.register_cache("shopee_config", _shopee_configs.stats)
+metrics.register_cache("ai_caption", ai_caption_stats)
+metrics.register_cache("page", page_cache.stats)
+metrics.register_singleflight(singleflight_stats)
+
+
 def get_user_shopee_config(uid: str):
-    try:
-        ref = (
-            db.collection("users")
-            .document(uid)
-            .collection("shopee")
-            .document("config")
-        )
+    cached = _shopee_configs.get(uid)
+    if cached is not None:
+        if SHOPEE_CONFIG_WATCH:
+            _touch_shopee_watch(uid)
+        return cached
 
-        doc = ref.get()
+    try:
+        ref = _shopee_config_ref(uid)
+        config = _cache_shopee_config(uid, ref.get())
 
-        if not doc.exists:
-            return None, None
+        if SHOPEE_CONFIG_WATCH:
+            try:
+                _watch_shopee_config(uid, ref)
+            except Exception as e:
+                print("⚠️ Erro ao registrar listener Shopee:", e)
 
-        data = doc.to_dict()
-        return data.get("app_id"), data.get("secret")
+        return config
 
     except Exception as e:
         print("🔥 Erro ao buscar config Shopee:", e)
@@ -61,19 +281,36 @@ def get_user_shopee_config(uid: str):
 # ENDPOINT
 # ===============================
 @app.post("/scrape")
-def scrape(data: ScrapeRequest):
+async def scrape(data: ScrapeRequest, response: Response):
     if not data.url or not data.uid:
         return {
             "error": True,
             "message": "URL ou UID não informados"
         }
 
+    # ⏱️ tempos por etapa no header Server-Timing
+    timings = metrics.start_timings()
+    store = store_for_url(data.url)
+
     try:
-        url_lower = data.url.lower()
+        with span("total", store):
+            result = await _scrape(data, store)
+    finally:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
 
+    await scrape_log.record(data.uid, data.url, result)
+    return result
+
+
+async def _scrape(data: ScrapeRequest, store: str | None):
+    try:
         # 🔐 Shopee precisa de credenciais
-        if "shopee" in url_lower:
-            app_id, secret = get_user_shopee_config(data.uid)
+        if store == "shopee":
+            # Firestore é bloqueante: roda fora do event loop
+            with span("firestore", store):
+                app_id, secret = await asyncio.to_thread(
+                    get_user_shopee_config, data.uid
+                )
 
             if not app_id or not secret:
                 return {
@@ -81,14 +318,14 @@ def scrape(data: ScrapeRequest):
                     "message": "Configuração Shopee não encontrada"
                 }
 
-            return get_product_info(
+            return await get_product_info(
                 url=data.url,
                 app_id=app_id,
                 secret=secret
             )
 
         # 🟢 Mercado Livre / Amazon / Magalu
-        return get_product_info(url=data.url)
+        return await get_product_info(url=data.url)
 
     except Exception as e:
         print("🔥 Erro no scrape:", e)
@@ -97,3 +334,224 @@ def scrape(data: ScrapeRequest):
             "error": True,
             "message": "Erro interno ao processar produto"
         }
+
+
+def _batch_error(data: BatchScrapeRequest):
+    if not data.urls or not data.uid:
+        return {
+            "error": True,
+            "message": "URLs ou UID não informados"
+        }
+
+    if len(data.urls) > MAX_BATCH_SIZE:
+        return {
+            "error": True,
+            "message": f"Máximo de {MAX_BATCH_SIZE} links por lote"
+        }
+
+    return None
+
+
+async def _batch_shopee_config(data: BatchScrapeRequest):
+    # 🔐 Busca a config Shopee uma única vez para o lote inteiro
+    if any(store_for_url(url) == "shopee" for url in data.urls):
+        return await asyncio.to_thread(get_user_shopee_config, data.uid)
+    return None, None
+
+
+@app.post("/scrape/batch")
+async def scrape_batch(data: BatchScrapeRequest):
+    error = _batch_error(data)
+    if error:
+        return error
+
+    try:
+        app_id, secret = await _batch_shopee_config(data)
+
+        results = await get_products_info(
+            data.urls,
+            app_id=app_id,
+            secret=secret
+        )
+        for url, result in zip(data.urls, results):
+            await scrape_log.record(data.uid, url, result)
+        return {"results": results}
+
+    except Exception as e:
+        print("🔥 Erro no scrape em lote:", e)
+        traceback.print_exc()
+        return {
+            "error": True,
+            "message": "Erro interno ao processar lote"
+        }
+
+
+# ===============================
+# LOTE EM STREAMING (NDJSON / SSE)
+# ===============================
+# Cada resultado sai assim que a loja responde, com o índice do link no
+# pedido: {"index": i, "url": ..., "result": {...}}. NDJSON por padrão;
+# SSE com ?format=sse ou Accept: text/event-stream (fim: event "done").
+# Se o cliente desconectar, o que ainda está pendente é cancelado.
+async def _wait_disconnect(request: Request):
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _until_disconnected(request: Request, items):
+    """
+    Repassa os itens do gerador até o cliente desconectar; aí fecha o
+    gerador (cancelando o trabalho pendente) sem esperar o próximo item.
+    """
+    disconnected = asyncio.ensure_future(_wait_disconnect(request))
+    next_item = None
+    try:
+        while True:
+            next_item = asyncio.ensure_future(anext(items))
+            await asyncio.wait({next_item, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+
+            if not next_item.done():
+                print("🔌 Cliente desconectou do /scrape/stream")
+                return
+
+            try:
+                yield next_item.result()
+            except StopAsyncIteration:
+                return
+    finally:
+        disconnected.cancel()
+        # o gerador só fecha depois que o anext() em andamento sair
+        if next_item is not None and not next_item.done():
+            next_item.cancel()
+            await asyncio.gather(next_item, return_exceptions=True)
+        await items.aclose()
+
+
+def _stream_line(index: int, url: str, result, sse: bool) -> str:
+    payload = json.dumps(
+        {"index": index, "url": url, "result": result},
+        ensure_ascii=False,
+        default=str,
+    )
+    if sse:
+        return f"id: {index}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@app.post("/scrape/stream")
+async def scrape_stream(data: BatchScrapeRequest, request: Request, format: str | None = None):
+    error = _batch_error(data)
+    if error:
+        return error
+
+    sse = format == "sse" or (
+        format is None and "text/event-stream" in request.headers.get("accept", "")
+    )
+
+    try:
+        app_id, secret = await _batch_shopee_config(data)
+    except Exception as e:
+        print("🔥 Erro no scrape em streaming:", e)
+        traceback.print_exc()
+        return {
+            "error": True,
+            "message": "Erro interno ao processar lote"
+        }
+
+    async def body():
+        items = iter_products_info(data.urls, app_id=app_id, secret=secret)
+        async for index, result in _until_disconnected(request, items):
+            await scrape_log.record(data.uid, data.urls[index], result)
+            yield _stream_line(index, data.urls[index], result, sse)
+        if sse:
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.post("/telegram/webhook")
+async def telegram_webhook(request: Request):
+    if _telegram is None:
+        return Response(status_code=404)
+
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token") or ""
+    if not hmac.compare_digest(token.encode(), TELEGRAM_WEBHOOK_SECRET.encode()):
+        return Response(status_code=403)
+
+    from telegram import Update
+
+    update = Update.de_json(await request.json(), _telegram.bot)
+
+    # responde já: o scrape roda na Application (concurrent_updates)
+    await _telegram.update_queue.put(update)
+    return Response(status_code=200)
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "resolver_cache": resolver_stats(),
+        "product_cache": product_cache_stats(),
+        "singleflight": singleflight_stats(),
+        "streaming_fetch": http_client.stream_stats,
+        "page_cache": page_cache_stats(),
+        "scrape_log": scrape_log.stats(),
+        "ai_caption": ai_caption_stats(),
+        "price_refresh": price_refresh.price_refresh_stats(),
+        "hosts": governor_stats(),
+        "blocked_pages": block_stats(),
+        "shopee_config_cache": {
+            **_shopee_configs.stats(),
+            "watches": len(_shopee_watches),
+        },
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/price-changes")
+async def price_changes(limit: int = 50):
+    return {"events": price_refresh.recent_price_changes(limit)}
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.post("/warmup")
+async def warmup():
+    """
+    Pré-carrega adapters, Firestore e abre conexões com as lojas,
+    para o primeiro /scrape real não pagar esse custo.
+    """
+    started = time.perf_counter()
+
+    for adapter in ADAPTERS.values():
+        adapter.module
+
+    try:
+        await asyncio.to_thread(get_db)
+        firestore_ok = True
+    except Exception as e:
+        print("⚠️ Firestore indisponível no warmup:", e)
+        firestore_ok = False
+
+    hosts = await http_client.warmup(WARMUP_URLS)
+
+    return {
+        "firestore": firestore_ok,
+        "hosts": hosts,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
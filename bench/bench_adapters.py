@@ -0,0 +1,335 @@
+"""
+Benchmark offline dos adapters sobre o corpus de fixtures/.
+
+Mede, por adapter:
+  - tempo de parse (parse_*_page) e pico de memória alocada
+    (tracemalloc: só alocações Python, a árvore do libxml2 não entra)
+  - latência ponta a ponta de get_product_info contra o stub local
+    (caches zerados a cada rodada), sem e com o cache de páginas em
+    disco (o stub responde 304 e os campos saem do cache)
+e confere se a saída continua igual a fixtures/expected.json.
+
+Tempos não são comparados em ms absolutos (variam com a máquina e com
+a carga do momento): cada caso é medido logo depois de uma carga de
+referência fixa (lxml + json puros, sem código do app) e o que vai
+para baselines.json é a razão caso/referência: mediana das repetições
+e, depois, mediana de --passes rodadas completas (a mesma conta na
+gravação e na comparação). A tolerância de cada caso é a maior entre
+--tolerance e 3x a dispersão medida na própria execução.
+
+Uso:
+    python bench/bench_adapters.py              # compara com baselines.json
+    python bench/bench_adapters.py --update     # grava novas baselines
+"""
+import gc
+import os
+import sys
+import json
+import time
+import timeit
+import statistics
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+import httpx
+from lxml import etree
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# mede o adapter, não o rate limit por host
+os.environ.setdefault("HOST_GOVERNOR", "0")
+# cache de páginas num arquivo só do benchmark
+os.environ.setdefault(
+    "PAGE_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_pages_"), "pages.sqlite3")
+)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import http_client  # noqa: E402
+import page_cache  # noqa: E402
+import ml_api  # noqa: E402
+import magalu_api  # noqa: E402
+import amazon_api  # noqa: E402
+import product_info_router  # noqa: E402
+from product_cache import clear_product_cache  # noqa: E402
+from url_resolver import clear_resolver_cache  # noqa: E402
+from stub_server import app as stub_app, PAGES  # noqa: E402
+
+BASELINES_FILE = os.path.join(BENCH_DIR, "baselines.json")
+EXPECTED_FILE = os.path.join(BENCH_DIR, "fixtures", "expected.json")
+
+SHOPEE_APP_ID = "bench"
+SHOPEE_SECRET = "bench-secret"
+
+PARSE_CASES = {
+    "ml_product": lambda: ml_api.parse_ml_page(
+        PAGES["ml_product"], "https://www.mercadolivre.com.br/p/MLB53188187"
+    ),
+    "ml_sec": lambda: ml_api.parse_ml_page(
+        PAGES["ml_sec"], "https://www.mercadolivre.com.br/social/sec/2DeMaJG"
+    ),
+    "magalu_product": lambda: magalu_api.parse_magalu_page(PAGES["magalu_product"]),
+    "amazon_product": lambda: amazon_api.parse_amazon_page(PAGES["amazon_product"]),
+}
+
+E2E_CASES = {
+    "ml_product": "https://www.mercadolivre.com.br/bicicleta-ergometrica/p/MLB53188187",
+    "ml_sec": "https://mercadolivre.com/sec/2DeMaJG",
+    "magalu_product": "https://www.magazineluiza.com.br/smart-tv-50/p/237958700/",
+    "amazon_product": "https://amzn.to/3xYzAbc",
+    "shopee": "https://s.shopee.com.br/7fBq2Xyz9A",
+}
+
+# Campos aleatórios por natureza (legenda sorteada do Magalu)
+VOLATILE_KEYS = {"legend"}
+
+REPEAT = 7
+
+# Ruído (3 × dispersão) só alarga o limite até aqui; acima disso a medida
+# não serve para comparar: o caso é marcado como ruidoso (--fail-noisy falha).
+MAX_NOISE = 0.5
+
+
+class Timing:
+    """
+    Mediana de várias medidas (ms), dispersão relativa e a razão
+    contra a referência medida logo antes.
+    """
+
+    def __init__(self, samples: list[float], reference: float):
+        self.ms = round(statistics.median(samples), 3)
+        q1, _, q3 = statistics.quantiles(samples, n=4)
+        self.spread = (q3 - q1) / self.ms if self.ms else 0.0
+        self.reference = reference
+        self.ratio = round(self.ms / reference, 3)
+
+    @staticmethod
+    def median(passes: list["Timing"]) -> "Timing":
+        """
+        Rodada com a razão mediana; a dispersão inclui a variação entre rodadas.
+        """
+        passes = sorted(passes, key=lambda t: t.ratio)
+        middle = passes[len(passes) // 2]
+        if len(passes) > 2:
+            q1, _, q3 = statistics.quantiles([t.ratio for t in passes], n=4)
+            middle.spread = max(middle.spread, (q3 - q1) / middle.ratio)
+        return middle
+
+
+def _reference_work():
+    for html in PAGES.values():
+        etree.fromstring(html, etree.HTMLParser())
+    json.loads(json.dumps(PAGES))
+
+
+def reference_ms() -> float:
+    """
+    Carga fixa que só depende da máquina: mediana de REPEAT medidas.
+    """
+    timings = timeit.repeat(_reference_work, number=5, repeat=REPEAT)
+    return statistics.median(timings) / 5 * 1000
+
+
+def bench_parse(runs: int) -> tuple[dict, dict, dict]:
+    parse_ms, peak_kb, outputs = {}, {}, {}
+
+    for name, fn in PARSE_CASES.items():
+        outputs[name] = fn()
+
+        number = max(1, runs)
+        reference = reference_ms()
+        timings = timeit.repeat(fn, number=number, repeat=REPEAT)
+        parse_ms[name] = Timing([t / number * 1000 for t in timings], reference)
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_kb[name] = round(peak / 1024, 1)
+
+    return parse_ms, peak_kb, outputs
+
+
+async def bench_e2e(runs: int, revalidate: bool = False) -> tuple[dict, dict]:
+    """
+    revalidate: cache de páginas ligado (a rodada de aquecimento grava,
+    as medidas recebem 304). Desligado mede o download + parse completo.
+    """
+    await http_client.startup(transport=httpx.ASGITransport(app=stub_app))
+    page_cache.PAGE_CACHE_ENABLED = revalidate
+    await page_cache.page_cache.clear()
+
+    latency_ms, outputs = {}, {}
+
+    try:
+        for name, url in E2E_CASES.items():
+            reference = reference_ms()
+            timings = []
+            gc.disable()
+            for i in range(runs + 1):
+                clear_product_cache()
+                clear_resolver_cache()
+
+                started = time.perf_counter()
+                result = await product_info_router.get_product_info(
+                    url, app_id=SHOPEE_APP_ID, secret=SHOPEE_SECRET
+                )
+                if i:  # primeira rodada é aquecimento
+                    timings.append((time.perf_counter() - started) * 1000)
+            gc.enable()
+
+            outputs[name] = result
+            latency_ms[name] = Timing(timings, reference)
+    finally:
+        await http_client.shutdown()
+
+    return latency_ms, outputs
+
+
+def strip_volatile(outputs: dict) -> dict:
+    return {
+        name: {k: v for k, v in (value or {}).items() if k not in VOLATILE_KEYS}
+        for name, value in outputs.items()
+    }
+
+
+def compare(
+    section: str, current: dict, baseline: dict, tolerance: float
+) -> tuple[list[str], list[str]]:
+    """
+    current: Timing (razão contra a referência) ou número exato (memória).
+    Devolve (regressões, casos ruidosos).
+    """
+    regressions, noisy = [], []
+
+    for name, value in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        is_noisy = False
+        if isinstance(value, Timing):
+            noise = 3 * value.spread
+            is_noisy = noise > MAX_NOISE
+            limit = max(tolerance, min(noise, MAX_NOISE))
+            measured, shown = value.ratio, f"{value.ms} ms = {value.ratio}x ref"
+        else:
+            limit = tolerance
+            measured, shown = value, value
+
+        change = (measured - base) / base if base else 0.0
+        flag = "❌" if change > limit else "⚠️" if is_noisy else "  "
+        print(
+            f"{flag} {section:<13} {name:<16} {shown:>22} "
+            f"(baseline {base}, {change:+.0%}, limite {limit:.0%})"
+            + (f" ruído {value.spread:.0%}" if is_noisy else "")
+        )
+
+        if change > limit:
+            regressions.append(f"{section}/{name}")
+        if is_noisy:
+            noisy.append(f"{section}/{name}")
+
+    return regressions, noisy
+
+
+def _ratios(results: dict) -> dict:
+    return {
+        section: {
+            name: value.ratio if isinstance(value, Timing) else value
+            for name, value in current.items()
+        }
+        for section, current in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--passes", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update", action="store_true")
+    parser.add_argument("--fail-noisy", action="store_true")
+    args = parser.parse_args()
+
+    passes = []
+    for _ in range(max(1, args.passes)):
+        parse_ms, peak_kb, parse_outputs = bench_parse(args.runs)
+        e2e_ms, e2e_outputs = asyncio.run(bench_e2e(args.runs))
+        e2e_304_ms, e2e_304_outputs = asyncio.run(bench_e2e(args.runs, revalidate=True))
+        passes.append({"parse": parse_ms, "e2e": e2e_ms, "e2e_304": e2e_304_ms})
+
+    # tempos em múltiplos da referência; memória em KB
+    results = {
+        section: {
+            name: Timing.median([p[section][name] for p in passes])
+            for name in passes[0][section]
+        }
+        for section in passes[0]
+    }
+    results["parse_peak_kb"] = peak_kb
+    outputs = {
+        "parse": strip_volatile(parse_outputs),
+        "e2e": strip_volatile(e2e_outputs),
+    }
+
+    # com 304 o resultado tem que ser o mesmo do download completo
+    for name, value in strip_volatile(e2e_304_outputs).items():
+        if value != outputs["e2e"][name]:
+            print(f"❌ Saída diferente com cache de páginas em e2e/{name}")
+            print("   sem cache:", outputs["e2e"][name])
+            print("   com 304:  ", value)
+            sys.exit(1)
+
+    if args.update:
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(_ratios(results), f, indent=2)
+            f.write("\n")
+        with open(EXPECTED_FILE, "w") as f:
+            json.dump(outputs, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(json.dumps(_ratios(results), indent=2))
+        print("💾 Baselines e saídas esperadas atualizadas")
+        return
+
+    failed = False
+
+    with open(EXPECTED_FILE) as f:
+        expected = json.load(f)
+
+    for section in ("parse", "e2e"):
+        for name, value in outputs[section].items():
+            if expected[section].get(name) != value:
+                print(f"❌ Saída diferente em {section}/{name}")
+                print("   esperado:", expected[section].get(name))
+                print("   obtido:  ", value)
+                failed = True
+
+    with open(BASELINES_FILE) as f:
+        baselines = json.load(f)
+
+    regressions, noisy = [], []
+    for section, current in results.items():
+        found, unstable = compare(section, current, baselines.get(section, {}), args.tolerance)
+        regressions += found
+        noisy += unstable
+
+    if regressions:
+        print("❌ Regressões:", ", ".join(regressions))
+        failed = True
+
+    if noisy:
+        print(f"⚠️ Medidas ruidosas (limite travado em {MAX_NOISE:.0%}):", ", ".join(noisy))
+        if args.fail_noisy:
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+    print("✅ Sem regressões")
+
+
+if __name__ == "__main__":
+    main()
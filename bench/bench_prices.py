@@ -0,0 +1,221 @@
+"""
+Benchmark do módulo prices contra as funções de preço antigas
+(cópias fiéis abaixo: ml_api.normalize_price, magalu_api
+normalize_magalu_price e shopee_api.format_price).
+
+Gera um corpus grande de textos de preço no formato de cada loja
+(mais casos estranhos), confere que a saída é idêntica e compara o
+tempo.
+
+Uso:
+    python bench/bench_prices.py
+    python bench/bench_prices.py --size 500000 --seed 7
+"""
+import os
+import re
+import sys
+import random
+import timeit
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import prices  # noqa: E402
+
+
+# ===============================
+# VERSÕES ANTIGAS (REFERÊNCIA)
+# ===============================
+def legacy_normalize_price(value):
+    if not value:
+        return value
+
+    value = str(value).strip()
+    value = value.replace("R$", "").replace(" ", "")
+
+    dot_count = value.count(".")
+    comma_count = value.count(",")
+
+    if comma_count > 0 and dot_count > 0:
+        value = value.replace(".", "").replace(",", ".")
+    elif comma_count > 0:
+        value = value.replace(",", ".")
+    elif dot_count > 0:
+        if dot_count > 1:
+            value = value.replace(".", "")
+        else:
+            parts = value.split(".")
+            if len(parts) == 2 and len(parts[1]) == 2:
+                pass
+            elif len(parts) == 2 and len(parts[1]) == 3:
+                value = value.replace(".", "")
+            elif len(parts[0]) <= 3:
+                pass
+            else:
+                value = value.replace(".", "")
+
+    try:
+        num = float(value)
+        formatted = f"{num:,.2f}"
+        formatted = formatted.replace(",", "X").replace(".", ",").replace("X", ".")
+        return formatted
+    except:  # noqa: E722
+        return value
+
+
+def legacy_normalize_magalu_price(text):
+    if not text:
+        return text
+    text = re.sub(r"\s*,\s*", ",", text)
+    text = re.sub(r"R\$\s+", "R$ ", text)
+    return text.strip()
+
+
+def legacy_format_price(value):
+    try:
+        valor_float = float(value)
+        return f"R$ {valor_float:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except:  # noqa: E722
+        return None
+
+
+# ===============================
+# CORPUS
+# ===============================
+def brl(cents: int) -> str:
+    whole, frac = divmod(cents, 100)
+    return f"{whole:,}".replace(",", ".") + f",{frac:02d}"
+
+
+def ml_strings(rng: random.Random):
+    cents = rng.randrange(1, 5_000_000)
+    whole, frac = divmod(cents, 100)
+    return rng.choice([
+        f"{whole}.{frac:02d}",             # meta itemprop=price
+        f"{whole}.{frac % 10}",            # "48.9"
+        f"{whole}",                        # sem centavos
+        brl(cents),                        # "1.745,03"
+        f"R$ {brl(cents)}",
+        f"{whole:,}".replace(",", "."),    # milhar sem centavos
+        f"{whole},{frac:02d}",
+        str(cents / 100),                  # float do JSON-LD
+        f" R$ {brl(cents)} ",
+    ])
+
+
+def magalu_strings(rng: random.Random):
+    cents = rng.randrange(1, 5_000_000)
+    whole, frac = divmod(cents, 100)
+    return rng.choice([
+        f"R$ {whole:,} , {frac:02d}".replace(",", ".", whole >= 1000),
+        f"R$  {brl(cents)}",
+        f"R$ {whole} ,{frac:02d}",
+        f"  R$ {brl(cents)}  ",
+        f"R$ {brl(cents)}",
+    ])
+
+
+def shopee_values(rng: random.Random):
+    cents = rng.randrange(1, 5_000_000)
+    return rng.choice([
+        str(cents / 100),
+        f"{cents / 100:.2f}",
+        cents / 100,
+        cents // 100,
+        f"{rng.random() * 10_000:.5f}",    # mais de 2 casas: arredondamento
+        str(cents),
+    ])
+
+
+EDGE_CASES = [
+    None, "", 0, 0.0, "0", "-0.001", "abc", "R$", "1,234,567", "1.2.3,4",
+    "nan", "inf", "-inf", "1e3", "1_000", " 12.5 ", "0.125", "0.135", "2.675",
+    "12345678901234.56", "99999999999999999999", "1.", ".5", "+3", "-7,50",
+    " 12,50", 1e300, 10 ** 400, True, [1],
+]
+
+
+def build_corpus(size: int, seed: int):
+    rng = random.Random(seed)
+    return (
+        [ml_strings(rng) for _ in range(size)],
+        [magalu_strings(rng) for _ in range(size)],
+        [shopee_values(rng) for _ in range(size)],
+    )
+
+
+# ===============================
+# CONFERÊNCIA E TEMPO
+# ===============================
+def check(name, new, old, values) -> int:
+    mismatches = 0
+    for value in values:
+        try:
+            expected = old(value)
+        except Exception as e:
+            expected = e.__class__
+        try:
+            got = new(value)
+        except Exception as e:
+            got = e.__class__
+
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"   ❌ {name}({value!r}): {got!r} != {expected!r}")
+    return mismatches
+
+
+def best_of(fn, values, repeat) -> float:
+    return min(timeit.repeat(lambda: [fn(v) for v in values], number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do módulo prices")
+    parser.add_argument("--size", type=int, default=200_000, help="textos por loja")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ml, magalu, shopee = build_corpus(args.size, args.seed)
+    cases = [
+        ("normalize_price", prices.normalize_price, legacy_normalize_price, ml),
+        ("tidy_price_text", prices.tidy_price_text, legacy_normalize_magalu_price, magalu),
+        ("format_price", prices.format_price, legacy_format_price, shopee),
+    ]
+
+    failed = False
+    for name, new, old, values in cases:
+        edge = [v for v in EDGE_CASES if name != "tidy_price_text" or isinstance(v, str)]
+        mismatches = check(name, new, old, values + edge)
+        failed |= bool(mismatches)
+
+        old_s = best_of(old, values, args.repeat)
+        new_s = best_of(new, values, args.repeat)
+        status = "✅" if not mismatches else f"❌ {mismatches} divergências"
+        print(
+            f"{status} {name:<16} antigo {old_s * 1000:8.1f} ms | "
+            f"novo {new_s * 1000:8.1f} ms | {old_s / new_s:4.2f}x"
+        )
+
+    # Caminho de lote: todos os formatos -> centavos. Histórico de preço
+    # repete muito o mesmo texto: amostra com reposição de um pool menor.
+    # Em "distintos" parse_prices perde para o um a um (custo do dict):
+    # é o caso em que ele não deve ser usado.
+    pool = ml + magalu + shopee
+    rng = random.Random(args.seed)
+    history = rng.choices(rng.sample(pool, len(pool) // 20), k=len(pool))
+    for label, values in (("distintos", pool), ("histórico", history)):
+        single = best_of(prices.parse_price, values, args.repeat)
+        batch = min(timeit.repeat(lambda: prices.parse_prices(values), number=1, repeat=args.repeat))
+        print(
+            f"   parse_prices     {len(values)} itens {label}: {batch * 1000:.1f} ms "
+            f"(um a um: {single * 1000:.1f} ms)"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
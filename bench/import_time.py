@@ -0,0 +1,105 @@
+"""
+Benchmark de cold start.
+
+Mede `python -X importtime -c "import api"` (melhor de N execuções) e
+falha se o tempo passar do orçamento em import_budget.json ou se algum
+módulo pesado voltar a ser importado no boot.
+
+Uso:
+    python bench/import_time.py            # verifica
+    python bench/import_time.py --update   # grava o tempo atual + folga
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """
+    Retorna (ms cumulativos do módulo, módulos importados).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise SystemExit(f"❌ import {module} falhou")
+
+    cumulative_us = None
+    imported = set()
+
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name)
+        if name == module:
+            cumulative_us = int(match.group(2))
+
+    return cumulative_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    module = budget["module"]
+    timings = []
+    imported = set()
+
+    for _ in range(args.runs):
+        ms, imported = measure(module)
+        timings.append(ms)
+
+    best = min(timings)
+    print(f"⏱️ import {module}: {best:.1f} ms (melhor de {args.runs})")
+
+    if args.update:
+        budget["budget_ms"] = round(best * (1 + budget["slack"]), 1)
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"💾 Orçamento atualizado: {budget['budget_ms']} ms")
+        return
+
+    failed = False
+
+    if best > budget["budget_ms"]:
+        print(f"❌ Acima do orçamento de {budget['budget_ms']} ms")
+        failed = True
+
+    loaded = sorted(
+        name for name in imported
+        if name.split(".")[0] in budget["lazy_modules"]
+    )
+    if loaded:
+        print("❌ Módulos que deveriam carregar sob demanda:", ", ".join(loaded))
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+    print("✅ Dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Teste de carga da API (api:app) contra o stand-in local das lojas.
+
+Sobe dois processos uvicorn:
+  - bench/stub_server.py (lojas, encurtador, GraphQL Shopee)
+  - api:app com UPSTREAM_OVERRIDE apontando para o stand-in
+e dispara POST /scrape com N clientes concorrentes, reportando
+vazão, p50/p95/p99 e erros para cada nível de concorrência.
+
+Uso:
+    python bench/loadtest.py                              # 1, 8, 32 clientes
+    python bench/loadtest.py -c 4 -c 64 --duration 20
+    python bench/loadtest.py --latency-ms 150 --jitter-ms 50 --error-rate 0.02
+    python bench/loadtest.py --hot 0                      # todo link é inédito (sem cache)
+    python bench/loadtest.py --governor --error-rate 0.3  # rate limit/breaker por host ligados
+    python bench/loadtest.py --governor --block-rate 0.2  # páginas de captcha
+    python bench/loadtest.py --target http://127.0.0.1:8000   # API já rodando
+
+Shopee fica de fora do /scrape: exige config no Firestore por uid.
+"""
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import itertools
+import subprocess
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+UID = "loadtest"
+
+
+# ===============================
+# LINKS GERADOS
+# ===============================
+# {id} varia para controlar a taxa de acerto do cache de produto.
+URL_TEMPLATES = [
+    "https://www.mercadolivre.com.br/produto-bench/p/MLB{id}",
+    "https://mercadolivre.com/sec/B{id}",
+    "https://www.magazineluiza.com.br/produto-bench/p/{id}/",
+    "https://www.amazon.com.br/dp/B0{id:08d}",
+]
+
+
+def url_source(hot: int):
+    """
+    hot > 0: sorteia entre `hot` produtos por loja (cache quente).
+    hot = 0: cada link é inédito (mede o caminho completo de scrape).
+    """
+    counter = itertools.count(10_000_000)
+
+    def next_url():
+        template = random.choice(URL_TEMPLATES)
+        product_id = random.randrange(hot) + 1 if hot else next(counter)
+        return template.format(id=product_id)
+
+    return next_url
+
+
+# ===============================
+# PROCESSOS
+# ===============================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict, app_dir: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app,
+            "--app-dir", app_dir,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--log-level", "warning",
+        ],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"servidor não respondeu em {url}")
+
+
+# ===============================
+# CARGA
+# ===============================
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_level(target: str, concurrency: int, duration: float, next_url) -> dict:
+    latencies = []
+    errors = {}
+    deadline = time.monotonic() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, timeout=60, limits=limits) as client:
+
+        async def worker():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    resp = await client.post("/scrape", json={"url": next_url(), "uid": UID})
+                    body = resp.json()
+                    if resp.status_code != 200:
+                        kind = f"http {resp.status_code}"
+                    elif body.get("error"):
+                        kind = body.get("message", "erro")
+                    else:
+                        kind = None
+                except Exception as e:
+                    kind = e.__class__.__name__
+
+                latencies.append((time.perf_counter() - started) * 1000)
+                if kind:
+                    errors[kind] = errors.get(kind, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "errors": errors,
+    }
+
+
+def print_report(results: list[dict]):
+    print(f"{'conc':>5} {'reqs':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  erros")
+    for r in results:
+        errors = ", ".join(f"{k}: {v}" for k, v in r["errors"].items()) or "-"
+        print(
+            f"{r['concurrency']:>5} {r['requests']:>7} {r['rps']:>8} "
+            f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}  {errors}"
+        )
+
+
+async def configure_standin(standin: str, args):
+    async with httpx.AsyncClient() as client:
+        await client.post(f"{standin}/__config", json={
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "redirect_hops": args.redirect_hops,
+            "block_rate": args.block_rate,
+        })
+
+
+async def run(args):
+    processes = []
+    target = args.target
+
+    try:
+        if target is None:
+            standin_port, api_port = free_port(), free_port()
+            standin = f"http://127.0.0.1:{standin_port}"
+            target = f"http://127.0.0.1:{api_port}"
+
+            processes.append(start_server("stub_server:app", standin_port, {}, BENCH_DIR))
+            await wait_ready(f"{standin}/__health")
+            await configure_standin(standin, args)
+
+            processes.append(start_server("api:app", api_port, {
+                "UPSTREAM_OVERRIDE": standin,
+                "PRODUCT_CACHE_TTL": str(args.cache_ttl),
+                "HOST_GOVERNOR": "1" if args.governor else "0",
+                "SHOPEE_CONFIG_WATCH": "0",
+            }, ROOT_DIR))
+
+        await wait_ready(f"{target}/healthz")
+
+        next_url = url_source(args.hot)
+        results = []
+        for concurrency in args.concurrency:
+            print(f"▶️ {concurrency} clientes por {args.duration}s...")
+            results.append(await run_level(target, concurrency, args.duration, next_url))
+
+        print()
+        print_report(results)
+
+    finally:
+        for proc in processes:
+            proc.terminate()
+        for proc in processes:
+            proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do /scrape")
+    parser.add_argument("-c", "--concurrency", type=int, action="append",
+                        help="clientes concorrentes (repetível; padrão 1, 8, 32)")
+    parser.add_argument("--duration", type=float, default=10, help="segundos por nível")
+    parser.add_argument("--hot", type=int, default=50,
+                        help="produtos distintos por loja (0 = todos inéditos)")
+    parser.add_argument("--cache-ttl", type=float, default=600,
+                        help="PRODUCT_CACHE_TTL da API iniciada aqui")
+    parser.add_argument("--governor", action="store_true",
+                        help="liga o rate limit por host (mede a API com os limites reais)")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--redirect-hops", type=int, default=2)
+    parser.add_argument("--block-rate", type=float, default=0.0,
+                        help="fração de páginas de produto que viram captcha")
+    parser.add_argument("--target", help="URL de uma API já rodando (não sobe processos)")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or [1, 8, 32]
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Stand-in local das lojas, do encurtador e da Affiliate API da Shopee,
+servindo o corpus de fixtures/. Roteia pelo Host da requisição (ou pelo
+header X-Upstream-Host, quando a API roda com UPSTREAM_OVERRIDE), então
+os adapters usam as URLs reais sem alteração.
+
+Em processo (benchmarks):  httpx.ASGITransport(app=app)
+Como servidor (load test):  uvicorn stub_server:app --app-dir bench --port 8081
+
+Comportamento configurável por env ou POST /__config:
+  STANDIN_LATENCY_MS      latência média por resposta
+  STANDIN_JITTER_MS       variação uniforme (+/-) sobre a latência
+  STANDIN_ERROR_RATE      fração de respostas 503 (0.0 a 1.0)
+  STANDIN_REDIRECT_HOPS   tamanho da cadeia 302 dos links curtos
+  STANDIN_BLOCK_RATE      fração das páginas de produto trocadas por captcha
+  STANDIN_SHOPEE_APPS     app_id:secret,... aceitos pela GraphQL fake
+
+Páginas de produto saem com ETag e respondem 304 a If-None-Match.
+Também responde a AIML API (chat completions) com legendas fake.
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from starlette.routing import Route
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+PAGES = {
+    "ml_product": load_fixture("ml_product.html"),
+    "ml_sec": load_fixture("ml_sec.html"),
+    "magalu_product": load_fixture("magalu_product.html"),
+    "amazon_product": load_fixture("amazon_product.html"),
+}
+ETAGS = {name: '"%s"' % hashlib.md5(html.encode()).hexdigest()[:16] for name, html in PAGES.items()}
+SHOPEE_SHORTLINK = json.loads(load_fixture("shopee_shortlink.json"))
+SHOPEE_PRODUCT = json.loads(load_fixture("shopee_product.json"))
+
+# Links curtos -> destino (como os hosts de encurtamento reais)
+REDIRECTS = {
+    "mercadolivre.com": "https://www.mercadolivre.com.br{path}?matt_tool=bench",
+    "amzn.to": "https://www.amazon.com.br/dp/B09B8V1LZ3",
+    "s.shopee.com.br": "https://shopee.com.br/Kit-3-Camisetas-i.123456.987654321",
+    "shp.ee": "https://shopee.com.br/Kit-3-Camisetas-i.123456.987654321",
+}
+
+CONFIG = {
+    "latency_ms": float(os.getenv("STANDIN_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("STANDIN_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("STANDIN_ERROR_RATE", "0")),
+    "redirect_hops": int(os.getenv("STANDIN_REDIRECT_HOPS", "1")),
+    "block_rate": float(os.getenv("STANDIN_BLOCK_RATE", "0")),
+}
+
+# Página de robot check (200, pequena), como a da Amazon
+CAPTCHA_PAGE = (
+    "<!doctype html><html><head><title>Robot Check</title></head><body>"
+    "<form method=\"get\" action=\"/errors/validateCaptcha\">"
+    "<p>Type the characters you see in this image:</p>"
+    "<input name=\"field-keywords\"></form></body></html>"
+)
+
+SHOPEE_APPS = dict(
+    pair.split(":", 1)
+    for pair in os.getenv("STANDIN_SHOPEE_APPS", "bench:bench-secret").split(",")
+    if ":" in pair
+)
+SIGNATURE_MAX_SKEW = 600
+
+AUTHORIZATION = re.compile(
+    r"SHA256 Credential=([^,]+),\s*Timestamp=(\d+),\s*Signature=([0-9a-f]+)"
+)
+
+PROMPT_PRODUCT = re.compile(r"^\d+\. Produto: (.*) \| Preço: (.*) \| Loja: .*$", re.M)
+
+ALIAS = re.compile(r"(\w+)\s*:\s*(generateShortLink|productOfferV2)")
+
+
+def shopee_graphql_data(query: str) -> dict:
+    """
+    Responde documentos simples e com aliases (lote) a partir das fixtures.
+    """
+    aliases = ALIAS.findall(query)
+
+    if not aliases:
+        data = {}
+        if "generateShortLink" in query:
+            data.update(SHOPEE_SHORTLINK["data"])
+        if "productOfferV2" in query:
+            data.update(SHOPEE_PRODUCT["data"])
+        return data
+
+    return {
+        alias: (
+            SHOPEE_SHORTLINK["data"]["generateShortLink"]
+            if field == "generateShortLink"
+            else SHOPEE_PRODUCT["data"]["productOfferV2"]
+        )
+        for alias, field in aliases
+    }
+
+
+def check_signature(authorization: str, payload: bytes) -> str | None:
+    """
+    Mesma regra da API real: sha256(app_id + timestamp + payload + secret).
+    Retorna a mensagem de erro ou None se a assinatura confere.
+    """
+    match = AUTHORIZATION.fullmatch(authorization.strip())
+    if not match:
+        return "Invalid Authorization Header"
+
+    app_id, timestamp, signature = match.groups()
+    secret = SHOPEE_APPS.get(app_id)
+    if secret is None:
+        return "Invalid Credential"
+
+    if abs(time.time() - int(timestamp)) > SIGNATURE_MAX_SKEW:
+        return "Invalid Timestamp"
+
+    factor = f"{app_id}{timestamp}{payload.decode()}{secret}"
+    if hashlib.sha256(factor.encode()).hexdigest() != signature:
+        return "Invalid Signature"
+
+    return None
+
+
+def short_link_redirect(host: str, path: str) -> Response:
+    """
+    Cadeia de redirects no próprio host curto: /__hop/1/..., /__hop/2/...
+    até o destino final.
+    """
+    hop = 0
+    if path.startswith("/__hop/"):
+        _, _, hop_str, path = path.split("/", 3)
+        hop = int(hop_str)
+        path = "/" + path
+
+    if hop + 1 < CONFIG["redirect_hops"]:
+        return RedirectResponse(f"https://{host}/__hop/{hop + 1}{path}", status_code=302)
+
+    return RedirectResponse(REDIRECTS[host].format(path=path), status_code=302)
+
+
+def fake_completion(prompt: str) -> dict:
+    """
+    Completions fake: uma legenda por linha "N. Produto: ... | Preço: ..."
+    do prompt, no formato de array JSON que o aiml_ai pede.
+    """
+    captions = [
+        f"😂 {name} por {price}? Corre antes que acabe! 🏃"
+        for name, price in PROMPT_PRODUCT.findall(prompt)
+    ]
+    return {"choices": [{"message": {"role": "assistant", "content": json.dumps(captions, ensure_ascii=False)}}]}
+
+
+def product_page(request: Request, name: str) -> Response:
+    etag = ETAGS[name]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"etag": etag})
+    return HTMLResponse(PAGES[name], headers={"etag": etag})
+
+
+async def admin(request: Request) -> Response:
+    if request.url.path == "/__config" and request.method == "POST":
+        CONFIG.update(await request.json())
+    return JSONResponse(CONFIG)
+
+
+async def handle(request: Request) -> Response:
+    host = request.headers.get("x-upstream-host") or request.url.hostname or ""
+    path = request.url.path
+
+    if path.startswith("/__") and not path.startswith("/__hop/"):
+        return await admin(request)
+
+    delay = CONFIG["latency_ms"] + random.uniform(-1, 1) * CONFIG["jitter_ms"]
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+    if CONFIG["error_rate"] and random.random() < CONFIG["error_rate"]:
+        return Response("Service Unavailable", status_code=503)
+
+    if host in REDIRECTS:
+        return short_link_redirect(host, path)
+
+    if host == "open-api.affiliate.shopee.com.br":
+        payload = await request.body()
+        error = check_signature(request.headers.get("authorization", ""), payload)
+        if error:
+            return JSONResponse({"errors": [{"message": error, "extensions": {"code": 10020}}]})
+
+        body = json.loads(payload)
+        return JSONResponse({"data": shopee_graphql_data(body.get("query", ""))})
+
+    if host == "api.aimlapi.com":
+        body = await request.json()
+        return JSONResponse(fake_completion(body["messages"][-1]["content"]))
+
+    if host == "api.encurtador.dev":
+        return JSONResponse({"urlEncurtada": "https://encurtador.dev/bench01"}, status_code=201)
+
+    if CONFIG["block_rate"] and random.random() < CONFIG["block_rate"] and (
+        host.endswith(("mercadolivre.com.br", "magazinevoce.com.br",
+                       "magazineluiza.com.br", "amazon.com.br"))
+    ):
+        return HTMLResponse(CAPTCHA_PAGE)
+
+    if host.endswith("mercadolivre.com.br"):
+        return product_page(request, "ml_sec" if "/sec/" in path else "ml_product")
+
+    if host.endswith("magazinevoce.com.br") or host.endswith("magazineluiza.com.br"):
+        return product_page(request, "magalu_product")
+
+    if host.endswith("amazon.com.br"):
+        return product_page(request, "amazon_product")
+
+    if host.endswith("shopee.com.br"):
+        return HTMLResponse("<html><head><title>Shopee</title></head></html>")
+
+    return Response("not found", status_code=404)
+
+
+app = Starlette(routes=[
+    Route("/{path:path}", handle, methods=["GET", "POST", "HEAD"]),
+])
@@ -0,0 +1,85 @@
+import os
+from collections import Counter
+
+from metrics import BLOCKED_PAGES
+
+# ===============================
+# DETECÇÃO DE PÁGINA BLOQUEADA
+# ===============================
+# Captcha / robot check / WAF chegam como página "normal" (às vezes 200):
+# antes de parsear, olha o status, o tamanho e alguns marcadores nos
+# primeiros bytes. Página bloqueada vira BlockedPage (erro "blocked"),
+# conta por host e avisa o governador para segurar o ritmo.
+
+BLOCK_SNIFF_BYTES = int(os.getenv("BLOCK_SNIFF_BYTES", "32768"))
+BLOCK_MIN_PAGE_BYTES = int(os.getenv("BLOCK_MIN_PAGE_BYTES", "4096"))
+
+BLOCK_STATUS = {
+    403: "forbidden",
+    429: "rate_limited",
+}
+
+# Trechos que só aparecem em páginas de bloqueio
+BLOCK_MARKERS = [
+    (b"/errors/validateCaptcha", "captcha"),          # Amazon
+    (b"opfcaptcha.amazon", "captcha"),                # Amazon
+    (b"<title>Robot Check</title>", "captcha"),      # Amazon
+    (b"/gz/account-verification", "captcha"),         # Mercado Livre
+    (b"px-captcha", "captcha"),                       # PerimeterX
+    (b"_Incapsula_Resource", "waf"),                  # Imperva
+    (b"<title>Access Denied</title>", "waf"),         # Akamai
+    (b"Attention Required! | Cloudflare", "waf"),
+    (b"cf-chl-", "waf"),                              # Cloudflare challenge
+]
+
+blocked_counts = Counter()
+
+
+class BlockedPage(Exception):
+    def __init__(self, host: str, reason: str):
+        super().__init__(f"{host} bloqueou o acesso ({reason})")
+        self.host = host
+        self.reason = reason
+
+
+def classify(status: int, content_length: int | None, head: bytes, url: str = "") -> str | None:
+    """
+    Motivo do bloqueio ou None. head: primeiros bytes do corpo;
+    url: URL final (redirect para a página de captcha).
+    """
+    reason = BLOCK_STATUS.get(status)
+    if reason:
+        return reason
+
+    sniff = head[:BLOCK_SNIFF_BYTES] + url.encode()
+    for marker, marker_reason in BLOCK_MARKERS:
+        if marker in sniff:
+            return marker_reason
+
+    if status == 200 and content_length is not None and content_length < BLOCK_MIN_PAGE_BYTES:
+        return "tiny_page"
+
+    return None
+
+
+def record_block(host: str, reason: str) -> BlockedPage:
+    blocked_counts[(host, reason)] += 1
+    BLOCKED_PAGES.labels(host, reason).inc()
+    print(f"🧱 Página bloqueada em {host}: {reason}")
+    return BlockedPage(host, reason)
+
+
+def blocked_error(e: BlockedPage) -> dict:
+    return {
+        "error": True,
+        "code": "blocked",
+        "message": "A loja bloqueou a consulta agora (captcha). Tente de novo em alguns minutos.",
+        "reason": e.reason,
+    }
+
+
+def block_stats() -> dict:
+    stats = {}
+    for (host, reason), count in blocked_counts.items():
+        stats.setdefault(host, {})[reason] = count
+    return stats
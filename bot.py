@@ -1,4 +1,7 @@
+import os
+import re
 import asyncio
+import weakref
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
@@ -8,35 +11,80 @@ from telegram.ext import (
 )
 
 from product_info_router import get_product_info
+from stores import store_for_url
 
-TELEGRAM_TOKEN = "7835836746:AAGh264mO96_f7nvkkm2N365fhjk979hydU"
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
+URL_PATTERN = re.compile(r"https?://\S+")
+# Pontuação colada no fim do link ("veja https://...!", "(https://...)")
+URL_TRAILING = ").,;!?>]\"'"
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not update.message or not update.message.text:
-        return
 
-    text = update.message.text.strip()
+# ===============================
+# CONCORRÊNCIA
+# ===============================
+# Cada mensagem roda em paralelo (concurrent_updates), mas os scrapes
+# passam por um limite global e um limite por chat: um usuário mandando
+# 30 links não trava os outros.
+BOT_MAX_UPDATES = int(os.getenv("BOT_MAX_UPDATES", "64"))
+BOT_MAX_SCRAPES = int(os.getenv("BOT_MAX_SCRAPES", "16"))
+BOT_MAX_SCRAPES_PER_CHAT = int(os.getenv("BOT_MAX_SCRAPES_PER_CHAT", "3"))
+BOT_MAX_LINKS_PER_MESSAGE = int(os.getenv("BOT_MAX_LINKS_PER_MESSAGE", "10"))
 
-    lojas = ["magazineluiza", "magazinevoce", "shopee", "mercado", "amazon"]
-    if not any(l in text.lower() for l in lojas):
-        await update.message.reply_text(
-            "🚫 Envie um link válido da Shopee, Magalu, Mercado Livre ou Amazon."
-        )
-        return
+_scrape_slots = asyncio.Semaphore(BOT_MAX_SCRAPES)
+# some sozinho quando o chat não tem scrape pendente
+_chat_slots = weakref.WeakValueDictionary()
+_queued = 0
+
+
+def extract_links(text: str) -> list[str]:
+    """
+    Todos os links de lojas suportadas, sem repetir, na ordem da mensagem.
+    """
+    urls = (url.rstrip(URL_TRAILING) for url in URL_PATTERN.findall(text))
+    links = dict.fromkeys(url for url in urls if store_for_url(url))
+    return list(links)[:BOT_MAX_LINKS_PER_MESSAGE]
+
+
+def _chat_semaphore(chat_id: int) -> asyncio.Semaphore:
+    sem = _chat_slots.get(chat_id)
+    if sem is None:
+        sem = asyncio.Semaphore(BOT_MAX_SCRAPES_PER_CHAT)
+        _chat_slots[chat_id] = sem
+    return sem
 
-    await update.message.reply_text("🔎 Buscando produto...")
+
+async def scrape_with_limits(link: str, chat_id: int, on_queued):
+    """
+    Espera vaga no chat e no limite global; on_queued(posição) é
+    chamado uma vez se o link tiver que esperar.
+    """
+    global _queued
+
+    chat_sem = _chat_semaphore(chat_id)
+
+    queued = chat_sem.locked() or _scrape_slots.locked()
+    if queued:
+        _queued += 1
+        await on_queued(_queued)
 
     try:
-        product = get_product_info(text)
-    except Exception as e:
-        print("Erro ao buscar produto:", e)
-        await update.message.reply_text("⚠️ Erro ao buscar informações do produto.")
-        return
+        async with chat_sem, _scrape_slots:
+            if queued:
+                _queued -= 1
+                queued = False
+            return await get_product_info(link)
+    finally:
+        # cancelado ainda na fila
+        if queued:
+            _queued -= 1
 
-    if not product:
-        await update.message.reply_text(
-            "😕 Não consegui obter as informações do produto."
+
+async def send_product(message, product):
+    if not product or product.get("error"):
+        await message.reply_text(
+            (product or {}).get("message")
+            or "😕 Não consegui obter as informações do produto."
         )
         return
 
@@ -45,27 +93,100 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         image = product.get("image")
 
         if image:
-            await update.message.reply_photo(
+            await message.reply_photo(
                 photo=image,
                 caption=caption
             )
         else:
-            await update.message.reply_text(
+            await message.reply_text(
                 caption,
                 disable_web_page_preview=False
             )
 
     except Exception as e:
         print("Erro Telegram:", e)
-        await update.message.reply_text(
+        await message.reply_text(
             "⚠️ Erro ao enviar mensagem."
         )
 
 
-app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
-app.add_handler(
-    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
-)
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not update.message or not update.message.text:
+        return
+
+    message = update.message
+    links = extract_links(message.text.strip())
+
+    if not links:
+        await message.reply_text(
+            "🚫 Envie um link válido da Shopee, Magalu, Mercado Livre ou Amazon."
+        )
+        return
+
+    if len(links) == 1:
+        status = await message.reply_text("🔎 Buscando produto...")
+    else:
+        status = await message.reply_text(f"🔎 Buscando {len(links)} produtos...")
+
+    notified = False
+
+    async def on_queued(position):
+        nonlocal notified
+        if notified:
+            return
+        notified = True
+        try:
+            await status.edit_text(
+                f"⏳ Muita gente buscando agora: você é o {position}º da fila. Já já chego no seu!"
+            )
+        except Exception as e:
+            print("Erro ao avisar fila:", e)
+
+    async def process(link):
+        try:
+            product = await scrape_with_limits(link, message.chat_id, on_queued)
+        except Exception as e:
+            print("Erro ao buscar produto:", link, e)
+            await message.reply_text("⚠️ Erro ao buscar informações do produto.")
+            return
+
+        await send_product(message, product)
+
+    # 🚀 todos os links em paralelo; cada resposta sai assim que fica pronta
+    await asyncio.gather(*(process(link) for link in links))
+
+
+# ===============================
+# APLICAÇÃO
+# ===============================
+# Dois modos com os mesmos handlers:
+#   - webhook: o api.py recebe os updates em /telegram/webhook (mesmo
+#     processo, pool HTTP e caches da API) se TELEGRAM_WEBHOOK_URL existir
+#   - polling (fallback): python bot.py; apaga o webhook ao iniciar
+def build_application(updater: bool = True):
+    """
+    updater=False: sem long polling, os updates chegam pela
+    update_queue (modo webhook).
+    """
+    if not TELEGRAM_TOKEN:
+        raise RuntimeError("TELEGRAM_TOKEN não definido")
+
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(BOT_MAX_UPDATES)
+    )
+    if not updater:
+        builder = builder.updater(None)
+
+    application = builder.build()
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
+    )
+    return application
+
 
-print("🤖 Bot universal iniciado com sucesso!")
-app.run_polling()
+if __name__ == "__main__":
+    app = build_application()
+    print("🤖 Bot universal iniciado com sucesso!")
+    app.run_polling()
@@ -0,0 +1,225 @@
+import codecs
+
+from lxml import etree
+
+# ===============================
+# EXTRAÇÃO DE HTML (lxml)
+# ===============================
+# Parser C (libxml2) no lugar da árvore BeautifulSoup/html.parser.
+# Cada loja declara seus seletores XPath no próprio módulo, compilados
+# uma vez no import via xpath(); aqui ficam só os utilitários comuns,
+# com a mesma semântica de texto que o código usava com bs4.
+
+_PARSER = etree.HTMLParser()
+_UTF8_PARSER = etree.HTMLParser(encoding="utf-8")
+
+_TEXT_NODES = etree.XPath(".//text()")
+
+
+def xpath(expr: str) -> etree.XPath:
+    return etree.XPath(expr)
+
+
+def has_class(name: str) -> str:
+    """
+    Predicado XPath para uma classe exata (como class_="x" no bs4).
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def contains_class(name: str) -> str:
+    """
+    Predicado XPath para classe contendo o trecho
+    (como class_=re.compile("x") no bs4).
+    """
+    return f"contains(@class, '{name}')"
+
+
+def parse_html(markup: str | bytes):
+    """
+    Retorna a raiz do documento. Nunca levanta para HTML vazio/quebrado.
+    """
+    try:
+        if isinstance(markup, bytes):
+            root = etree.fromstring(markup, _UTF8_PARSER)
+        else:
+            try:
+                root = etree.fromstring(markup, _PARSER)
+            except ValueError:
+                # str com declaração de encoding: lxml exige bytes
+                root = etree.fromstring(markup.encode("utf-8"), _UTF8_PARSER)
+    except etree.ParserError:
+        root = None
+
+    if root is None:
+        root = etree.fromstring("<html></html>", _PARSER)
+
+    return root
+
+
+def first(node, selector: etree.XPath):
+    if node is None:
+        return None
+    found = selector(node)
+    return found[0] if found else None
+
+
+def attr(node, name: str, default=None):
+    if node is None:
+        return default
+    return node.get(name, default)
+
+
+def get_text(node, separator: str = "", strip: bool = False) -> str:
+    """
+    Equivalente ao Tag.get_text(separator, strip) do bs4.
+    """
+    if node is None:
+        return ""
+
+    parts = _TEXT_NODES(node)
+
+    if strip:
+        parts = [p.strip() for p in parts]
+        parts = [p for p in parts if p]
+
+    return separator.join(parts)
+
+
+def tag_string(node):
+    """
+    Equivalente ao Tag.string do bs4: o único texto filho do elemento
+    (descendo por filhos únicos), ou None.
+    """
+    while node is not None:
+        children = list(node)
+
+        if not children:
+            return node.text
+
+        if node.text or len(children) > 1 or children[0].tail:
+            return None
+
+        node = children[0]
+        if not isinstance(node.tag, str):
+            # comentário / processing instruction
+            return node.text
+
+    return None
+
+
+def find_text(node, pattern):
+    """
+    Primeiro texto descendente que casa com a regex (como find(string=re)).
+    """
+    if node is None:
+        return None
+
+    for text in _TEXT_NODES(node):
+        if pattern.search(text):
+            return str(text)
+
+    return None
+
+
+# ===============================
+# LEITURA INCREMENTAL (STREAMING)
+# ===============================
+# Quanto do texto anterior entra de novo na checagem do próximo chunk
+# (padrão cortado entre dois chunks)
+TEXT_CHECK_OVERLAP = 4096
+
+
+class PageStream:
+    """
+    Recebe o HTML em chunks, alimenta o parser incremental do lxml e
+    avisa quando todos os campos obrigatórios da loja já apareceram.
+
+    checks: nome -> (casa(el), valido(el)). Vale sempre o PRIMEIRO
+    elemento que casa (como no find()); se ele não for válido, o campo
+    depende do resto da página e a leitura vai até o fim.
+    text_checks: nome -> função(texto) -> bool. Cada chunk é checado só
+    com o texto novo mais os últimos TEXT_CHECK_OVERLAP caracteres, não
+    com a página inteira de novo; um padrão maior que isso só deixa de
+    encerrar a leitura mais cedo.
+    """
+
+    def __init__(self, encoding: str, checks: dict, text_checks: dict | None = None):
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+
+        self._parser = etree.HTMLPullParser(events=("end",), encoding=encoding)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._parts = []
+        self._pending = dict(checks)
+        self._pending_text = dict(text_checks or {})
+        self._tail = ""
+        self._needs_full_body = False
+        self.bytes_read = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        text = self._decoder.decode(chunk)
+        self._parts.append(text)
+
+        for _, el in self._parser.read_events():
+            for name, (matches, valid) in list(self._pending.items()):
+                if matches(el):
+                    del self._pending[name]
+                    if not valid(el):
+                        self._needs_full_body = True
+
+        if self._pending_text:
+            window = self._tail + text
+            for name, check in list(self._pending_text.items()):
+                if check(window):
+                    del self._pending_text[name]
+            self._tail = window[-TEXT_CHECK_OVERLAP:]
+
+        return self.complete
+
+    @property
+    def complete(self) -> bool:
+        return (
+            not self._needs_full_body
+            and not self._pending
+            and not self._pending_text
+        )
+
+    def close(self):
+        """
+        Retorna (texto, raiz) do que foi lido até aqui.
+        """
+        self._parts.append(self._decoder.decode(b"", final=True))
+        try:
+            root = self._parser.close()
+        except etree.ParserError:
+            root = None
+
+        if root is None:
+            root = etree.fromstring("<html></html>", _PARSER)
+
+        return "".join(self._parts), root
+
+
+def meta_check(attr_name: str, value: str, require_content: bool = False):
+    def matches(el):
+        return el.tag == "meta" and el.get(attr_name) == value
+
+    def valid(el):
+        return bool(el.get("content")) or not require_content
+
+    return matches, valid
+
+
+def element_check(tag: str, attr_name: str, value: str, substring: bool = False):
+    def matches(el):
+        if el.tag != tag:
+            return False
+        current = el.get(attr_name) or ""
+        return value in current if substring else current == value
+
+    return matches, lambda el: True
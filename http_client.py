@@ -0,0 +1,360 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager, AsyncExitStack
+
+import httpx
+
+import ratelimit
+import page_cache
+from metrics import count_response, span
+from block_detect import classify, record_block, BlockedPage, BLOCK_MIN_PAGE_BYTES
+
+# ===============================
+# POOL HTTP COMPARTILHADO
+# ===============================
+# Um único AsyncClient por processo: reaproveita conexões keep-alive
+# (e HTTP/2 quando o host suporta) para ML, Magalu, Amazon, Shopee etc.
+
+DEFAULT_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+)
+
+_client: httpx.AsyncClient | None = None
+
+# Retry (só GET) com backoff exponencial e jitter "full"
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.3"))
+HTTP_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "5"))
+RETRY_STATUS = {429, 502, 503, 504}
+
+# Estatísticas do modo streaming
+stream_stats = {
+    "pages": 0,
+    "stopped_early": 0,
+    "bytes_read": 0,
+    "blocked": 0,
+}
+
+
+class UpstreamOverrideTransport(httpx.AsyncBaseTransport):
+    """
+    Manda todo request para um único servidor (stand-in local de testes
+    de carga), mantendo o host original no header X-Upstream-Host.
+    A URL vista pelos adapters (resp.url, redirects) continua a real.
+    """
+
+    def __init__(self, base_url: str):
+        self._base = httpx.URL(base_url)
+        self._inner = httpx.AsyncHTTPTransport(limits=POOL_LIMITS)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        headers = request.headers.copy()
+        headers["x-upstream-host"] = request.url.host
+
+        forwarded = httpx.Request(
+            request.method,
+            request.url.copy_with(
+                scheme=self._base.scheme,
+                host=self._base.host,
+                port=self._base.port,
+            ),
+            headers=headers,
+            stream=request.stream,
+            extensions=request.extensions,
+        )
+        return await self._inner.handle_async_request(forwarded)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def _build_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    if transport is None and os.getenv("UPSTREAM_OVERRIDE"):
+        transport = UpstreamOverrideTransport(os.environ["UPSTREAM_OVERRIDE"])
+
+    return httpx.AsyncClient(
+        http2=True,
+        limits=POOL_LIMITS,
+        timeout=DEFAULT_TIMEOUT,
+        follow_redirects=True,
+        transport=transport,
+        event_hooks={"response": [count_response]},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Retorna o client compartilhado.
+    Cria sob demanda (bot, scripts) caso o lifespan ainda não tenha rodado.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def startup(transport: httpx.AsyncBaseTransport | None = None):
+    """
+    transport: permite apontar o pool para um stub local (benchmarks).
+    """
+    global _client
+    if transport is not None:
+        await shutdown()
+        _client = _build_client(transport)
+    get_client()
+
+
+async def shutdown():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+# ===============================
+# GOVERNADOR POR HOST
+# ===============================
+# get/post/stream passam pelo governador do host (ratelimit.py): token
+# bucket, concorrência AIMD e circuit breaker. GET (idempotente) tenta
+# de novo em erro de transporte e 429/5xx, respeitando Retry-After.
+def _backoff(attempt: int, resp: httpx.Response | None = None) -> float:
+    retry_after = resp.headers.get("retry-after", "") if resp is not None else ""
+    if retry_after.isdigit():
+        return min(float(retry_after), HTTP_RETRY_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_RETRY_BACKOFF_MAX, HTTP_RETRY_BACKOFF * 2 ** attempt))
+
+
+def _attempts(method: str) -> int:
+    return 1 + (HTTP_RETRIES if method.upper() in ("GET", "HEAD") else 0)
+
+
+async def _governed(method: str, url: str, **kwargs) -> httpx.Response:
+    client = get_client()
+    if not ratelimit.GOVERNOR_ENABLED:
+        return await client.request(method, url, **kwargs)
+
+    governor = ratelimit.governor_for(httpx.URL(url).host)
+    attempts = _attempts(method)
+
+    for attempt in range(attempts):
+        await governor.acquire()
+        started = time.perf_counter()
+
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            governor.release(time.perf_counter() - started, failed=True)
+            if attempt + 1 == attempts:
+                raise
+            governor.retries += 1
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        except BaseException:
+            governor.abandon()
+            raise
+
+        governor.release(time.perf_counter() - started, resp.status_code)
+
+        if resp.status_code in RETRY_STATUS and attempt + 1 < attempts:
+            governor.retries += 1
+            await asyncio.sleep(_backoff(attempt, resp))
+            continue
+
+        return resp
+
+
+# ===============================
+# ATALHOS
+# ===============================
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await _governed("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await _governed("POST", url, **kwargs)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    client = get_client()
+    if not ratelimit.GOVERNOR_ENABLED:
+        async with client.stream(method, url, **kwargs) as resp:
+            yield resp
+        return
+
+    governor = ratelimit.governor_for(httpx.URL(url).host)
+    attempts = _attempts(method)
+
+    for attempt in range(attempts):
+        await governor.acquire()
+        started = time.perf_counter()
+        stack = AsyncExitStack()
+
+        try:
+            resp = await stack.enter_async_context(client.stream(method, url, **kwargs))
+        except httpx.TransportError:
+            governor.release(time.perf_counter() - started, failed=True)
+            if attempt + 1 == attempts:
+                raise
+            governor.retries += 1
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        except BaseException:
+            governor.abandon()
+            raise
+
+        # latência até os headers; a vaga fica presa até fechar o corpo
+        latency = time.perf_counter() - started
+
+        if resp.status_code in RETRY_STATUS and attempt + 1 < attempts:
+            governor.release(latency, resp.status_code)
+            await stack.aclose()
+            governor.retries += 1
+            await asyncio.sleep(_backoff(attempt, resp))
+            continue
+
+        failed = False
+        try:
+            async with stack:
+                yield resp
+        except (httpx.TransportError, BlockedPage):
+            failed = True
+            raise
+        finally:
+            governor.release(latency, resp.status_code, failed)
+        return
+
+
+# ===============================
+# PÁGINAS BLOQUEADAS
+# ===============================
+# Captcha/WAF é levantado (BlockedPage) com o stream ainda aberto: o
+# governador do host registra a resposta como falha (menos concorrência,
+# conta no breaker) e o parser nem chega a ver o HTML.
+async def get_page(url: str, **kwargs) -> httpx.Response:
+    """
+    GET de página de produto (corpo inteiro) com detecção de bloqueio.
+    """
+    async with stream("GET", url, **kwargs) as resp:
+        content = await resp.aread()
+        reason = classify(resp.status_code, len(content), content, str(resp.url))
+        if reason:
+            raise record_block(httpx.URL(url).host, reason)
+    return resp
+
+
+async def fetch_page_streaming(url: str, make_stream, **kwargs):
+    """
+    GET em modo streaming: lê o corpo em chunks e fecha a conexão assim
+    que make_stream(encoding) avisar que os campos necessários chegaram.
+    O primeiro chunk passa pelo detector de bloqueio antes do parser.
+    Retorna (resposta, texto, raiz_lxml, completo); 304 volta sem texto.
+    completo=False: parou cedo, o texto é só o começo da página.
+    """
+    async with stream("GET", url, **kwargs) as resp:
+        reason = classify(resp.status_code, None, b"", str(resp.url))
+        if reason:
+            stream_stats["blocked"] += 1
+            raise record_block(httpx.URL(url).host, reason)
+
+        if resp.status_code == 304:
+            return resp, None, None, False
+
+        resp.raise_for_status()
+        page = make_stream(resp.charset_encoding or "utf-8")
+        length = resp.headers.get("content-length", "")
+
+        stopped_early = False
+        first = True
+        async for chunk in resp.aiter_bytes():
+            if first:
+                first = False
+                reason = classify(resp.status_code, int(length) if length.isdigit() else None, chunk)
+                if reason:
+                    break
+            if page.feed(chunk):
+                stopped_early = True
+                break
+        else:
+            if page.bytes_read < BLOCK_MIN_PAGE_BYTES:
+                reason = "tiny_page"
+
+        if reason:
+            stream_stats["blocked"] += 1
+            raise record_block(httpx.URL(url).host, reason)
+
+    stream_stats["pages"] += 1
+    stream_stats["bytes_read"] += page.bytes_read
+    if stopped_early:
+        stream_stats["stopped_early"] += 1
+
+    text, doc = page.close()
+    return resp, text, doc, not stopped_early
+
+
+async def fetch_fields(url: str, extract, store: str, tag: str, make_stream=None, **kwargs) -> dict:
+    """
+    Página de produto -> campos de extract(html, doc), com o cache
+    condicional em disco (page_cache): manda os validadores salvos e,
+    com 304, devolve os campos guardados sem baixar nem parsear.
+    tag: versão do extrator (mudou -> re-extrai do HTML guardado).
+    make_stream: lê em streaming (fetch_page_streaming) em vez do corpo inteiro.
+    """
+    cache = page_cache.page_cache if page_cache.PAGE_CACHE_ENABLED else None
+    entry = await cache.lookup(url) if cache else None
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        headers.update(entry.validators())
+
+    async def download(headers):
+        with span("fetch", store):
+            if make_stream is not None:
+                return await fetch_page_streaming(url, make_stream, headers=headers, **kwargs)
+            resp = await get_page(url, headers=headers, **kwargs)
+            if resp.status_code != 304:
+                resp.raise_for_status()
+            return resp, resp.text, None, True
+
+    resp, html, doc, complete = await download(headers)
+
+    if resp.status_code == 304 and entry is not None:
+        fields = await cache.revalidated(entry, tag, extract)
+        if fields is not None:
+            return fields
+        # extrator mudou e só há campos salvos (sem HTML): baixa de novo
+        for name in entry.validators():
+            headers.pop(name, None)
+        resp, html, doc, complete = await download(headers)
+    resp.raise_for_status()
+
+    with span("parse", store):
+        fields = extract(html, doc)
+
+    if cache:
+        # parou cedo: o HTML é só o começo, guarda só os campos
+        await cache.store(url, tag, resp.headers, html if complete else None, fields)
+    return fields
+
+
+async def warmup(urls: list[str]) -> dict:
+    """
+    Abre (e deixa no pool) uma conexão com cada host.
+    Retorna host -> ms até a resposta, ou o erro.
+    """
+    async def touch(url):
+        started = time.perf_counter()
+        try:
+            await get_client().head(url, timeout=10, follow_redirects=False)
+            return round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            return f"erro: {e.__class__.__name__}"
+
+    results = await asyncio.gather(*(touch(url) for url in urls))
+    return {httpx.URL(url).host: result for url, result in zip(urls, results)}
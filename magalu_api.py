@@ -1,10 +1,52 @@
+import os
 import re
-import requests
-from bs4 import BeautifulSoup
 import random
 
+import http_client
+from metrics import span
+from block_detect import BlockedPage
+from ratelimit import CircuitOpenError
+from prices import tidy_price_text
+from aiml_ai import start_caption
+from html_extract import (
+    xpath,
+    parse_html,
+    first,
+    get_text,
+    tag_string,
+    find_text,
+    PageStream,
+    meta_check,
+    element_check,
+)
+
 MAGALU_STORE = "in_603815"
 
+# Lê a página em chunks e para quando os campos necessários chegam
+STREAM_FETCH = os.getenv("STREAM_FETCH", "1") == "1"
+
+# Versão do extrator no cache de páginas: mude ao alterar parse_magalu_page
+PAGE_CACHE_TAG = "magalu-1"
+
+# -------------------
+# Seletores (compilados no import)
+# -------------------
+SELECTORS = {
+    "title": xpath("//meta[@property='og:title']"),
+    "image": xpath("//meta[@property='og:image']"),
+    "price_default": xpath("//div[@data-testid='price-default']"),
+    "price_original": xpath(".//p[@data-testid='price-original']"),
+    "price_value": xpath(".//p[@data-testid='price-value']"),
+    "in_cash": xpath(".//span[@data-testid='in-cash']"),
+    "spans": xpath(".//span"),
+    "installment": xpath(".//p[@data-testid='installment']"),
+    "best_installment": xpath("//div[@data-testid='mod-bestinstallment']"),
+}
+
+TITLE_SUFFIX = re.compile(r"\s*-\s*(Magazine|Magalu).*", re.I)
+PIX_DISCOUNT = re.compile(r"%.*pix", re.I)
+CARD_TOTAL = re.compile(r"R\$\s*\d+,\d{2}")
+
 # -------------------
 # Legendas prontas
 # -------------------
@@ -26,10 +68,10 @@ def format_magalu_store(store_id: str) -> str:
         return store_id[:2] + "_" + store_id[2:]
     return store_id
 
-def encurtar_link(url: str) -> str:
+async def encurtar_link(url: str) -> str:
     try:
         api_url = "https://api.encurtador.dev/encurtamentos"
-        resp = requests.post(
+        resp = await http_client.post(
             api_url,
             json={"url": url},
             headers={"Content-Type": "application/json"},
@@ -41,24 +83,77 @@ def encurtar_link(url: str) -> str:
         pass
     return url
 
-def normalize_magalu_price(text: str | None) -> str | None:
+
+def parse_magalu_page(html, doc=None) -> dict:
     """
-    Corrige preços quebrados do Magalu:
-    'R$ 202 , 39' -> 'R$ 202,39'
+    Extrai nome, imagem e bloco de preços do HTML de um produto Magalu.
+    Só devolve os campos encontrados.
     """
-    if not text:
-        return text
-
-    # Remove espaços antes/depois da vírgula
-    text = re.sub(r"\s*,\s*", ",", text)
-
-    # Remove espaço extra após R$
-    text = re.sub(r"R\$\s+", "R$ ", text)
-
-    return text.strip()
+    if doc is None:
+        doc = parse_html(html)
+    fields = {}
+
+    # -------------------
+    # NOME E IMAGEM
+    # -------------------
+    if (t := first(doc, SELECTORS["title"])) is not None:
+        fields["name"] = TITLE_SUFFIX.sub("", t.get("content", "").strip())
+
+    if (img := first(doc, SELECTORS["image"])) is not None:
+        fields["image"] = img.get("content")
+
+    # -------------------
+    # BLOCO DE PREÇO (REAL ATUAL)
+    # -------------------
+    price_default = first(doc, SELECTORS["price_default"])
+
+    if price_default is not None:
+        # Preço original (riscado)
+        if (orig := first(price_default, SELECTORS["price_original"])) is not None:
+            fields["price_original"] = get_text(orig, strip=True)
+
+        # Preço Pix
+        if (pix := first(price_default, SELECTORS["price_value"])) is not None:
+            raw_price = get_text(pix, " ", strip=True).replace("ou ", "")
+            fields["price_pix"] = tidy_price_text(raw_price)
+
+        # Método Pix
+        if (pix_m := first(price_default, SELECTORS["in_cash"])) is not None:
+            fields["pix_method"] = get_text(pix_m, strip=True)
+
+        # Desconto Pix
+        for span in SELECTORS["spans"](price_default):
+            text = tag_string(span)
+            if text is not None and PIX_DISCOUNT.search(text):
+                fields["pix_discount"] = get_text(span, strip=True)
+                break
+
+        # Parcelamento
+        if (inst := first(price_default, SELECTORS["installment"])) is not None:
+            fields["card_installments"] = get_text(inst, strip=True)
+
+    # Total cartão (fallback)
+    if (card := first(doc, SELECTORS["best_installment"])) is not None:
+        if (v := find_text(card, CARD_TOTAL)):
+            fields["card_total"] = v.strip()
+
+    return fields
+
+
+def magalu_page_stream(encoding):
+    """
+    Nome, imagem, bloco de preço e parcelamento: com esses elementos
+    fechados o resto da página não muda o resultado.
+    """
+    return PageStream(encoding, {
+        "title": meta_check("property", "og:title"),
+        "image": meta_check("property", "og:image"),
+        "price_default": element_check("div", "data-testid", "price-default"),
+        "best_installment": element_check("div", "data-testid", "mod-bestinstallment"),
+    })
 
 
-def get_magalu_product_info(product_url: str) -> dict:
+async def get_magalu_product_info(product_url: str) -> dict:
     try:
         loja_corrigida = format_magalu_store(MAGALU_STORE)
 
@@ -73,9 +168,16 @@ def get_magalu_product_info(product_url: str) -> dict:
             "Accept-Language": "pt-BR,pt;q=0.9",
         }
 
-        resp = requests.get(affiliate_link, headers=headers, timeout=20)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
+        # fetch + parse (ou 304 do cache de páginas)
+        fields = await http_client.fetch_fields(
+            affiliate_link,
+            parse_magalu_page,
+            store="magalu",
+            tag=PAGE_CACHE_TAG,
+            make_stream=magalu_page_stream if STREAM_FETCH else None,
+            headers=headers,
+            timeout=20
+        )
 
         info = {
             "name": "Produto Magalu",
@@ -90,58 +192,16 @@ def get_magalu_product_info(product_url: str) -> dict:
             "card_installments": None,
             "caption": None,
         }
-
-        # -------------------
-        # NOME E IMAGEM
-        # -------------------
-        if (t := soup.find("meta", property="og:title")):
-            info["name"] = re.sub(
-                r"\s*-\s*(Magazine|Magalu).*",
-                "",
-                t.get("content", "").strip(),
-                flags=re.I,
-            )
-
-        if (img := soup.find("meta", property="og:image")):
-            info["image"] = img.get("content")
-
-        # -------------------
-        # BLOCO DE PREÇO (REAL ATUAL)
-        # -------------------
-        price_default = soup.find("div", {"data-testid": "price-default"})
-
-        if price_default:
-            # Preço original (riscado)
-            if (orig := price_default.find("p", {"data-testid": "price-original"})):
-                info["price_original"] = orig.get_text(strip=True)
-
-            # Preço Pix
-            if (pix := price_default.find("p", {"data-testid": "price-value"})):
-                raw_price = pix.get_text(" ", strip=True).replace("ou ", "")
-                info["price_pix"] = normalize_magalu_price(raw_price)
-
-            # Método Pix
-            if (pix_m := price_default.find("span", {"data-testid": "in-cash"})):
-                info["pix_method"] = pix_m.get_text(strip=True)
-
-            # Desconto Pix
-            if (disc := price_default.find("span", string=re.compile(r"%.*pix", re.I))):
-                info["pix_discount"] = disc.get_text(strip=True)
-
-            # Parcelamento
-            if (inst := price_default.find("p", {"data-testid": "installment"})):
-                info["card_installments"] = inst.get_text(strip=True)
-
-        # Total cartão (fallback)
-        if not info["card_total"]:
-            if (card := soup.find("div", {"data-testid": "mod-bestinstallment"})):
-                if (v := card.find(string=re.compile(r"R\$\s*\d+,\d{2}"))):
-                    info["card_total"] = v.strip()
+        info.update(fields)
 
         # -------------------
         # CAPTION FINAL
         # -------------------
-        short_link = encurtar_link(info["link"])
+        # legenda IA já sai enquanto o link é encurtado
+        start_caption(info["name"], info["price_pix"], "Magalu")
+
+        with span("shorten", "magalu"):
+            short_link = await encurtar_link(info["link"])
         info["link"] = short_link
 
         caption = f"📦 {info['name']}\n"
@@ -163,6 +223,9 @@ def get_magalu_product_info(product_url: str) -> dict:
 
         return info
 
+    except (BlockedPage, CircuitOpenError):
+        raise
+
     except Exception as e:
         print("❌ Erro Magalu:", e)
         return None
@@ -1,20 +1,22 @@
-from shopee_api import get_shopee_product_info
-from amazon_api import get_amazon_product_info
-from ml_api import get_ml_product_info
-from magalu_api import get_magalu_product_info
+import asyncio
 
-def get_product_info(url):
-    if "shopee" in url:
-        return get_shopee_product_info(url)
-    elif "amazon" in url:
-        return get_amazon_product_info(url)
-    elif "mercadolivre" in url:
-        return get_ml_product_info(url)
-    elif "magazineluiza" in url or "magalu" in url:
-        return get_magalu_product_info(url)
-    else:
+from stores import adapter_for_url
+import http_client
+
+async def get_product_info(url):
+    adapter = adapter_for_url(url)
+
+    if adapter is None:
         return "❌ Loja não suportada"
 
+    return await adapter.fetch(url)
+
+async def _main(link):
+    try:
+        print(await get_product_info(link))
+    finally:
+        await http_client.shutdown()
+
 if __name__ == "__main__":
     link = input("Cole o link do produto: ").strip()
-    print(get_product_info(link))
+    asyncio.run(_main(link))
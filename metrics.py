@@ -0,0 +1,153 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from stores import host_label
+
+# ===============================
+# MÉTRICAS (PROMETHEUS)
+# ===============================
+# span(stage, store) mede cada etapa do scrape: vai para o histograma
+# exportado em /metrics e, se houver um request ativo, para o header
+# Server-Timing da resposta.
+
+STAGE_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "scrape_stage_seconds",
+    "Duração de cada etapa do scrape",
+    ["store", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+SCRAPES_IN_FLIGHT = Gauge(
+    "scrape_in_flight",
+    "Scrapes de loja em andamento",
+    ["store"],
+)
+
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses_total",
+    "Respostas recebidas das lojas e APIs externas",
+    ["host", "status"],
+)
+
+BLOCKED_PAGES = Counter(
+    "blocked_pages_total",
+    "Páginas de captcha/bloqueio detectadas antes do parse",
+    ["host", "reason"],
+)
+
+# Tempos do request atual (nome da etapa -> segundos somados)
+_timings: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "scrape_timings", default=None
+)
+
+
+@contextmanager
+def span(stage: str, store: str | None = None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(store or "desconhecida", stage).observe(elapsed)
+
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def start_timings() -> dict:
+    """
+    Abre a coleta de tempos do request atual. Tasks criadas a partir
+    daqui (single-flight, gather) herdam o mesmo dict.
+    """
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(
+        f"{stage};dur={elapsed * 1000:.1f}"
+        for stage, elapsed in timings.items()
+    )
+
+
+async def count_response(response):
+    """
+    Event hook do httpx: conta status por host (inclusive cada redirect).
+    """
+    host = host_label(response.request.url.host)
+    UPSTREAM_RESPONSES.labels(host, str(response.status_code)).inc()
+
+
+# ===============================
+# CACHES E FILAS (LIDOS NA COLETA)
+# ===============================
+class _StatsCollector:
+    """
+    Exporta os stats() já existentes dos caches sem duplicar contadores.
+    """
+
+    def __init__(self):
+        self._caches = {}
+        self._singleflight = None
+
+    def add_cache(self, name: str, stats_fn):
+        self._caches[name] = stats_fn
+
+    def set_singleflight(self, stats_fn):
+        self._singleflight = stats_fn
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Acertos de cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Faltas de cache", labels=["cache"])
+        size = GaugeMetricFamily("cache_size", "Itens em cache", labels=["cache"])
+        hit_rate = GaugeMetricFamily("cache_hit_ratio", "Taxa de acerto", labels=["cache"])
+
+        for name, stats_fn in self._caches.items():
+            stats = stats_fn()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+            hit_rate.add_metric([name], stats["hit_rate"])
+
+        yield from (hits, misses, size, hit_rate)
+
+        if self._singleflight is not None:
+            stats = self._singleflight()
+            yield CounterMetricFamily(
+                "singleflight_calls", "Chamadas ao single-flight", value=stats["calls"]
+            )
+            yield CounterMetricFamily(
+                "singleflight_coalesced", "Chamadas que reaproveitaram um job", value=stats["coalesced"]
+            )
+            yield GaugeMetricFamily(
+                "singleflight_in_flight", "Jobs distintos em andamento", value=stats["in_flight"]
+            )
+
+
+_collector = _StatsCollector()
+REGISTRY.register(_collector)
+
+register_cache = _collector.add_cache
+register_singleflight = _collector.set_singleflight
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,98 +1,63 @@
+import os
 import re
 import json
-import requests
-from bs4 import BeautifulSoup
-
-def normalize_price(value):
-    """
-    Normaliza preços de diferentes formatos para 'R$ X.XXX,XX'
-    
-    Exemplos:
-    - "1745.03" (API/JSON decimal inglês) → "1.745,03"
-    - "1.745,03" (formato BR) → "1.745,03"
-    - "1745" → "1.745,00"
-    - "48.9" (decimal inglês) → "48,90"
-    - "48,90" (BR) → "48,90"
-    """
-    if not value:
-        return value
-
-    value = str(value).strip()
-    
-    # Remove espaços e símbolos de moeda
-    value = value.replace("R$", "").replace(" ", "")
-    
-    # Conta quantos pontos e vírgulas tem
-    dot_count = value.count(".")
-    comma_count = value.count(",")
-    
-    # Caso 1: Tem vírgula E ponto → formato brasileiro "1.745,03"
-    if comma_count > 0 and dot_count > 0:
-        # Remove pontos (milhares) e troca vírgula por ponto
-        value = value.replace(".", "").replace(",", ".")
-    
-    # Caso 2: Só tem vírgula → formato brasileiro "1745,03" ou "48,90"
-    elif comma_count > 0:
-        value = value.replace(",", ".")
-    
-    # Caso 3: Só tem ponto → pode ser milhar OU decimal
-    elif dot_count > 0:
-        # Se tem mais de um ponto, é separador de milhar: "1.745.320"
-        if dot_count > 1:
-            value = value.replace(".", "")
-        else:
-            # Um único ponto: verificar posição
-            parts = value.split(".")
-            
-            # Se a parte decimal tem exatamente 2 dígitos → decimal inglês "1745.03"
-            if len(parts) == 2 and len(parts[1]) == 2:
-                pass  # já está correto (ponto = decimal)
-            
-            # Se parte decimal tem 3 dígitos → é separador de milhar "1.745"
-            elif len(parts) == 2 and len(parts[1]) == 3:
-                value = value.replace(".", "")
-            
-            # Se número muito grande com ponto → provavelmente milhar
-            elif len(parts[0]) <= 3:
-                pass  # decimal "48.9"
-            else:
-                value = value.replace(".", "")
-    
-    # Caso 4: Só números → pode ser centavos "4899" ou inteiro "1745"
-    # Vamos assumir que se >= 100, não tem centavos embutidos
-    # (se necessário ajustar essa lógica)
-    
-    try:
-        num = float(value)
-        
-        # Formata com separador de milhares e vírgula decimal (padrão BR)
-        formatted = f"{num:,.2f}"
-        
-        # Troca vírgula (milhar) por ponto e ponto (decimal) por vírgula
-        formatted = formatted.replace(",", "X").replace(".", ",").replace("X", ".")
-        
-        return formatted
-    except:
-        return value
-
-
-def resolve_url(url: str) -> str:
+import asyncio
+
+import http_client
+from metrics import span
+from block_detect import BlockedPage
+from ratelimit import CircuitOpenError
+from prices import normalize_price
+from url_resolver import expand_url
+from aiml_ai import start_caption
+from html_extract import (
+    xpath,
+    contains_class,
+    parse_html,
+    first,
+    attr,
+    get_text,
+    tag_string,
+    PageStream,
+    meta_check,
+    element_check,
+)
+
+# Lê a página em chunks e para quando os campos necessários chegam
+STREAM_FETCH = os.getenv("STREAM_FETCH", "1") == "1"
+
+# Versão do extrator no cache de páginas: mude ao alterar parse_ml_page
+PAGE_CACHE_TAG = "ml-1"
+
+# ===============================
+# SELETORES (compilados no import)
+# ===============================
+SELECTORS = {
+    "title": xpath("//meta[@property='og:title']"),
+    "image": xpath("//meta[@property='og:image']"),
+    "price_meta": xpath("//meta[@itemprop='price']"),
+    "price_container": xpath(f"//div[{contains_class('poly-price__current')}]"),
+    "price_fraction": xpath(f".//span[{contains_class('andes-money-amount__fraction')}]"),
+    "price_cents": xpath(f".//span[{contains_class('andes-money-amount__cents')}]"),
+    "original_previous": xpath(f"//span[{contains_class('andes-money-amount--previous')}]"),
+    "original_pdp": xpath(f"//span[{contains_class('ui-pdp-price__original-value')}]"),
+    "original_strike": xpath("//s"),
+    "json_ld": xpath("//script[@type='application/ld+json']"),
+}
+
+AFFILIATE_CURRENT_PRICE = re.compile(
+    r'"current_price"\s*:\s*\{[^}]*"value"\s*:\s*([\d.]+)'
+)
+AFFILIATE_PREVIOUS_PRICE = re.compile(
+    r'"previous_price"\s*:\s*\{[^}]*"value"\s*:\s*([\d.]+)'
+)
+
+
+async def resolve_url(url: str) -> str:
     """
     Resolve URLs encurtadas (amzn.to, bit.ly, /sec/, etc)
     """
-    try:
-        resp = requests.get(
-            url,
-            allow_redirects=True,
-            timeout=15,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            }
-        )
-        return resp.url
-    except Exception as e:
-        print("Erro ao resolver URL:", e)
-        return url
+    return await expand_url(url, timeout=15)
 
 
 def extract_prices_from_affiliate_json(html):
@@ -102,16 +67,10 @@ def extract_prices_from_affiliate_json(html):
     """
     try:
         # Preço atual
-        curr_match = re.search(
-            r'"current_price"\s*:\s*\{[^}]*"value"\s*:\s*([\d.]+)',
-            html
-        )
+        curr_match = AFFILIATE_CURRENT_PRICE.search(html)
 
         # Preço anterior
-        prev_match = re.search(
-            r'"previous_price"\s*:\s*\{[^}]*"value"\s*:\s*([\d.]+)',
-            html
-        )
+        prev_match = AFFILIATE_PREVIOUS_PRICE.search(html)
 
         curr = curr_match.group(1) if curr_match else None
         prev = prev_match.group(1) if prev_match else None
@@ -127,111 +86,157 @@ def extract_prices_from_affiliate_json(html):
     return None, None
 
 
-def get_ml_product_info(product_url, original_url=None):
+def parse_ml_page(html, resolved_url, doc=None):
+    """
+    Extrai título, imagem e preços do HTML de um produto ML.
+    doc: raiz já parseada (modo streaming), para não parsear duas vezes.
+    """
+    if doc is None:
+        doc = parse_html(html)
+
+    # ===============================
+    # TÍTULO
+    # ===============================
+    title = attr(first(doc, SELECTORS["title"]), "content") or "Produto Mercado Livre"
+
+    # ===============================
+    # IMAGEM
+    # ===============================
+    image = attr(first(doc, SELECTORS["image"]), "content") or None
+
+    # ===============================
+    # PREÇOS
+    # ===============================
+    price = None
+    original_value = None
+
+    # ✅ PRIORIDADE TOTAL PARA /sec/
+    if "/sec/" in resolved_url:
+        price, original_value = extract_prices_from_affiliate_json(html)
+
+    # ===============================
+    # PREÇO ATUAL (HTML fallback CORRIGIDO)
+    # ===============================
+    if not price:
+        price_content = attr(first(doc, SELECTORS["price_meta"]), "content")
+
+        if price_content:
+            price = f"R$ {normalize_price(price_content)}"
+        else:
+            current_container = first(doc, SELECTORS["price_container"])
+
+            if current_container is not None:
+                frac = first(current_container, SELECTORS["price_fraction"])
+                cents = first(current_container, SELECTORS["price_cents"])
+
+                if frac is not None:
+                    v = get_text(frac).strip()
+                    if cents is not None:
+                        v += f".{get_text(cents).strip()}"
+                    price = f"R$ {normalize_price(v)}"
+
+    # ===============================
+    # PREÇO ORIGINAL (HTML fallback)
+    # ===============================
+    if not original_value:
+        original_tag = None
+        for name in ("original_previous", "original_pdp", "original_strike"):
+            original_tag = first(doc, SELECTORS[name])
+            if original_tag is not None:
+                break
+
+        if original_tag is not None:
+            txt = get_text(original_tag).strip()
+            txt = txt.replace("R$", "").strip()
+            original_value = f"R$ {normalize_price(txt)}"
+
+    # ===============================
+    # JSON-LD (fallback final)
+    # ===============================
+    if not original_value:
+        ld_text = tag_string(first(doc, SELECTORS["json_ld"]))
+        if ld_text:
+            try:
+                data_ld = json.loads(ld_text)
+                offers = data_ld.get("offers", {})
+                high_price = offers.get("highPrice")
+                if high_price:
+                    original_value = f"R$ {normalize_price(str(high_price))}"
+            except Exception as e:
+                print("Erro JSON-LD:", e)
+
+    return {
+        "title": title,
+        "image": image,
+        "price": price,
+        "original_value": original_value,
+    }
+
+
+def _complete_match(pattern):
+    # O número pode estar cortado no fim do chunk: só vale se houver texto depois
+    def check(text):
+        match = pattern.search(text)
+        return match is not None and match.end() < len(text)
+    return check
+
+
+def ml_page_stream(encoding, resolved_url):
+    """
+    Campos que precisam aparecer para parar o download antes do fim.
+    O resultado é o mesmo do HTML completo: sempre vale o primeiro
+    elemento encontrado, como no parse_ml_page.
+    """
+    checks = {
+        "title": meta_check("property", "og:title"),
+        "image": meta_check("property", "og:image"),
+    }
+    text_checks = {}
+
+    if "/sec/" in resolved_url:
+        text_checks["current_price"] = _complete_match(AFFILIATE_CURRENT_PRICE)
+        text_checks["previous_price"] = _complete_match(AFFILIATE_PREVIOUS_PRICE)
+    else:
+        checks["price"] = meta_check("itemprop", "price", require_content=True)
+        checks["original"] = element_check(
+            "span", "class", "andes-money-amount--previous", substring=True
+        )
+
+    return PageStream(encoding, checks, text_checks)
+
+
+async def get_ml_product_info(product_url, original_url=None):
     """
     original_url: URL que o usuário enviou (encurtada ou não)
     product_url: URL resolvida para scraping
     """
     try:
         original_url = original_url or product_url
-        resolved_url = resolve_url(product_url)
+        with span("resolve", "mercadolivre"):
+            resolved_url = await resolve_url(product_url)
 
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
         }
 
-        resp = requests.get(resolved_url, headers=headers, timeout=15)
-        resp.raise_for_status()
-
-        html = resp.text
-        soup = BeautifulSoup(html, "html.parser")
-
-        # ===============================
-        # TÍTULO
-        # ===============================
-        title_tag = soup.find("meta", property="og:title")
-        title = (
-            title_tag["content"]
-            if title_tag and title_tag.get("content")
-            else "Produto Mercado Livre"
-        )
-
-        # ===============================
-        # IMAGEM
-        # ===============================
-        image_tag = soup.find("meta", property="og:image")
-        image = (
-            image_tag["content"]
-            if image_tag and image_tag.get("content")
-            else None
+        # fetch + parse (ou 304 do cache de páginas)
+        fields = await http_client.fetch_fields(
+            resolved_url,
+            lambda html, doc: parse_ml_page(html, resolved_url, doc),
+            store="mercadolivre",
+            tag=PAGE_CACHE_TAG,
+            make_stream=(
+                (lambda encoding: ml_page_stream(encoding, resolved_url))
+                if STREAM_FETCH else None
+            ),
+            headers=headers,
+            timeout=15
         )
-
-        # ===============================
-        # PREÇOS
-        # ===============================
-        price = None
-        original_value = None
-
-        # ✅ PRIORIDADE TOTAL PARA /sec/
-        if "/sec/" in resolved_url:
-            price, original_value = extract_prices_from_affiliate_json(html)
-
-        # ===============================
-        # PREÇO ATUAL (HTML fallback CORRIGIDO)
-        # ===============================
-        if not price:
-            price_meta = soup.find("meta", itemprop="price")
-
-            if price_meta and price_meta.get("content"):
-                price = f"R$ {normalize_price(price_meta['content'])}"
-            else:
-                current_container = soup.find(
-                    "div", class_=re.compile("poly-price__current")
-                )
-
-                if current_container:
-                    frac = current_container.find(
-                        "span", class_=re.compile("andes-money-amount__fraction")
-                    )
-                    cents = current_container.find(
-                        "span", class_=re.compile("andes-money-amount__cents")
-                    )
-
-                    if frac:
-                        v = frac.text.strip()
-                        if cents:
-                            v += f".{cents.text.strip()}"
-                        price = f"R$ {normalize_price(v)}"
-
-        # ===============================
-        # PREÇO ORIGINAL (HTML fallback)
-        # ===============================
-        if not original_value:
-            original_tag = (
-                soup.find("span", class_=re.compile("andes-money-amount--previous"))
-                or soup.find("span", class_=re.compile("ui-pdp-price__original-value"))
-                or soup.find("s")
-            )
-
-            if original_tag:
-                txt = original_tag.get_text().strip()
-                txt = txt.replace("R$", "").strip()
-                original_value = f"R$ {normalize_price(txt)}"
-
-        # ===============================
-        # JSON-LD (fallback final)
-        # ===============================
-        if not original_value:
-            ld_tag = soup.find("script", type="application/ld+json")
-            if ld_tag and ld_tag.string:
-                try:
-                    data_ld = json.loads(ld_tag.string)
-                    offers = data_ld.get("offers", {})
-                    high_price = offers.get("highPrice")
-                    if high_price:
-                        original_value = f"R$ {normalize_price(str(high_price))}"
-                except Exception as e:
-                    print("Erro JSON-LD:", e)
+        title = fields["title"]
+        image = fields["image"]
+        price = fields["price"]
+        original_value = fields["original_value"]
+        start_caption(title, price, "Mercado Livre")
 
         # ===============================
         # CAPTION
@@ -260,6 +265,9 @@ def get_ml_product_info(product_url, original_url=None):
             "caption": caption,
         }
 
+    except (BlockedPage, CircuitOpenError):
+        raise
+
     except Exception as e:
         print("Erro ML:", e)
         return {
@@ -273,11 +281,16 @@ def get_ml_product_info(product_url, original_url=None):
 
 
 if __name__ == "__main__":
-    # Testes
-    print("Teste 1 (link completo):")
-    url1 = "https://www.mercadolivre.com.br/bicicleta-ergometrica-para-spinning-mecanica-roda-de-inercia-18kg-pace6000-odin-fit/p/MLB53188187"
-    print(get_ml_product_info(url1))
-    
-    print("\n\nTeste 2 (link /sec/):")
-    url2 = "https://mercadolivre.com/sec/2DeMaJG"
-    print(get_ml_product_info(url2))
+    async def _main():
+        # Testes
+        print("Teste 1 (link completo):")
+        url1 = "https://www.mercadolivre.com.br/bicicleta-ergometrica-para-spinning-mecanica-roda-de-inercia-18kg-pace6000-odin-fit/p/MLB53188187"
+        print(await get_ml_product_info(url1))
+
+        print("\n\nTeste 2 (link /sec/):")
+        url2 = "https://mercadolivre.com/sec/2DeMaJG"
+        print(await get_ml_product_info(url2))
+
+        await http_client.shutdown()
+
+    asyncio.run(_main())
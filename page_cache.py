@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import tempfile
+import threading
+
+# ===============================
+# CACHE HTTP CONDICIONAL (DISCO)
+# ===============================
+# Por URL de página de produto: validadores (ETag / Last-Modified), o
+# HTML comprimido e os campos já extraídos. No próximo fetch vão
+# If-None-Match / If-Modified-Since; se a loja responder 304, os campos
+# salvos voltam sem baixar nem parsear a página de novo.
+# Página lida só até os campos (streaming) fica sem HTML (body vazio).
+# SQLite (stdlib): um arquivo, LRU por tamanho total e idade máxima.
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") == "1"
+PAGE_CACHE_PATH = os.getenv(
+    "PAGE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "afiliados_page_cache.sqlite3")
+)
+PAGE_CACHE_MAX_BYTES = int(float(os.getenv("PAGE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# Passou disso desde o download: baixa e extrai de novo mesmo com 304
+PAGE_CACHE_MAX_AGE = float(os.getenv("PAGE_CACHE_MAX_AGE", str(3 * 86400)))
+PAGE_CACHE_COMPRESSION = int(os.getenv("PAGE_CACHE_COMPRESSION", "6"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    tag TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fields TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_used_at ON pages (used_at);
+"""
+
+
+class PageEntry:
+    __slots__ = ("url", "tag", "etag", "last_modified", "fields", "body", "stored_at")
+
+    def __init__(self, url, tag, etag, last_modified, fields, body, stored_at):
+        self.url = url
+        self.tag = tag
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fields = fields
+        self.body = body
+        self.stored_at = stored_at
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def has_body(self) -> bool:
+        return bool(self.body)
+
+    def text(self) -> str:
+        return zlib.decompress(self.body).decode("utf-8")
+
+
+class PageCache:
+    """
+    Operações síncronas no SQLite rodam numa thread (asyncio.to_thread)
+    com um lock; qualquer erro de disco vira miss, nunca falha o scrape.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_age: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._db = None
+        self._lock = threading.Lock()
+        self.entries = 0
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    # -------------------
+    # SQLITE (THREAD)
+    # -------------------
+    def _connect(self):
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+            self._purge_expired()
+        return self._db
+
+    def _recount(self):
+        self.entries, self.total_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()
+
+    def _purge_expired(self):
+        deleted = self._db.execute(
+            "DELETE FROM pages WHERE stored_at < ?", (time.time() - self.max_age,)
+        ).rowcount
+        self.expired += deleted
+        self._recount()
+
+    def _lookup(self, url):
+        row = self._connect().execute(
+            "SELECT tag, etag, last_modified, fields, body, stored_at FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        tag, etag, last_modified, fields, body, stored_at = row
+        if stored_at < time.time() - self.max_age:
+            self._delete(url)
+            self.expired += 1
+            return None
+
+        return PageEntry(url, tag, etag, last_modified, json.loads(fields), body, stored_at)
+
+    def _delete(self, url):
+        row = self._db.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self.entries -= 1
+            self.total_bytes -= row[0]
+
+    def _touch(self, url):
+        self._connect().execute(
+            "UPDATE pages SET used_at = ? WHERE url = ?", (time.time(), url)
+        )
+
+    def _store(self, url, tag, etag, last_modified, fields, body, stored_at):
+        db = self._connect()
+        fields_json = json.dumps(fields, ensure_ascii=False)
+        size = len(body) + len(fields_json)
+
+        self._delete(url)
+        db.execute(
+            "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, tag, etag, last_modified, fields_json, body, size, stored_at, time.time()),
+        )
+        self.entries += 1
+        self.total_bytes += size
+        self.stores += 1
+
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _store_page(self, url, tag, etag, last_modified, fields, text):
+        # compressão também fora do event loop
+        body = zlib.compress(text.encode("utf-8"), PAGE_CACHE_COMPRESSION) if text is not None else b""
+        self._store(url, tag, etag, last_modified, fields, body, time.time())
+
+    def _evict(self):
+        # sai o menos usado até sobrar 10% de folga
+        self._purge_expired()
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target and self.entries:
+            victims = self._db.execute(
+                "SELECT url, size FROM pages ORDER BY used_at LIMIT 64"
+            ).fetchall()
+            self._db.executemany("DELETE FROM pages WHERE url = ?", [(u,) for u, _ in victims])
+            self.entries -= len(victims)
+            self.total_bytes -= sum(size for _, size in victims)
+            self.evictions += len(victims)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    async def _run(self, fn, *args, default=None):
+        try:
+            return await asyncio.to_thread(self._locked, fn, *args)
+        except (sqlite3.Error, OSError, ValueError, zlib.error) as e:
+            self.errors += 1
+            print("⚠️ Erro no cache de páginas:", e)
+            return default
+
+    # -------------------
+    # API
+    # -------------------
+    async def lookup(self, url: str) -> PageEntry | None:
+        return await self._run(self._lookup, url)
+
+    async def revalidated(self, entry: PageEntry, tag: str, extract) -> dict | None:
+        """
+        304: devolve os campos salvos. Se o extrator mudou (tag), extrai
+        de novo do HTML guardado, sem ir à loja; sem HTML guardado,
+        None (quem chamou baixa a página inteira).
+        """
+        if entry.tag != tag:
+            if not entry.has_body():
+                return None
+            self.hits += 1
+            fields = extract(entry.text(), None)
+            await self._run(
+                self._store, entry.url, tag, entry.etag, entry.last_modified,
+                fields, entry.body, entry.stored_at,
+            )
+            return fields
+
+        self.hits += 1
+        await self._run(self._touch, entry.url)
+        return entry.fields
+
+    async def store(self, url: str, tag: str, headers, text: str | None, fields: dict):
+        """
+        Página baixada (200): conta como miss e guarda se tiver validador.
+        text=None: só o começo da página foi lido; guarda só os campos.
+        """
+        self.misses += 1
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not (etag or last_modified) or not isinstance(fields, dict):
+            return  # sem validador não há como revalidar
+
+        await self._run(self._store_page, url, tag, etag, last_modified, fields, text)
+
+    async def clear(self):
+        def _clear():
+            self._connect().execute("DELETE FROM pages")
+            self._recount()
+        await self._run(_clear)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self.entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+page_cache = PageCache(PAGE_CACHE_PATH, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_MAX_AGE)
+
+
+def page_cache_stats() -> dict:
+    return {"enabled": PAGE_CACHE_ENABLED, **page_cache.stats()}
@@ -0,0 +1,376 @@
+import os
+import math
+import time
+import heapq
+import random
+import asyncio
+import inspect
+from collections import OrderedDict, deque
+
+from stores import get_adapter
+from ratelimit import TokenBucket
+from prices import parse_price
+from product_cache import store_result
+
+# ===============================
+# REFRESH DE PREÇOS EM SEGUNDO PLANO
+# ===============================
+# Todo produto que passa pelo /scrape (ou bot) vira "acompanhado". Cada
+# loja tem uma fila de prioridade pelo próximo horário de checagem:
+# produtos populares voltam antes, os esquecidos espaçam até o máximo.
+# Um worker por loja consome a fila no ritmo do próprio token bucket
+# (sem rajadas) e emite um evento quando o preço muda.
+PRICE_REFRESH_ENABLED = os.getenv("PRICE_REFRESH", "0") == "1"
+PRICE_REFRESH_INTERVAL = float(os.getenv("PRICE_REFRESH_INTERVAL", "21600"))
+PRICE_REFRESH_MIN_INTERVAL = float(os.getenv("PRICE_REFRESH_MIN_INTERVAL", "1800"))
+PRICE_REFRESH_MAX_INTERVAL = float(os.getenv("PRICE_REFRESH_MAX_INTERVAL", "86400"))
+PRICE_REFRESH_MAX_ITEMS = int(os.getenv("PRICE_REFRESH_MAX_ITEMS", "50000"))
+PRICE_REFRESH_CONCURRENCY = int(os.getenv("PRICE_REFRESH_CONCURRENCY", "2"))
+PRICE_REFRESH_SHOPEE_BATCH = int(os.getenv("PRICE_REFRESH_SHOPEE_BATCH", "20"))
+# Link morto / bloqueado: após N checagens seguidas sem preço, sai do
+# acompanhamento (não gasta o orçamento da loja para sempre)
+PRICE_REFRESH_MAX_FAILURES = int(os.getenv("PRICE_REFRESH_MAX_FAILURES", "5"))
+
+# Requests por segundo que o refresh pode gastar em cada loja
+# (um lote Shopee conta como um request)
+PRICE_REFRESH_RPS = {
+    "shopee": float(os.getenv("PRICE_REFRESH_RPS_SHOPEE", "0.5")),
+    "mercadolivre": float(os.getenv("PRICE_REFRESH_RPS_ML", "1")),
+    "magalu": float(os.getenv("PRICE_REFRESH_RPS_MAGALU", "0.5")),
+    "amazon": float(os.getenv("PRICE_REFRESH_RPS_AMAZON", "0.2")),
+}
+
+RECENT_EVENTS = int(os.getenv("PRICE_REFRESH_RECENT_EVENTS", "500"))
+
+
+class TrackedProduct:
+    __slots__ = (
+        "key", "store", "url", "app_id", "secret",
+        "price", "cents", "title", "hits", "checked_at", "due", "version",
+        "failures",
+    )
+
+    def __init__(self, key, store, url, app_id=None, secret=None):
+        self.key = key
+        self.store = store
+        self.url = url
+        self.app_id = app_id
+        self.secret = secret
+        self.price = None
+        self.cents = None
+        self.title = None
+        self.hits = 0
+        self.checked_at = time.monotonic()
+        self.due = 0.0
+        self.version = 0
+        self.failures = 0
+
+
+def refresh_interval(hits: int) -> float:
+    """
+    Mais acessos -> checa mais vezes (escala log), com ±10% de jitter
+    para produtos acompanhados juntos não vencerem juntos.
+    """
+    interval = PRICE_REFRESH_INTERVAL / (1 + math.log2(1 + hits))
+    interval = min(PRICE_REFRESH_MAX_INTERVAL, max(PRICE_REFRESH_MIN_INTERVAL, interval))
+    return interval * random.uniform(0.9, 1.1)
+
+
+def _price_of(result: dict):
+    price = result.get("price") or result.get("price_pix")
+    return price, parse_price(price)
+
+
+class PriceRefresher:
+    def __init__(self, budgets: dict):
+        self._items = OrderedDict()
+        self._heaps = {store: [] for store in budgets}
+        self._wakeups = {store: asyncio.Event() for store in budgets}
+        self._budgets = {
+            # burst 1: um request por vez, espaçado pelo rate
+            store: TokenBucket(rate, burst=1) for store, rate in budgets.items()
+        }
+        self._workers = []
+        self._inflight = set()
+        self._listeners = []
+        self._seq = 0
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self.checks = 0
+        self.changes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    # -------------------
+    # ACOMPANHAMENTO
+    # -------------------
+    def track(self, key, store, url, result, app_id=None, secret=None):
+        """
+        Chamado a cada scrape bem-sucedido: registra o produto (ou soma
+        popularidade) e agenda a próxima checagem. Erro, bloqueio ou
+        resultado sem preço não entram.
+        """
+        if key is None or store not in self._heaps or not isinstance(result, dict):
+            return
+        if result.get("error") or result.get("stale"):
+            return
+
+        price, cents = _price_of(result)
+        if cents is None:
+            return
+
+        item = self._items.get(key)
+        if item is None:
+            item = TrackedProduct(key, store, url, app_id, secret)
+            self._items[key] = item
+            while len(self._items) > PRICE_REFRESH_MAX_ITEMS:
+                # o menos recente sai; as entradas dele no heap são ignoradas
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+
+        item.hits += 1
+        item.url = url
+        if app_id and secret:
+            item.app_id, item.secret = app_id, secret
+
+        item.price, item.cents = price, cents
+        item.title = result.get("title") or result.get("name")
+        item.checked_at = time.monotonic()
+        item.failures = 0
+
+        self._schedule(item, item.checked_at + refresh_interval(item.hits))
+
+    def _schedule(self, item, due):
+        item.version += 1
+        item.due = due
+        self._seq += 1
+
+        heap = self._heaps[item.store]
+        heapq.heappush(heap, (due, self._seq, item.key, item.version))
+        if len(heap) > 2 * len(self._items) + 1000:
+            self._compact(item.store)
+
+        self._wakeups[item.store].set()
+
+    def _compact(self, store):
+        # reagendamentos deixam entradas velhas no heap: refaz só com as vivas
+        heap = [
+            entry for entry in self._heaps[store]
+            if (item := self._items.get(entry[2])) is not None and item.version == entry[3]
+        ]
+        heapq.heapify(heap)
+        self._heaps[store] = heap
+
+    def _pop_due(self, store, now, limit=1) -> list:
+        heap = self._heaps[store]
+        due = []
+        while heap and len(due) < limit:
+            when, _, key, version = heap[0]
+            item = self._items.get(key)
+            if item is None or item.version != version:
+                heapq.heappop(heap)  # entrada antiga (reagendado ou removido)
+                continue
+            if when > now:
+                break
+            heapq.heappop(heap)
+            due.append(item)
+        return due
+
+    def _next_due(self, store):
+        heap = self._heaps[store]
+        while heap:
+            when, _, key, version = heap[0]
+            item = self._items.get(key)
+            if item is not None and item.version == version:
+                return when
+            heapq.heappop(heap)
+        return None
+
+    # -------------------
+    # EVENTOS
+    # -------------------
+    def subscribe(self, callback):
+        """
+        callback(evento) síncrono ou async, chamado a cada mudança de preço.
+        """
+        self._listeners.append(callback)
+
+    async def _emit(self, event):
+        self.changes += 1
+        self.events.append(event)
+        print(
+            f"💸 Preço mudou ({event['store']}): {event['title']} "
+            f"{event['old_price']} -> {event['new_price']}"
+        )
+        for callback in self._listeners:
+            try:
+                outcome = callback(event)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            except Exception as e:
+                print("⚠️ Erro no listener de preço:", e)
+
+    # -------------------
+    # WORKERS
+    # -------------------
+    async def _apply(self, item, result):
+        self.checks += 1
+        price, cents = None, None
+        if isinstance(result, dict) and not result.get("error"):
+            price, cents = _price_of(result)
+
+        if cents is None:
+            self.failures += 1
+            item.failures += 1
+            if item.failures >= PRICE_REFRESH_MAX_FAILURES:
+                # as entradas dele no heap passam a ser ignoradas
+                if self._items.get(item.key) is item:
+                    del self._items[item.key]
+                self.dropped += 1
+                print(f"🗑️ Refresh de preço desistiu de {item.url} ({item.failures} falhas)")
+                return
+
+            # falhou: tenta de novo mais tarde (espaçando), sem evento
+            delay = min(
+                PRICE_REFRESH_MAX_INTERVAL,
+                PRICE_REFRESH_MIN_INTERVAL * 2 ** (item.failures - 1),
+            )
+            self._schedule(item, time.monotonic() + delay)
+            return
+
+        item.failures = 0
+        store_result(item.key, result)
+        old_price, old_cents = item.price, item.cents
+        item.price, item.cents = price, cents
+        item.title = result.get("title") or result.get("name") or item.title
+        item.checked_at = time.monotonic()
+        self._schedule(item, item.checked_at + refresh_interval(item.hits))
+
+        if old_cents is not None and old_cents != cents:
+            await self._emit({
+                "key": list(item.key[:2]),
+                "store": item.store,
+                "url": item.url,
+                "title": item.title,
+                "old_price": old_price,
+                "new_price": price,
+                "old_cents": old_cents,
+                "new_cents": cents,
+                "change_pct": round((cents - old_cents) / old_cents * 100, 2) if old_cents else None,
+                "at": time.time(),
+            })
+
+    async def _refresh_one(self, item):
+        try:
+            adapter = get_adapter(item.store)
+            result = await adapter.fetch(item.url, app_id=item.app_id, secret=item.secret)
+        except Exception as e:
+            print("⚠️ Erro no refresh de preço:", item.url, e)
+            result = None
+        await self._apply(item, result)
+
+    async def _refresh_shopee(self, items):
+        """
+        Vários produtos Shopee da mesma conta numa consulta GraphQL em lote.
+        """
+        groups = {}
+        for item in items:
+            groups.setdefault((item.app_id, item.secret), []).append(item)
+
+        shopee_api = get_adapter("shopee").module
+        for (app_id, secret), group in groups.items():
+            try:
+                results = await shopee_api.get_shopee_products_info(
+                    [item.url for item in group], app_id, secret
+                )
+            except Exception as e:
+                print("⚠️ Erro no refresh Shopee:", e)
+                results = [None] * len(group)
+
+            for item, result in zip(group, results):
+                await self._apply(item, result)
+
+    async def _worker(self, store):
+        heap_wakeup = self._wakeups[store]
+        budget = self._budgets[store]
+        slots = asyncio.Semaphore(PRICE_REFRESH_CONCURRENCY)
+        batch = PRICE_REFRESH_SHOPEE_BATCH if store == "shopee" else 1
+
+        while True:
+            heap_wakeup.clear()
+            next_due = self._next_due(store)
+            now = time.monotonic()
+
+            if next_due is None or next_due > now:
+                timeout = None if next_due is None else next_due - now
+                try:
+                    await asyncio.wait_for(heap_wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await budget.acquire()
+            await slots.acquire()
+
+            items = self._pop_due(store, time.monotonic(), batch)
+            if not items:
+                slots.release()
+                continue
+
+            if store == "shopee":
+                job = self._refresh_shopee(items)
+            else:
+                job = self._refresh_one(items[0])
+
+            task = asyncio.create_task(job)
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(store)) for store in self._heaps
+        ]
+        print(f"🔁 Refresh de preços ativo ({len(self._items)} produtos)")
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for task in workers + list(self._inflight):
+            task.cancel()
+        await asyncio.gather(*workers, *self._inflight, return_exceptions=True)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "running": bool(self._workers),
+            "tracked": len(self._items),
+            "due": {
+                store: sum(1 for when, _, key, version in heap
+                           if when <= now and key in self._items
+                           and self._items[key].version == version)
+                for store, heap in self._heaps.items()
+            },
+            "checks": self.checks,
+            "changes": self.changes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "refreshing": len(self._inflight),
+        }
+
+
+refresher = PriceRefresher(PRICE_REFRESH_RPS)
+
+
+def track(key, store, url, result, app_id=None, secret=None):
+    if PRICE_REFRESH_ENABLED:
+        refresher.track(key, store, url, result, app_id, secret)
+
+
+def price_refresh_stats() -> dict:
+    return refresher.stats()
+
+
+def recent_price_changes(limit: int = 50) -> list:
+    return list(refresher.events)[-limit:][::-1]
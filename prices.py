@@ -0,0 +1,238 @@
+import re
+
+# ===============================
+# PREÇOS (CENTAVOS INTEIROS)
+# ===============================
+# Todas as lojas passam por aqui: parse_price transforma o texto em
+# centavos (int) e format_brl formata em BRL. normalize_price (ML),
+# format_price (Shopee) e tidy_price_text (Magalu) mantêm exatamente a
+# saída das versões antigas; nos formatos mais comuns elas vão direto ao
+# texto final (fatiando a string, ou num único f-string do float), o que
+# é mais rápido que passar por centavos e formatar de novo.
+
+# Número "simples" (até 13 dígitos inteiros e 2 decimais) vira centavos
+# sem passar por float: nesse tamanho o double não perde nenhum dígito,
+# então o resultado é o mesmo do f"{float(x):.2f}".
+_MAX_PLAIN_DIGITS = 13
+_MAX_EXACT_INT = 10 ** _MAX_PLAIN_DIGITS
+
+_PRICE_NOISE = re.compile(r"R\$|\s")
+
+# Magalu quebra o preço em vários nós: 'R$ 202 , 39'
+_SPACED_COMMA = re.compile(r"\s*,\s*")
+_SPACED_SYMBOL = re.compile(r"R\$\s+")
+
+
+def _to_cents(number) -> int | None:
+    """
+    Centavos de float(number), com o mesmo arredondamento do f"{x:.2f}".
+    None se não for número finito (ou se der -0,00).
+    """
+    kind = number.__class__
+    if kind is int and -_MAX_EXACT_INT < number < _MAX_EXACT_INT:
+        return number * 100
+
+    if kind is float:
+        # repr é o menor texto que volta ao mesmo double: "79.9"
+        number = repr(number)
+        kind = str
+
+    if kind is str:
+        whole, _, frac = number.partition(".")
+        if (
+            whole.isdecimal()
+            and len(whole) <= _MAX_PLAIN_DIGITS
+            and len(frac) <= 2
+            and (not frac or frac.isdecimal())
+        ):
+            if len(frac) == 2:
+                return int(whole) * 100 + int(frac)
+            if frac:
+                return int(whole) * 100 + int(frac) * 10
+            return int(whole) * 100
+
+    # Resto ("1e3", " 12.5 ", "5123.45678", ints enormes): o próprio
+    # f-string arredonda, então o resultado bate com a versão antiga
+    try:
+        fixed = f"{float(number):.2f}"
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+    if not fixed[-1].isdigit() or fixed == "-0.00":
+        # inf/nan e -0,00 ficam com o texto do float
+        return None
+
+    return int(fixed.replace(".", ""))
+
+
+def _fix_separators(value: str) -> str:
+    """
+    Converte separadores BR/EN para o formato do float ("1745.03").
+    """
+    dot_count = value.count(".")
+    comma_count = value.count(",")
+
+    # "1.745,03": ponto de milhar, vírgula decimal
+    if comma_count and dot_count:
+        return value.replace(".", "").replace(",", ".")
+
+    # "1745,03" / "48,90"
+    if comma_count:
+        return value.replace(",", ".")
+
+    if dot_count > 1:
+        # "1.745.320"
+        return value.replace(".", "")
+
+    if dot_count:
+        whole, _, frac = value.partition(".")
+        # "1745.03" decimal; "1.745" milhar; "48.9" decimal
+        if len(frac) == 2 or (len(frac) != 3 and len(whole) <= 3):
+            return value
+        return value.replace(".", "")
+
+    return value
+
+
+def parse_price(value) -> int | None:
+    """
+    Qualquer formato das lojas -> centavos.
+    "R$ 1.745,03" -> 174503 | "1745.03" -> 174503 | "48.9" -> 4890
+    "R$ 202 , 39" -> 20239 | 79.9 -> 7990 | inválido -> None
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, (int, float)):
+        return _to_cents(value)
+
+    return _to_cents(_fix_separators(_PRICE_NOISE.sub("", str(value))))
+
+
+def parse_prices(values) -> list[int | None]:
+    """
+    parse_price com cache de deduplicação: cada texto distinto é
+    convertido uma vez só. Compensa quando a entrada repete muito (ex.:
+    histórico de preços de um produto); com textos quase todos
+    distintos o dict só custa (~20% mais lento que um a um), então aí
+    use [parse_price(v) for v in values]. Uma amostra do começo não
+    serve para decidir: no histórico as repetições vêm espalhadas.
+    """
+    try:
+        unique = dict.fromkeys(values)
+    except TypeError:
+        return [parse_price(value) for value in values]
+
+    for value in unique:
+        unique[value] = parse_price(value)
+
+    return [unique[value] for value in values]
+
+
+# ===============================
+# FORMATAÇÃO BRL
+# ===============================
+def format_number(cents: int) -> str:
+    """
+    174503 -> "1.745,03"
+    """
+    if cents < 0:
+        return "-" + format_number(-cents)
+    if cents < 100_000:
+        # sem separador de milhar (caso mais comum)
+        whole, frac = divmod(cents, 100)
+        return f"{whole},{frac:02d}"
+    whole, frac = divmod(cents, 100)
+    return f"{whole:_},{frac:02d}".replace("_", ".")
+
+
+def format_brl(cents: int | None) -> str | None:
+    """
+    174503 -> "R$ 1.745,03"
+    """
+    if cents is None:
+        return None
+    return f"R$ {format_number(cents)}"
+
+
+def _format_float(number: float) -> str:
+    # inf/nan/-0.0: mesmo texto que o f-string sempre gerou
+    return f"{number:_.2f}".replace(".", ",").replace("_", ".")
+
+
+def _format_plain(whole: str, frac: str) -> str | None:
+    """
+    Caminho rápido do formato mais comum ("1745" + "03" -> "1.745,03"):
+    só fatia o texto, sem int/float. None se não couber (zeros à
+    esquerda, milhões ou mais, não dígitos).
+    """
+    if whole.isdigit() and frac.isdigit() and (whole[0] != "0" or len(whole) == 1):
+        if len(whole) <= 3:
+            return f"{whole},{frac}"
+        if len(whole) <= 6:
+            return f"{whole[:-3]}.{whole[-3:]},{frac}"
+    return None
+
+
+# ===============================
+# CONTRATOS POR LOJA
+# ===============================
+def normalize_price(value):
+    """
+    Mercado Livre: normaliza preços de diferentes formatos para 'X.XXX,XX'
+    (sem o "R$"). Se não for número, devolve o texto limpo.
+
+    - "1745.03" (API/JSON decimal inglês) → "1.745,03"
+    - "1.745,03" (formato BR) → "1.745,03"
+    - "1745" → "1.745,00"
+    - "48.9" (decimal inglês) → "48,90"
+    - "48,90" (BR) → "48,90"
+    """
+    if not value:
+        return value
+
+    value = str(value).strip().replace("R$", "").replace(" ", "")
+
+    # "1745.03" / "48,90" / "1.745,03" (ASCII: dígitos de outras
+    # escritas ficam com o caminho geral)
+    if len(value) > 3 and value.isascii():
+        separator = value[-3]
+        if separator == "," or separator == ".":
+            whole = value[:-3]
+            if separator == ",":
+                whole = whole.replace(".", "")
+            text = _format_plain(whole, value[-2:])
+            if text is not None:
+                return text
+
+    # resto: mesma conta de float da versão antiga
+    value = _fix_separators(value)
+    try:
+        return _format_float(float(value))
+    except ValueError:
+        return value
+
+
+def format_price(value):
+    """
+    Shopee: preço numérico da API -> "R$ X.XXX,XX" (None se inválido).
+    """
+    # um passo só: o f-string do float arredonda exatamente como a
+    # versão antiga, então aqui não vale o desvio por centavos
+    try:
+        return f"R$ {_format_float(float(value))}"
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def tidy_price_text(text: str | None) -> str | None:
+    """
+    Magalu: corrige preços quebrados 'R$ 202 , 39' -> 'R$ 202,39'.
+    """
+    if not text:
+        return text
+
+    text = _SPACED_COMMA.sub(",", text)
+    text = _SPACED_SYMBOL.sub("R$ ", text)
+
+    return text.strip()
@@ -0,0 +1,159 @@
+import os
+import re
+import time
+import asyncio
+from urllib.parse import urlsplit, parse_qsl
+
+from cache import TTLCache
+
+# ===============================
+# CACHE DE PRODUTOS
+# ===============================
+# Chave canônica (loja, id do produto): links diferentes para o mesmo
+# item compartilham a mesma entrada. Entradas vencidas continuam
+# servindo por PRODUCT_CACHE_STALE_TTL enquanto um refresh roda em
+# segundo plano (stale-while-revalidate).
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "600"))
+PRODUCT_CACHE_STALE_TTL = float(os.getenv("PRODUCT_CACHE_STALE_TTL", "3600"))
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "5000"))
+# Último resultado bom, servido quando a loja está fora (circuit breaker)
+PRODUCT_CACHE_FALLBACK_TTL = float(os.getenv("PRODUCT_CACHE_FALLBACK_TTL", "86400"))
+
+_cache = TTLCache(
+    maxsize=PRODUCT_CACHE_SIZE,
+    ttl=PRODUCT_CACHE_TTL + PRODUCT_CACHE_STALE_TTL,
+)
+
+_last_good = TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_FALLBACK_TTL)
+
+_refreshing: dict[tuple, asyncio.Task] = {}
+stale_served = 0
+
+# ===============================
+# IDS CANÔNICOS
+# ===============================
+PRODUCT_ID_PATTERNS = {
+    "mercadolivre": [
+        re.compile(r"/p/(MLB\d+)", re.I),
+        re.compile(r"(MLB)-?(\d+)", re.I),
+    ],
+    "shopee": [
+        re.compile(r"-i\.\d+\.(\d+)"),
+        re.compile(r"/product/\d+/(\d+)"),
+    ],
+    "magalu": [
+        re.compile(r"/p/([a-z0-9]+)/", re.I),
+    ],
+    "amazon": [
+        re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})", re.I),
+    ],
+}
+
+
+# Parâmetros que identificam o afiliado no link: o resultado em cache
+# carrega url/caption do primeiro pedido, então cada afiliado tem a sua
+# entrada (a comissão não pode ir para o link de outra pessoa)
+AFFILIATE_PARAMS = {
+    "mercadolivre": ("matt_tool", "matt_word"),
+    "amazon": ("tag", "ascsubtag"),
+}
+
+
+def _affiliate_id(store: str | None, url: str) -> str:
+    params = AFFILIATE_PARAMS.get(store)
+    if not params:
+        return ""
+    query = parse_qsl(urlsplit(url).query)
+    return "&".join(sorted(f"{k}={v}" for k, v in query if k in params))
+
+
+def product_key(store: str | None, url: str, app_id: str | None = None):
+    """
+    Retorna (loja, id) ou None se não reconhecer o produto.
+    Na Shopee o link afiliado depende da conta, então o app_id entra na
+    chave; no ML e na Amazon entram os parâmetros de afiliado da URL.
+    """
+    for pattern in PRODUCT_ID_PATTERNS.get(store, []):
+        match = pattern.search(url)
+        if match:
+            product_id = "".join(match.groups()).upper()
+            if store == "shopee":
+                return (store, product_id, app_id)
+            affiliate = _affiliate_id(store, url)
+            if affiliate:
+                return (store, product_id, affiliate)
+            return (store, product_id)
+    return None
+
+
+def is_cacheable(result) -> bool:
+    # Não guarda erros nem páginas sem preço
+    return (
+        isinstance(result, dict)
+        and not result.get("error")
+        and bool(result.get("price") or result.get("price_pix"))
+    )
+
+
+def store_result(key, result):
+    if key is not None and is_cacheable(result):
+        _cache.set(key, (result, time.monotonic() + PRODUCT_CACHE_TTL))
+        _last_good.set(key, result)
+
+
+def last_good(key):
+    """
+    Último resultado bom do produto (mesmo vencido), ou None.
+    """
+    if key is None:
+        return None
+    result = _last_good.get(key)
+    return dict(result) if result is not None else None
+
+
+async def _refresh(key, fetch):
+    try:
+        store_result(key, await fetch())
+    except Exception as e:
+        print("⚠️ Erro ao atualizar cache de produto:", key, e)
+    finally:
+        _refreshing.pop(key, None)
+
+
+async def get_or_fetch(key, fetch):
+    """
+    fetch: função async sem argumentos que faz o scrape de verdade.
+    """
+    global stale_served
+
+    if key is None:
+        return await fetch()
+
+    entry = _cache.get(key)
+
+    if entry is not None:
+        result, fresh_until = entry
+
+        if fresh_until <= time.monotonic():
+            stale_served += 1
+            if key not in _refreshing:
+                _refreshing[key] = asyncio.create_task(_refresh(key, fetch))
+
+        return dict(result)
+
+    result = await fetch()
+    store_result(key, result)
+    return result
+
+
+def product_cache_stats() -> dict:
+    return {
+        **_cache.stats(),
+        "stale_served": stale_served,
+        "refreshing": len(_refreshing),
+    }
+
+
+def clear_product_cache():
+    _cache.clear()
+    _last_good.clear()
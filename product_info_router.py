@@ -1,40 +1,309 @@
-from shopee_api import get_shopee_product_info
-from ml_api import get_ml_product_info
+import os
+import asyncio
+
+from stores import store_for_url, adapter_for_url, get_adapter
 from url_resolver import expand_url
+from product_cache import product_key, get_or_fetch, is_cacheable, last_good
+from ratelimit import CircuitOpenError
+from singleflight import SingleFlight, canonical_url
+from metrics import span, SCRAPES_IN_FLIGHT
+from block_detect import BlockedPage, blocked_error
+import aiml_ai
+import price_refresh
+
+# ===============================
+# LIMITES DE CONCORRÊNCIA POR LOJA
+# ===============================
+STORE_LIMITS = {
+    "shopee": int(os.getenv("BATCH_LIMIT_SHOPEE", "5")),
+    "mercadolivre": int(os.getenv("BATCH_LIMIT_ML", "10")),
+    "magalu": int(os.getenv("BATCH_LIMIT_MAGALU", "5")),
+    "amazon": int(os.getenv("BATCH_LIMIT_AMAZON", "3")),
+}
+DEFAULT_STORE_LIMIT = 5
+
+# Janela para juntar os fetches Shopee de um lote numa chamada GraphQL
+SHOPEE_BULK_WAIT = float(os.getenv("SHOPEE_BULK_WAIT_MS", "50")) / 1000
+
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+_inflight = SingleFlight()
+
+# Erros em que vale devolver o último resultado bom (marcado stale)
+FALLBACK_CODES = {"blocked", "unavailable"}
+
+
+def _store_semaphore(store: str | None) -> asyncio.Semaphore:
+    key = store or "outros"
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(
+            STORE_LIMITS.get(key, DEFAULT_STORE_LIMIT)
+        )
+    return _semaphores[key]
 
 
-def get_product_info(
+async def get_product_info(
     url: str,
     app_id: str | None = None,
-    secret: str | None = None
+    secret: str | None = None,
+    shopee_bulk=None
+):
+    """
+    shopee_bulk: ShopeeBulk do lote; o fetch Shopee sai em GraphQL em lote.
+    """
+    # 🤝 links idênticos em paralelo compartilham o mesmo scrape
+    url = canonical_url(url)
+    return await _inflight.do(
+        (url, app_id),
+        lambda: _get_product_info(url, app_id, secret, shopee_bulk)
+    )
+
+
+async def _get_product_info(
+    url: str,
+    app_id: str | None,
+    secret: str | None,
+    shopee_bulk=None
 ):
     # 🔥 resolve link curto
-    final_url = expand_url(url)
-    url_lower = final_url.lower()
-
-    # ===============================
-    # SHOPEE
-    # ===============================
-    if "shopee" in url_lower:
-        if not app_id or not secret:
-            return {
-                "error": True,
-                "message": "Configuração Shopee não encontrada"
-            }
-
-        return get_shopee_product_info(
-            product_url=final_url,
-            app_id=app_id,
-            secret=secret
+    with span("expand_url", store_for_url(url)):
+        final_url = await expand_url(url)
+    adapter = adapter_for_url(final_url)
+
+    if adapter is None:
+        return {
+            "error": True,
+            "message": "Loja não suportada"
+        }
+
+    if adapter.needs_credentials and (not app_id or not secret):
+        return {
+            "error": True,
+            "message": "Configuração Shopee não encontrada"
+        }
+
+    # 🗃️ cache por produto (loja + id canônico)
+    key = product_key(adapter.name, final_url, app_id)
+
+    fetch = adapter.fetch
+    if shopee_bulk is not None and adapter.name == "shopee":
+        fetch = shopee_bulk.fetch
+
+    result = await get_or_fetch(
+        key,
+        lambda: _scrape(adapter, fetch, final_url, app_id, secret)
+    )
+
+    # 🧯 loja fora do ar (circuit breaker aberto) ou pedindo captcha:
+    # último resultado bom
+    if not is_cacheable(result) and result.get("code") in FALLBACK_CODES:
+        fallback = last_good(key)
+        if fallback is not None:
+            fallback["stale"] = True
+            return fallback
+
+    # 🔁 produto postado entra (ou ganha prioridade) no refresh de preços;
+    # erro, bloqueio e link sem preço não gastam o orçamento do refresh
+    if is_cacheable(result):
+        price_refresh.track(key, adapter.name, final_url, result, app_id, secret)
+    return result
+
+
+async def _scrape(adapter, fetch, final_url, app_id, secret):
+    try:
+        with SCRAPES_IN_FLIGHT.labels(adapter.name).track_inprogress(), span("scrape", adapter.name):
+            result = await fetch(final_url, app_id=app_id, secret=secret)
+    except BlockedPage as e:
+        # 🧱 captcha/WAF: erro próprio, não vai para o cache
+        return blocked_error(e)
+    except CircuitOpenError as e:
+        # 🧯 host com circuit breaker aberto (loja ou API da Shopee)
+        print("🧯", e)
+        return {
+            "error": True,
+            "code": "unavailable",
+            "message": "A loja está fora do ar agora. Tente de novo em alguns minutos.",
+        }
+
+    if result is None:
+        return {
+            "error": True,
+            "message": "Não foi possível obter o produto"
+        }
+
+    # ✍️ legenda IA (cache + lote + prazo); entra no cache do produto junto
+    if aiml_ai.USE_AIML:
+        with span("ai_caption", adapter.name):
+            await aiml_ai.add_ai_caption(result, adapter.name)
+
+    return result
+
+
+# ===============================
+# LOTE (FAN-OUT CONCORRENTE)
+# ===============================
+def singleflight_stats() -> dict:
+    return _inflight.stats()
+
+
+async def _get_product_info_safe(
+    url: str,
+    app_id: str | None,
+    secret: str | None,
+    shopee_bulk=None
+):
+    try:
+        return await get_product_info(
+            url, app_id=app_id, secret=secret, shopee_bulk=shopee_bulk
         )
+    except Exception as e:
+        print("🔥 Erro no item do lote:", url, e)
+        return {
+            "error": True,
+            "message": "Erro interno ao processar produto"
+        }
+
+
+async def _get_product_info_limited(
+    url: str,
+    app_id: str | None,
+    secret: str | None
+):
+    async with _store_semaphore(store_for_url(url)):
+        return await _get_product_info_safe(url, app_id, secret)
+
+
+def _shopee_batch_indexes(urls: list[str], app_id: str | None, secret: str | None) -> set:
+    """
+    Índices que vão no lote GraphQL da Shopee (2+ links com credenciais).
+    """
+    shopee_idx = set()
+    if app_id and secret:
+        shopee_idx = {i for i, url in enumerate(urls) if store_for_url(url) == "shopee"}
+
+    return shopee_idx if len(shopee_idx) >= 2 else set()
+
+
+class ShopeeBulk:
+    """
+    fetch() dos itens Shopee de um lote. Cada item segue o caminho normal
+    (single-flight, cache, legenda, fallback, refresh de preços); só os
+    que precisam ir à API param aqui e saem juntos em GraphQL em lote,
+    assim que todos os itens pendentes chegaram ou após SHOPEE_BULK_WAIT.
+    """
+
+    def __init__(self, app_id: str, secret: str, size: int):
+        self.app_id = app_id
+        self.secret = secret
+        self.pending = size
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+
+    async def fetch(self, url, app_id=None, secret=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((url, future))
+
+        if len(self._queue) >= self.pending:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(SHOPEE_BULK_WAIT, self._flush)
+
+        return await future
+
+    def settled(self):
+        # item do lote terminou (cache, coalescido ou já buscado)
+        self.pending -= 1
+        if self._queue and len(self._queue) >= self.pending:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            shopee_api = get_adapter("shopee").module
+            results = await shopee_api.get_shopee_products_info(
+                [url for url, _ in batch], self.app_id, self.secret
+            )
+        except Exception as e:
+            # mesma exceção para todos: _scrape trata como no fetch avulso
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _batch_jobs(urls: list[str], app_id: str | None, secret: str | None) -> list:
+    """
+    Uma corrotina por link, na ordem de entrada. Os links Shopee do lote
+    compartilham um ShopeeBulk; os demais respeitam o limite da loja.
+    """
+    shopee_idx = _shopee_batch_indexes(urls, app_id, secret)
+    bulk = ShopeeBulk(app_id, secret, len(shopee_idx)) if shopee_idx else None
+
+    async def one(i):
+        if i not in shopee_idx:
+            return await _get_product_info_limited(urls[i], app_id, secret)
+        try:
+            return await _get_product_info_safe(urls[i], app_id, secret, bulk)
+        finally:
+            bulk.settled()
+
+    return [one(i) for i in range(len(urls))]
+
+
+async def get_products_info(
+    urls: list[str],
+    app_id: str | None = None,
+    secret: str | None = None
+) -> list:
+    """
+    Processa vários links em paralelo, respeitando o limite de cada loja.
+    Os resultados voltam na mesma ordem de entrada.
+    Vários links Shopee vão juntos em requests GraphQL em lote.
+    """
+    return list(await asyncio.gather(*_batch_jobs(urls, app_id, secret)))
+
+
+async def iter_products_info(
+    urls: list[str],
+    app_id: str | None = None,
+    secret: str | None = None
+):
+    """
+    Como get_products_info, mas entrega (índice, resultado) assim que
+    cada item fica pronto. Fechar o gerador antes do fim cancela o que
+    ainda estiver pendente.
+    """
+    async def indexed(i, job):
+        return i, await job
 
-    # ===============================
-    # MERCADO LIVRE
-    # ===============================
-    if "mercadolivre" in url_lower or "mercado" in url_lower:
-        return get_ml_product_info(final_url)
+    tasks = [
+        asyncio.ensure_future(indexed(i, job))
+        for i, job in enumerate(_batch_jobs(urls, app_id, secret))
+    ]
 
-    return {
-        "error": True,
-        "message": "Loja não suportada"
-    }
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"🛑 Lote interrompido: {len(pending)} item(ns) cancelado(s)")
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,275 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+from stores import host_label
+
+# ===============================
+# TOKEN BUCKET
+# ===============================
+
+
+class TokenBucket:
+    """
+    rate tokens por segundo, acumulando até burst.
+    acquire() espera (sem bloquear o loop) até ter token disponível.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        while not self.try_acquire(tokens):
+            await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+# ===============================
+# CONCORRÊNCIA ADAPTATIVA (AIMD)
+# ===============================
+class AdaptiveLimiter:
+    """
+    Limite de requests simultâneos que cresce devagar (+1 por "janela"
+    de respostas boas) e cai pela metade quando o host reclama (erro,
+    429/5xx ou latência acima do alvo).
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._decreased_at = 0.0
+        self._waiters = deque()
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # foi acordado e desistiu: passa a vez
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def release(self, latency: float | None = None, overloaded: bool = False):
+        """
+        latency None: request abandonado (cancelado), não ajusta o limite.
+        """
+        self.in_flight -= 1
+
+        if latency is not None:
+            if overloaded or latency > self.latency_target:
+                # no máximo uma redução por alvo de latência: uma rajada
+                # de erros da mesma leva não zera o limite
+                now = time.monotonic()
+                if now - self._decreased_at >= self.latency_target:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._decreased_at = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+        self._wake()
+
+
+# ===============================
+# CIRCUIT BREAKER
+# ===============================
+class CircuitOpenError(Exception):
+    """
+    Host marcado como indisponível: falha na hora, sem request.
+    """
+
+
+class CircuitBreaker:
+    """
+    fechado -> (N falhas seguidas) -> aberto por `cooldown` segundos ->
+    meio-aberto (deixa passar uma sonda) -> fechado se a sonda der certo.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def abandon(self):
+        # sonda cancelada no meio: libera para a próxima tentar
+        self._probing = False
+
+    def record(self, ok: bool):
+        self._probing = False
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+
+
+# ===============================
+# GOVERNADOR POR HOST
+# ===============================
+# Toda ida às lojas passa por aqui (http_client): token bucket, limite
+# adaptativo e circuit breaker, um conjunto por host.
+GOVERNOR_ENABLED = os.getenv("HOST_GOVERNOR", "1") == "1"
+
+HOST_RPS_DEFAULT = float(os.getenv("HOST_RPS_DEFAULT", "20"))
+HOST_RPS = {
+    "www.amazon.com.br": 2,
+    "amzn.to": 2,
+    "www.magazinevoce.com.br": 5,
+    "www.magazineluiza.com.br": 5,
+    "www.mercadolivre.com.br": 10,
+    "open-api.affiliate.shopee.com.br": 10,
+}
+# HOST_RPS="host=rps,host=rps" sobrescreve/complementa a tabela
+HOST_RPS.update(
+    (host.strip(), float(rate))
+    for host, _, rate in (
+        pair.partition("=") for pair in os.getenv("HOST_RPS", "").split(",") if "=" in pair
+    )
+)
+
+HOST_CONCURRENCY_INITIAL = int(os.getenv("HOST_CONCURRENCY_INITIAL", "4"))
+HOST_CONCURRENCY_MAX = int(os.getenv("HOST_CONCURRENCY_MAX", "32"))
+HOST_LATENCY_TARGET = float(os.getenv("HOST_LATENCY_TARGET", "3"))
+HOST_BREAKER_FAILURES = int(os.getenv("HOST_BREAKER_FAILURES", "5"))
+HOST_BREAKER_COOLDOWN = float(os.getenv("HOST_BREAKER_COOLDOWN", "30"))
+
+# Status que indicam "pega leve"
+OVERLOAD_STATUS = {429, 502, 503, 504}
+
+
+class HostGovernor:
+    def __init__(self, host: str):
+        self.host = host
+        rate = HOST_RPS.get(host, HOST_RPS_DEFAULT)
+        self.bucket = TokenBucket(rate, burst=max(1, rate * 2))
+        self.limiter = AdaptiveLimiter(
+            HOST_CONCURRENCY_INITIAL, 1, HOST_CONCURRENCY_MAX, HOST_LATENCY_TARGET
+        )
+        self.breaker = CircuitBreaker(HOST_BREAKER_FAILURES, HOST_BREAKER_COOLDOWN)
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.retries = 0
+
+    async def acquire(self):
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.host} indisponível (circuit breaker aberto)")
+
+        try:
+            await self.bucket.acquire()
+            await self.limiter.acquire()
+        except BaseException:
+            # sonda cancelada na fila (antes do request): libera o
+            # meio-aberto, senão o host fica preso sem nova sonda
+            if probe:
+                self.breaker.abandon()
+            raise
+        self.requests += 1
+
+    def release(self, latency: float, status: int | None = None, failed: bool = False):
+        """
+        status None + failed: erro de transporte (timeout, conexão).
+        """
+        overloaded = failed or status in OVERLOAD_STATUS or (status or 0) >= 500
+        if overloaded:
+            self.failures += 1
+
+        self.breaker.record(not overloaded)
+        self.limiter.release(latency, overloaded)
+
+    def abandon(self):
+        self.breaker.abandon()
+        self.limiter.release()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "rps": self.bucket.rate,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "trips": self.breaker.trips,
+        }
+
+
+_governors: dict[str, HostGovernor] = {}
+
+
+def governor_for(host: str) -> HostGovernor:
+    """
+    Um governador por host conhecido (lojas, serviços, HOST_RPS); links
+    para qualquer outro host dividem o de "outros".
+    """
+    if host not in HOST_RPS:
+        host = host_label(host)
+
+    governor = _governors.get(host)
+    if governor is None:
+        governor = _governors[host] = HostGovernor(host)
+    return governor
+
+
+def governor_stats() -> dict:
+    return {host: governor.stats() for host, governor in _governors.items()}
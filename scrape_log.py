@@ -0,0 +1,201 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+from datetime import datetime, timezone
+
+from stores import store_for_url
+from prices import parse_price
+
+# ===============================
+# REGISTRO DE SCRAPES NO FIRESTORE (WRITE-BEHIND)
+# ===============================
+# O /scrape não espera o Firestore: o resultado entra numa fila em
+# memória (limitada) e um worker grava em WriteBatch de até 500 docs,
+# quando o lote enche ou a cada SCRAPE_LOG_INTERVAL segundos. Falha de
+# commit tenta de novo com backoff (ids fixos: regravar é idempotente);
+# no shutdown a fila é esvaziada. Fila cheia: descarta ("drop") ou
+# segura o request até SCRAPE_LOG_BLOCK_TIMEOUT ("block").
+SCRAPE_LOG_ENABLED = os.getenv("SCRAPE_LOG", "0") == "1"
+SCRAPE_LOG_COLLECTION = os.getenv("SCRAPE_LOG_COLLECTION", "scrapes")
+SCRAPE_LOG_QUEUE = int(os.getenv("SCRAPE_LOG_QUEUE", "10000"))
+# Limite do Firestore: 500 escritas por WriteBatch
+SCRAPE_LOG_BATCH = min(500, int(os.getenv("SCRAPE_LOG_BATCH", "500")))
+SCRAPE_LOG_INTERVAL = float(os.getenv("SCRAPE_LOG_INTERVAL", "2"))
+SCRAPE_LOG_RETRIES = int(os.getenv("SCRAPE_LOG_RETRIES", "5"))
+SCRAPE_LOG_BACKOFF = float(os.getenv("SCRAPE_LOG_BACKOFF", "0.5"))
+SCRAPE_LOG_BACKOFF_MAX = float(os.getenv("SCRAPE_LOG_BACKOFF_MAX", "30"))
+SCRAPE_LOG_WHEN_FULL = os.getenv("SCRAPE_LOG_WHEN_FULL", "drop")
+SCRAPE_LOG_BLOCK_TIMEOUT = float(os.getenv("SCRAPE_LOG_BLOCK_TIMEOUT", "0.5"))
+SCRAPE_LOG_SHUTDOWN_TIMEOUT = float(os.getenv("SCRAPE_LOG_SHUTDOWN_TIMEOUT", "15"))
+
+_STOP = object()
+
+
+def scrape_doc(uid: str | None, url: str, result) -> dict:
+    """
+    Documento do dashboard: só os campos úteis, não o resultado inteiro.
+    """
+    result = result if isinstance(result, dict) else {}
+    price = result.get("price") or result.get("price_pix")
+    return {
+        "uid": uid,
+        "url": url,
+        "store": store_for_url(url),
+        "title": result.get("title") or result.get("name"),
+        "price": price,
+        "price_cents": parse_price(price),
+        "image": result.get("image"),
+        "error": bool(result.get("error")) or not result,
+        "code": result.get("code"),
+        "stale": bool(result.get("stale")),
+        "scraped_at": datetime.now(timezone.utc),
+    }
+
+
+class ScrapeLog:
+    def __init__(self, get_db, collection: str, maxsize: int, batch_size: int, interval: float):
+        """
+        get_db: função que devolve o client do Firestore (carregado sob demanda).
+        """
+        self._get_db = get_db
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = asyncio.Queue(maxsize)
+        self._worker = None
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.failed = 0
+
+    # -------------------
+    # ENTRADA
+    # -------------------
+    async def record(self, uid, url, result):
+        if self._worker is None:
+            return
+
+        item = (uuid.uuid4().hex, scrape_doc(uid, url, result))
+        try:
+            if SCRAPE_LOG_WHEN_FULL == "block":
+                # back-pressure: o request espera vaga, mas não para sempre
+                await asyncio.wait_for(self._queue.put(item), SCRAPE_LOG_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(item)
+            self.queued += 1
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"⚠️ Fila do registro de scrapes cheia: {self.dropped} descartado(s)")
+
+    # -------------------
+    # WORKER
+    # -------------------
+    def _commit(self, items):
+        db = self._get_db()
+        collection = db.collection(self.collection)
+        batch = db.batch()
+        for doc_id, data in items:
+            batch.set(collection.document(doc_id), data)
+        batch.commit()
+
+    async def _commit_with_retry(self, items):
+        for attempt in range(SCRAPE_LOG_RETRIES + 1):
+            try:
+                # client do Firestore é bloqueante: fora do event loop
+                await asyncio.to_thread(self._commit, items)
+                self.batches += 1
+                self.written += len(items)
+                return
+            except Exception as e:
+                if attempt == SCRAPE_LOG_RETRIES:
+                    self.failed += len(items)
+                    print(f"🔥 Registro de scrapes: lote de {len(items)} perdido:", e)
+                    return
+                self.retries += 1
+                delay = min(SCRAPE_LOG_BACKOFF_MAX, SCRAPE_LOG_BACKOFF * 2 ** attempt)
+                print(f"⚠️ Erro ao gravar scrapes (tentativa {attempt + 1}):", e)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    async def _next_batch(self) -> tuple[list, bool]:
+        """
+        Espera o primeiro item e junta mais até encher o lote ou vencer
+        o intervalo. Retorna (itens, parar).
+        """
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        items = [first]
+        deadline = time.monotonic() + self.interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+
+        return items, False
+
+    async def _run(self):
+        while True:
+            items, stop = await self._next_batch()
+            if items:
+                await self._commit_with_retry(items)
+            if stop:
+                break
+
+        # shutdown: o que sobrou na fila vai em lotes cheios, sem esperar
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            await self._commit_with_retry(leftover[start:start + self.batch_size])
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            print(f"🗂️ Registro de scrapes no Firestore ativo ({self.collection})")
+
+    async def stop(self):
+        """
+        Flush: grava o que está na fila (até SCRAPE_LOG_SHUTDOWN_TIMEOUT).
+        """
+        worker, self._worker = self._worker, None
+        if worker is None:
+            return
+
+        async def drain():
+            # marcador de parada no fim da fila (cheia: espera o worker abrir vaga)
+            await self._queue.put(_STOP)
+            await worker
+
+        try:
+            await asyncio.wait_for(drain(), SCRAPE_LOG_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            worker.cancel()
+            self.failed += self._queue.qsize()
+            print(f"⚠️ Registro de scrapes: {self._queue.qsize()} doc(s) não gravado(s) no shutdown")
+
+    def stats(self) -> dict:
+        return {
+            "running": self._worker is not None,
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -1,34 +1,34 @@
+import os
 import re
 import time
+import asyncio
 import json
 import hashlib
-import requests
 
-API_URL = "https://open-api.affiliate.shopee.com.br/graphql"
+import http_client
+from metrics import span
+from prices import format_price
+from url_resolver import expand_url
+from aiml_ai import start_caption
+from ratelimit import TokenBucket, CircuitOpenError
+
+API_URL = os.getenv(
+    "SHOPEE_API_URL",
+    "https://open-api.affiliate.shopee.com.br/graphql"
+)
 
 
 # ===============================
 # RESOLVE LINK CURTO SHOPEE
 # ===============================
-def resolve_shopee_url(url: str) -> str:
-    try:
-        # HEAD é mais rápido, mas alguns links exigem GET
-        response = requests.get(
-            url,
-            allow_redirects=True,
-            timeout=10,
-            headers={"User-Agent": "Mozilla/5.0"}
-        )
-        return response.url
-    except Exception as e:
-        print("Erro ao resolver link curto:", e)
-        return url
+async def resolve_shopee_url(url: str) -> str:
+    return await expand_url(url)
 
 
 # ===============================
 # EXTRACT ITEM ID
 # ===============================
-def extract_item_id(product_url: str):
+async def extract_item_id(product_url: str):
     # Se for link curto da Shopee, resolve primeiro
     SHOPEE_SHORT_DOMAINS = [
         "s.shopee.com.br",
@@ -38,7 +38,7 @@ def extract_item_id(product_url: str):
     ]
 
     if any(domain in product_url for domain in SHOPEE_SHORT_DOMAINS):
-        product_url = resolve_shopee_url(product_url)
+        product_url = await resolve_shopee_url(product_url)
 
     match = re.search(r'-i\.(\d+)\.(\d+)', product_url)
     if match:
@@ -60,44 +60,42 @@ def generate_signature(app_id, secret, payload, timestamp):
 
 
 # ===============================
-# FORMAT PRICE
+# GRAPHQL
 # ===============================
-def format_price(value):
-    try:
-        valor_float = float(value)
-        return f"R$ {valor_float:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return None
-
+# Documentos fixos: valores entram como variables (nada de interpolar
+# URL/ID na query).
+SHORTLINK_MUTATION = """
+mutation GenerateShortLink($originUrl: String!, $subIds: [String]) {
+    generateShortLink(input: {originUrl: $originUrl, subIds: $subIds}) {
+        shortLink
+    }
+}
+"""
 
-# ===============================
-# MAIN FUNCTION
-# ===============================
-def get_shopee_product_info(product_url, app_id, secret):
-    item_id = extract_item_id(product_url)
+PRODUCT_QUERY = """
+query ProductOffer($itemId: Int64) {
+    productOfferV2(itemId: $itemId) {
+        nodes {
+            productName
+            price
+            imageUrl
+        }
+    }
+}
+"""
 
-    if not item_id:
-        return {"error": "Produto inválido ou link não reconhecido"}
 
-    # ===============================
-    # GERAR LINK AFILIADO
-    # ===============================
+async def graphql_request(app_id, secret, query, variables):
+    """
+    POST assinado na Affiliate API. A assinatura cobre o payload exato
+    enviado, então o JSON é serializado uma única vez.
+    """
     timestamp = int(time.time())
 
-    payload_shortlink = {
-        "query": f"""
-        mutation {{
-            generateShortLink(input: {{
-                originUrl: "{product_url}",
-                subIds: ["s1"]
-            }}) {{
-                shortLink
-            }}
-        }}
-        """
-    }
-
-    payload_json = json.dumps(payload_shortlink, separators=(",", ":"))
+    payload_json = json.dumps(
+        {"query": query, "variables": variables},
+        separators=(",", ":")
+    )
     signature = generate_signature(app_id, secret, payload_json, timestamp)
 
     headers = {
@@ -109,48 +107,55 @@ def get_shopee_product_info(product_url, app_id, secret):
         ),
     }
 
-    res = requests.post(API_URL, data=payload_json, headers=headers, timeout=15)
-    data = res.json()
+    res = await http_client.post(API_URL, content=payload_json, headers=headers, timeout=15)
+    return res.json().get("data") or {}
 
-    short_link = data.get("data", {}).get("generateShortLink", {}).get("shortLink")
-    if not short_link:
-        return {"error": "Erro ao gerar link afiliado"}
 
-    # ===============================
-    # PRODUTO
-    # ===============================
-    timestamp = int(time.time())
+# ===============================
+# MAIN FUNCTION
+# ===============================
+def _start_caption(nodes):
+    # legenda IA sai assim que o produto chega, junto com o link afiliado
+    if nodes:
+        start_caption(nodes[0].get("productName"), format_price(nodes[0].get("price")), "Shopee")
 
-    payload_product = {
-        "query": f"""
-        query {{
-            productOfferV2(itemId:{item_id}) {{
-                nodes {{
-                    productName
-                    price
-                    imageUrl
-                }}
-            }}
-        }}
-        """
-    }
 
-    payload_json_product = json.dumps(payload_product, separators=(",", ":"))
-    signature_product = generate_signature(app_id, secret, payload_json_product, timestamp)
+async def _product_query(app_id, secret, query, variables, budgeted=False):
+    request = _budgeted_request if budgeted else graphql_request
+    info = await request(app_id, secret, query, variables)
+    for value in info.values():
+        _start_caption((value or {}).get("nodes"))
+    return info
 
-    headers_product = {
-        "Content-Type": "application/json",
-        "Authorization": (
-            f"SHA256 Credential={app_id},"
-            f"Timestamp={timestamp},"
-            f"Signature={signature_product}"
-        ),
-    }
 
-    res2 = requests.post(API_URL, data=payload_json_product, headers=headers_product, timeout=15)
-    info = res2.json()
+async def get_shopee_product_info(product_url, app_id, secret):
+    with span("resolve", "shopee"):
+        item_id = await extract_item_id(product_url)
+
+    if not item_id:
+        return {"error": "Produto inválido ou link não reconhecido"}
+
+    # ===============================
+    # LINK AFILIADO + PRODUTO
+    # ===============================
+    # mutation e query não podem ir na mesma operação GraphQL: as duas
+    # chamadas saem juntas e compartilham a conexão HTTP/2 do pool.
+    with span("graphql", "shopee"):
+        data, info = await asyncio.gather(
+            graphql_request(app_id, secret, SHORTLINK_MUTATION, {
+                "originUrl": product_url,
+                "subIds": ["s1"],
+            }),
+            _product_query(app_id, secret, PRODUCT_QUERY, {
+                "itemId": int(item_id),
+            }),
+        )
 
-    nodes = info.get("data", {}).get("productOfferV2", {}).get("nodes", [])
+    short_link = (data.get("generateShortLink") or {}).get("shortLink")
+    if not short_link:
+        return {"error": "Erro ao gerar link afiliado"}
+
+    nodes = (info.get("productOfferV2") or {}).get("nodes") or []
     if not nodes:
         return {"error": "Produto não encontrado"}
 
@@ -162,3 +167,116 @@ def get_shopee_product_info(product_url, app_id, secret):
         "image": node.get("imageUrl"),
         "url": short_link,
     }
+
+
+# ===============================
+# LOTE (VÁRIOS PRODUTOS POR REQUEST)
+# ===============================
+# Cada chunk vira 2 requests assinados (1 mutation com N aliases de
+# generateShortLink + 1 query com N aliases de productOfferV2), dentro
+# de um orçamento de requests/segundo da Affiliate API.
+SHOPEE_BATCH_SIZE = int(os.getenv("SHOPEE_BATCH_SIZE", "20"))
+
+_graphql_budget = TokenBucket(
+    rate=float(os.getenv("SHOPEE_API_RPS", "5")),
+    burst=float(os.getenv("SHOPEE_API_BURST", "10")),
+)
+
+PRODUCT_FIELDS = """
+        nodes {
+            productName
+            price
+            imageUrl
+        }
+"""
+
+
+def _build_batch_documents(chunk):
+    """
+    chunk: lista de (url, item_id). Retorna (mutation, vars, query, vars).
+    """
+    link_args = ", ".join(f"$u{i}: String!" for i in range(len(chunk)))
+    link_fields = "\n".join(
+        f"    l{i}: generateShortLink(input: {{originUrl: $u{i}, subIds: $subIds}}) {{ shortLink }}"
+        for i in range(len(chunk))
+    )
+    mutation = f"mutation BatchShortLinks($subIds: [String], {link_args}) {{\n{link_fields}\n}}"
+    mutation_vars = {"subIds": ["s1"]}
+    mutation_vars.update({f"u{i}": url for i, (url, _) in enumerate(chunk)})
+
+    product_args = ", ".join(f"$i{i}: Int64" for i in range(len(chunk)))
+    product_fields = "\n".join(
+        f"    p{i}: productOfferV2(itemId: $i{i}) {{{PRODUCT_FIELDS}    }}"
+        for i in range(len(chunk))
+    )
+    query = f"query BatchProducts({product_args}) {{\n{product_fields}\n}}"
+    query_vars = {f"i{i}": int(item_id) for i, (_, item_id) in enumerate(chunk)}
+
+    return mutation, mutation_vars, query, query_vars
+
+
+async def _budgeted_request(app_id, secret, query, variables):
+    with span("rate_limit", "shopee"):
+        await _graphql_budget.acquire()
+    return await graphql_request(app_id, secret, query, variables)
+
+
+async def _fetch_chunk(chunk, app_id, secret):
+    mutation, mutation_vars, query, query_vars = _build_batch_documents(chunk)
+
+    try:
+        with span("graphql_batch", "shopee"):
+            links, products = await asyncio.gather(
+                _budgeted_request(app_id, secret, mutation, mutation_vars),
+                _product_query(app_id, secret, query, query_vars, budgeted=True),
+            )
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print("❌ Erro no lote Shopee:", e)
+        return [{"error": "Erro ao consultar API Shopee"} for _ in chunk]
+
+    results = []
+    for i in range(len(chunk)):
+        short_link = (links.get(f"l{i}") or {}).get("shortLink")
+        nodes = (products.get(f"p{i}") or {}).get("nodes") or []
+
+        if not short_link:
+            results.append({"error": "Erro ao gerar link afiliado"})
+        elif not nodes:
+            results.append({"error": "Produto não encontrado"})
+        else:
+            node = nodes[0]
+            results.append({
+                "title": node.get("productName"),
+                "price": format_price(node.get("price")),
+                "image": node.get("imageUrl"),
+                "url": short_link,
+            })
+
+    return results
+
+
+async def get_shopee_products_info(urls, app_id, secret, chunk_size=None):
+    """
+    Versão em lote do get_shopee_product_info.
+    Retorna uma lista na mesma ordem de urls.
+    """
+    chunk_size = chunk_size or SHOPEE_BATCH_SIZE
+    with span("resolve", "shopee"):
+        item_ids = await asyncio.gather(*(extract_item_id(url) for url in urls))
+
+    results = [{"error": "Produto inválido ou link não reconhecido"} for _ in urls]
+    valid = [(i, url, item_id) for i, (url, item_id) in enumerate(zip(urls, item_ids)) if item_id]
+
+    chunks = [valid[n:n + chunk_size] for n in range(0, len(valid), chunk_size)]
+    chunk_results = await asyncio.gather(*(
+        _fetch_chunk([(url, item_id) for _, url, item_id in chunk], app_id, secret)
+        for chunk in chunks
+    ))
+
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        for (i, _, _), result in zip(chunk, chunk_result):
+            results[i] = result
+
+    return results
@@ -0,0 +1,77 @@
+import asyncio
+from urllib.parse import urlsplit, urlunsplit
+
+# ===============================
+# SINGLE-FLIGHT
+# ===============================
+# Chamadas concorrentes com a mesma chave aguardam um único job em
+# andamento e recebem o mesmo resultado (ou a mesma exceção).
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict = {}
+        self._waiters: dict = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key, fn):
+        """
+        fn: função async sem argumentos executada só pelo primeiro chamador.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield: se um chamador desistir (cancelamento), os outros
+        # continuam esperando o mesmo job; se todos desistirem, o job
+        # é cancelado (ex.: cliente do /scrape/stream desconectou)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # sai do mapa já: quem chegar depois começa um job
+                    # novo em vez de herdar o CancelledError deste
+                    self._forget(key, task)
+                    task.cancel()
+                    self.cancelled += 1
+
+        return dict(result) if isinstance(result, dict) else result
+
+    def _forget(self, key, task):
+        # só remove se a chave ainda apontar para este job
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._inflight),
+        }
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normaliza a URL para a chave: espaços, caixa do host e fragmento.
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or "/",
+        parts.query,
+        "",
+    ))
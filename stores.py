@@ -0,0 +1,140 @@
+import os
+import importlib
+from urllib.parse import urlsplit
+
+# ===============================
+# REGISTRO DE LOJAS
+# ===============================
+# hostname -> loja por lookup em dict (subdomínios caem no domínio pai:
+# www., produto., s. ...). Os módulos de cada loja só são importados na
+# primeira vez que a loja é usada.
+
+HOSTS = {
+    # Shopee
+    "shopee.com.br": "shopee",
+    "shp.ee": "shopee",
+    # Mercado Livre
+    "mercadolivre.com.br": "mercadolivre",
+    "mercadolivre.com": "mercadolivre",
+    "mercadolibre.com": "mercadolivre",
+    "meli.la": "mercadolivre",
+    # Magalu
+    "magazineluiza.com.br": "magalu",
+    "magazinevoce.com.br": "magalu",
+    "magalu.com": "magalu",
+    "magalu.com.br": "magalu",
+    # Amazon
+    "amazon.com.br": "amazon",
+    "amazon.com": "amazon",
+    "amzn.to": "amazon",
+    "a.co": "amazon",
+}
+
+
+class StoreAdapter:
+    """
+    Interface comum: await adapter.fetch(url, app_id=None, secret=None).
+    """
+
+    def __init__(self, name, module, function, needs_credentials=False):
+        self.name = name
+        self.module_name = module
+        self.function_name = function
+        self.needs_credentials = needs_credentials
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    async def fetch(self, url, app_id=None, secret=None):
+        fn = getattr(self.module, self.function_name)
+
+        if self.needs_credentials:
+            return await fn(url, app_id, secret)
+        return await fn(url)
+
+
+ADAPTERS = {
+    "shopee": StoreAdapter("shopee", "shopee_api", "get_shopee_product_info", needs_credentials=True),
+    "mercadolivre": StoreAdapter("mercadolivre", "ml_api", "get_ml_product_info"),
+    "magalu": StoreAdapter("magalu", "magalu_api", "get_magalu_product_info"),
+    "amazon": StoreAdapter("amazon", "amazon_api", "get_amazon_product_info"),
+}
+
+
+# Hosts aquecidos pelo /warmup (conexão TLS já aberta no pool)
+WARMUP_URLS = [
+    "https://www.mercadolivre.com.br/",
+    "https://www.magazinevoce.com.br/",
+    "https://www.amazon.com.br/",
+    "https://open-api.affiliate.shopee.com.br/graphql",
+    "https://api.encurtador.dev/",
+]
+
+
+def store_for_url(url: str) -> str | None:
+    try:
+        host = (urlsplit(url.strip()).hostname or "").lower()
+    except ValueError:
+        return None
+
+    while host:
+        store = HOSTS.get(host)
+        if store:
+            return store
+        _, _, host = host.partition(".")
+
+    return None
+
+
+# ===============================
+# HOSTS CONHECIDOS (GOVERNADOR / MÉTRICAS)
+# ===============================
+# Qualquer link de usuário passa pelo expand_url: só hosts das lojas e
+# dos serviços que o app chama ganham governador e label próprios; o
+# resto divide "outros" (nada cresce sem limite por host arbitrário).
+OTHER_HOSTS = "outros"
+
+SERVICE_HOSTS = {
+    "open-api.affiliate.shopee.com.br",
+    "api.encurtador.dev",
+    "api.aimlapi.com",
+}
+# serviços apontados para outro lugar por env (stand-in, proxy)
+SERVICE_HOSTS.update(
+    urlsplit(url).hostname
+    for url in (os.getenv("SHOPEE_API_URL"), os.getenv("AIML_API_URL"))
+    if url and urlsplit(url).hostname
+)
+
+
+def host_label(host: str | None) -> str:
+    """
+    Host da loja/serviço (www. e domínio exatos; outros subdomínios da
+    loja caem no domínio dela) ou OTHER_HOSTS.
+    """
+    host = (host or "").lower()
+    if host in SERVICE_HOSTS or host in HOSTS:
+        return host
+
+    domain = host
+    if domain.startswith("www.") and domain[4:] in HOSTS:
+        return host
+
+    while domain:
+        if domain in HOSTS:
+            return domain
+        _, _, domain = domain.partition(".")
+
+    return OTHER_HOSTS
+
+
+def get_adapter(store: str | None) -> StoreAdapter | None:
+    return ADAPTERS.get(store)
+
+
+def adapter_for_url(url: str) -> StoreAdapter | None:
+    return ADAPTERS.get(store_for_url(url))
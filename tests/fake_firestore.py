@@ -0,0 +1,119 @@
+"""
+Firestore falso, em memória, com só o que o app usa: collection /
+document / get / set / on_snapshot e WriteBatch (limite de 500 escritas).
+fail_commits: quantos commits seguidos devem falhar.
+"""
+import threading
+
+MAX_BATCH_WRITES = 500
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeWatch:
+    def __init__(self, db, path, callback):
+        self._db = db
+        self.path = path
+        self.callback = callback
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+        self._db.watches[self.path].remove(self)
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self):
+        self._db.reads += 1
+        return FakeSnapshot(self, self._db.docs.get(self.path))
+
+    def set(self, data):
+        self._db.write(self.path, data)
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self._db, self.path, callback)
+        self._db.watches.setdefault(self.path, []).append(watch)
+        # como o Firestore: primeira chamada com o estado atual
+        callback([self.get()], [], None)
+        return watch
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self._db, f"{self.path}/{doc_id}")
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append((ref.path, data))
+
+    def commit(self):
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"WriteBatch com {len(self._writes)} escritas (máx. 500)")
+
+        with self._db.lock:
+            self._db.commits += 1
+            if self._db.fail_commits > 0:
+                self._db.fail_commits -= 1
+                raise RuntimeError("503 Service Unavailable")
+            self._db.batch_sizes.append(len(self._writes))
+
+        for path, data in self._writes:
+            self._db.write(path, data)
+
+
+class FakeFirestore:
+    def __init__(self, fail_commits: int = 0):
+        self.docs = {}
+        self.watches = {}
+        self.lock = threading.Lock()
+        self.fail_commits = fail_commits
+        self.commits = 0
+        self.batch_sizes = []
+        self.reads = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def write(self, path, data):
+        with self.lock:
+            self.docs[path] = dict(data)
+        ref = FakeDocument(self, path)
+        for watch in list(self.watches.get(path, [])):
+            watch.callback([FakeSnapshot(ref, data)], [], None)
+
+    def documents(self, collection: str) -> dict:
+        prefix = collection + "/"
+        return {
+            path[len(prefix):]: data
+            for path, data in self.docs.items()
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        }
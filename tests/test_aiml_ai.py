@@ -0,0 +1,49 @@
+import os
+import sys
+import asyncio
+import subprocess
+
+import aiml_ai
+import shopee_api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_use_aiml_without_key_falls_back_to_template():
+    env = {**os.environ, "USE_AIML": "1"}
+    env.pop("AIML_API_KEY", None)
+    code = (
+        "import asyncio, aiml_ai\n"
+        "assert not aiml_ai.USE_AIML\n"
+        "print(asyncio.run(aiml_ai.gerar_legenda_divertida('Fone', 'R$ 10,00', 'Shopee')))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert aiml_ai.legenda_template("Fone", "R$ 10,00", "Shopee") in out
+
+
+def test_shopee_caption_starts_when_product_arrives(monkeypatch):
+    started, order = [], []
+
+    async def graphql_request(app_id, secret, query, variables):
+        if query is shopee_api.SHORTLINK_MUTATION:
+            await asyncio.sleep(0.01)
+            order.append("link")
+            return {"generateShortLink": {"shortLink": "https://s.shopee.com.br/x"}}
+        order.append("produto")
+        return {"productOfferV2": {"nodes": [{"productName": "Fone", "price": "10.5"}]}}
+
+    def start_caption(nome, preco, loja):
+        started.append((nome, preco, loja))
+        order.append("legenda")
+
+    monkeypatch.setattr(shopee_api, "graphql_request", graphql_request)
+    monkeypatch.setattr(shopee_api, "start_caption", start_caption)
+
+    result = asyncio.run(shopee_api.get_shopee_product_info(
+        "https://shopee.com.br/fone-i.123.456", "app", "secret"
+    ))
+    assert started == [("Fone", result["price"], "Shopee")]
+    assert order == ["produto", "legenda", "link"]
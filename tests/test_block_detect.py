@@ -0,0 +1,43 @@
+import pytest
+
+from block_detect import BLOCK_MIN_PAGE_BYTES, BlockedPage, blocked_error, classify
+
+PAGE = b"<html><head><title>Produto</title></head><body>" + b"x" * BLOCK_MIN_PAGE_BYTES
+
+
+@pytest.mark.parametrize("status, length, head, url, reason", [
+    (403, None, PAGE, "", "forbidden"),
+    (429, None, b"", "", "rate_limited"),
+    (200, None, b'<form action="/errors/validateCaptcha">', "", "captcha"),
+    (200, None, b"<title>Robot Check</title>", "", "captcha"),
+    (200, None, b'<div id="px-captcha">', "", "captcha"),
+    (200, None, b"<title>Access Denied</title>", "", "waf"),
+    (200, None, b"_Incapsula_Resource", "", "waf"),
+    (200, None, b"", "https://www.mercadolivre.com.br/gz/account-verification?go=x", "captcha"),
+    (200, 512, b"<html></html>", "", "tiny_page"),
+])
+def test_blocked_pages(status, length, head, url, reason):
+    assert classify(status, length, head, url) == reason
+
+
+@pytest.mark.parametrize("status, length, head", [
+    (200, len(PAGE), PAGE),
+    (200, None, PAGE),  # sem content-length (chunked) não dá para medir
+    (304, 0, b""),      # revalidação: corpo vazio é normal
+    (404, 512, b"<html>nao achei</html>"),
+])
+def test_normal_pages(status, length, head):
+    assert classify(status, length, head, "https://www.amazon.com.br/dp/B0ABCDEFGH") is None
+
+
+def test_marker_after_sniff_window_is_ignored(monkeypatch):
+    import block_detect
+    monkeypatch.setattr(block_detect, "BLOCK_SNIFF_BYTES", 16)
+    assert classify(200, None, b"x" * 32 + b"px-captcha") is None
+
+
+def test_blocked_error_shape():
+    error = blocked_error(BlockedPage("www.amazon.com.br", "captcha"))
+    assert error["error"] is True
+    assert error["code"] == "blocked"
+    assert error["reason"] == "captcha"
@@ -0,0 +1,29 @@
+import bot
+from bot import extract_links
+
+ML = "https://www.mercadolivre.com.br/p/MLB123"
+SHOPEE = "https://s.shopee.com.br/7fBq2Xyz9A"
+
+
+def test_only_supported_store_links_in_message_order():
+    text = f"olha https://exemplo.com/x e {SHOPEE} depois {ML}"
+    assert extract_links(text) == [SHOPEE, ML]
+
+
+def test_repeated_links_are_sent_once():
+    assert extract_links(f"{ML} {SHOPEE} {ML}") == [ML, SHOPEE]
+
+
+def test_trailing_punctuation_is_not_part_of_the_link():
+    text = f"Oferta: {ML}. Também ({SHOPEE}), e {ML}!"
+    assert extract_links(text) == [ML, SHOPEE]
+
+
+def test_link_count_is_capped(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MAX_LINKS_PER_MESSAGE", 3)
+    text = " ".join(f"https://shopee.com.br/p-i.1.{i}" for i in range(10))
+    assert len(extract_links(text)) == 3
+
+
+def test_message_without_links():
+    assert extract_links("bom dia, sem link hoje") == []
@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+
+import http_client
+import page_cache
+import ratelimit
+from page_cache import PageCache
+
+URL = "https://www.mercadolivre.com.br/p/MLB123"
+PAGE = "<html><head><title>Produto</title></head><body>" + "x" * 8000 + "</body></html>"
+VALIDATORS = {"etag": '"v1"'}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), max_bytes=10**7, max_age=3600)
+    monkeypatch.setattr(page_cache, "page_cache", cache)
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "GOVERNOR_ENABLED", False)
+    yield cache
+    cache.close()
+
+
+def title_of(html, doc=None):
+    return {"title": html.split("<title>")[1].split("</title>")[0], "length": len(html)}
+
+
+def test_entry_without_validators_is_not_stored(cache):
+    async def main():
+        await cache.store(URL, "v1", {}, PAGE, title_of(PAGE))
+        return await cache.lookup(URL)
+
+    assert asyncio.run(main()) is None
+
+
+def test_revalidated_reextracts_from_stored_html_on_tag_change(cache):
+    async def main():
+        await cache.store(URL, "v1", VALIDATORS, PAGE, {"title": "antigo"})
+        entry = await cache.lookup(URL)
+        assert await cache.revalidated(entry, "v1", title_of) == {"title": "antigo"}
+
+        fields = await cache.revalidated(entry, "v2", title_of)
+        stored = await cache.lookup(URL)
+        return fields, stored
+
+    fields, stored = asyncio.run(main())
+    assert fields["title"] == "Produto"
+    assert stored.tag == "v2" and stored.fields == fields
+    assert cache.stats()["hits"] == 2
+
+
+def test_entry_without_body_cannot_reextract(cache):
+    async def main():
+        await cache.store(URL, "v1", VALIDATORS, None, {"title": "Produto"})
+        entry = await cache.lookup(URL)
+        assert not entry.has_body()
+        assert await cache.revalidated(entry, "v1", title_of) == {"title": "Produto"}
+        return await cache.revalidated(entry, "v2", title_of)
+
+    assert asyncio.run(main()) is None
+
+
+class TitleStream:
+    """
+    Para de ler assim que o <title> fecha (como o PageStream).
+    """
+
+    def __init__(self, encoding):
+        self.parts = []
+        self.bytes_read = 0
+
+    def feed(self, chunk):
+        self.bytes_read += len(chunk)
+        self.parts.append(chunk.decode())
+        return "</title>" in "".join(self.parts)
+
+    def close(self):
+        return "".join(self.parts), None
+
+
+def serve(requests):
+    async def chunks():
+        for i in range(0, len(PAGE), 1000):
+            yield PAGE[i:i + 1000].encode()
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("if-none-match") == VALIDATORS["etag"]:
+            return httpx.Response(304, headers=VALIDATORS)
+        return httpx.Response(200, headers=VALIDATORS, content=chunks())
+    return handler
+
+
+def fetch(requests, tag, make_stream):
+    async def main():
+        await http_client.startup(transport=httpx.MockTransport(serve(requests)))
+        try:
+            return await http_client.fetch_fields(
+                URL, title_of, store="mercadolivre", tag=tag, make_stream=make_stream
+            )
+        finally:
+            await http_client.shutdown()
+
+    return asyncio.run(main())
+
+
+def test_stream_stopped_early_stores_fields_without_html(cache):
+    requests = []
+    fields = fetch(requests, "v1", TitleStream)
+    assert fields["title"] == "Produto"
+    assert fields["length"] < len(PAGE)
+
+    entry = asyncio.run(cache.lookup(URL))
+    assert entry.fields == fields
+    assert not entry.has_body()
+
+    # mesmo extrator: 304 devolve os campos salvos
+    assert fetch(requests, "v1", TitleStream) == fields
+    assert len(requests) == 2
+
+
+def test_tag_change_without_html_falls_back_to_full_fetch(cache):
+    requests = []
+    fetch(requests, "v1", TitleStream)
+
+    fields = fetch(requests, "v2", None)
+    assert fields == {"title": "Produto", "length": len(PAGE)}
+    # 304 (sem HTML para re-extrair) e depois o GET sem validadores
+    assert [r.headers.get("if-none-match") for r in requests] == [None, '"v1"', None]
+
+    entry = asyncio.run(cache.lookup(URL))
+    assert entry.tag == "v2"
+    assert entry.has_body()
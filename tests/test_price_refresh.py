@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import price_refresh
+from price_refresh import PriceRefresher
+
+KEY = ("mercadolivre", "MLB123")
+URL = "https://www.mercadolivre.com.br/p/MLB123"
+OK = {"title": "Produto", "price": "R$ 10,00"}
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    monkeypatch.setattr(price_refresh, "PRICE_REFRESH_MAX_FAILURES", 3)
+    monkeypatch.setattr(price_refresh, "store_result", lambda key, result: None)
+    return PriceRefresher({"mercadolivre": 1.0})
+
+
+@pytest.mark.parametrize("result", [
+    {"error": True, "code": "blocked", "message": "captcha"},
+    {"error": True, "code": "unavailable", "message": "fora do ar"},
+    {"error": "Produto não encontrado"},
+    {"title": "Sem preço", "price": None},
+    {**OK, "stale": True},
+    None,
+])
+def test_failed_or_stale_results_are_not_tracked(refresher, result):
+    refresher.track(KEY, "mercadolivre", URL, result)
+    assert refresher.stats()["tracked"] == 0
+    assert refresher._heaps["mercadolivre"] == []
+
+
+def test_successful_result_is_tracked(refresher):
+    refresher.track(KEY, "mercadolivre", URL, OK)
+    refresher.track(KEY, "mercadolivre", URL, OK)
+
+    item = refresher._items[KEY]
+    assert item.hits == 2
+    assert item.cents == 1000
+
+
+def test_item_is_dropped_after_consecutive_failures(refresher):
+    refresher.track(KEY, "mercadolivre", URL, OK)
+    item = refresher._items[KEY]
+
+    async def main():
+        await refresher._apply(item, {"error": True, "code": "blocked"})
+        await refresher._apply(item, None)
+        assert KEY in refresher._items
+        due_after_two = item.due
+        await refresher._apply(item, {"error": "Produto não encontrado"})
+        return due_after_two
+
+    due_after_two = asyncio.run(main())
+    assert KEY not in refresher._items
+    assert refresher.stats()["dropped"] == 1
+    assert refresher._pop_due("mercadolivre", due_after_two + 1, limit=10) == []
+
+
+def test_success_resets_failure_count(refresher):
+    refresher.track(KEY, "mercadolivre", URL, OK)
+    item = refresher._items[KEY]
+
+    async def main():
+        await refresher._apply(item, None)
+        await refresher._apply(item, None)
+        await refresher._apply(item, {"title": "Produto", "price": "R$ 9,00"})
+        await refresher._apply(item, None)
+        await refresher._apply(item, None)
+
+    asyncio.run(main())
+    assert KEY in refresher._items
+    assert item.failures == 2
+    assert item.cents == 900
+    assert refresher.stats()["changes"] == 1
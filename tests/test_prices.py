@@ -0,0 +1,65 @@
+import math
+
+import pytest
+
+from prices import (
+    format_brl,
+    format_price,
+    normalize_price,
+    parse_price,
+    parse_prices,
+    tidy_price_text,
+)
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("R$ 1.745,03", 174503),
+    ("1745.03", 174503),
+    ("1.745", 174500),
+    ("1.745.320", 174532000),
+    ("48.9", 4890),
+    ("48,90", 4890),
+    ("R$ 202 , 39", 20239),
+    (79.9, 7990),
+    (12, 1200),
+    ("0,01", 1),
+    (None, None),
+    ("", None),
+    ("grátis", None),
+    (math.inf, None),
+    (math.nan, None),
+])
+def test_parse_price(value, cents):
+    assert parse_price(value) == cents
+
+
+@pytest.mark.parametrize("value, text", [
+    ("1745.03", "1.745,03"),
+    ("1.745,03", "1.745,03"),
+    ("R$ 1.745,03", "1.745,03"),
+    ("1745", "1.745,00"),
+    ("48.9", "48,90"),
+    ("48,90", "48,90"),
+    ("1234567,89", "1.234.567,89"),
+    ("0048,90", "48,90"),
+    ("consulte", "consulte"),
+    (None, None),
+    ("", ""),
+])
+def test_normalize_price(value, text):
+    assert normalize_price(value) == text
+
+
+def test_parse_prices_matches_one_by_one():
+    values = ["R$ 10,00", "10.00", "R$ 10,00", None, "x", 5, "R$ 10,00"]
+    assert parse_prices(values) == [parse_price(v) for v in values]
+    # não hasheável: cai no um a um
+    assert parse_prices([["1"], "2,00"]) == [None, 200]
+
+
+def test_formatters():
+    assert format_brl(174503) == "R$ 1.745,03"
+    assert format_brl(None) is None
+    assert format_price("1745.5") == "R$ 1.745,50"
+    assert format_price(None) is None
+    assert tidy_price_text("R$  202 , 39 ") == "R$ 202,39"
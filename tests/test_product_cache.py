@@ -0,0 +1,48 @@
+import pytest
+
+from product_cache import product_key
+
+ML = "https://www.mercadolivre.com.br/bicicleta/p/MLB53188187"
+AMAZON = "https://www.amazon.com.br/Fone/dp/B0ABCDEFGH"
+
+
+@pytest.mark.parametrize("store, url, key", [
+    ("mercadolivre", ML, ("mercadolivre", "MLB53188187")),
+    ("mercadolivre", "https://produto.mercadolivre.com.br/MLB-123456-x", ("mercadolivre", "MLB123456")),
+    ("shopee", "https://shopee.com.br/fone-i.11.22", ("shopee", "22", "app")),
+    ("shopee", "https://shopee.com.br/product/11/22", ("shopee", "22", "app")),
+    ("magalu", "https://www.magazineluiza.com.br/tv/p/237958700/", ("magalu", "237958700")),
+    ("amazon", AMAZON, ("amazon", "B0ABCDEFGH")),
+    ("amazon", "https://www.amazon.com.br/gp/product/b0abcdefgh", ("amazon", "B0ABCDEFGH")),
+])
+def test_canonical_key(store, url, key):
+    assert product_key(store, url, app_id="app") == key
+
+
+def test_unknown_product_has_no_key():
+    assert product_key("amazon", "https://www.amazon.com.br/s?k=fone") is None
+    assert product_key(None, ML) is None
+
+
+def test_links_differing_only_in_tracking_share_a_key():
+    assert product_key("mercadolivre", ML + "?utm_source=x") == product_key("mercadolivre", ML)
+    assert product_key("amazon", AMAZON + "?ref=abc") == product_key("amazon", AMAZON)
+
+
+def test_affiliates_get_separate_keys():
+    a = product_key("amazon", AMAZON + "?tag=afiliado-a-20")
+    b = product_key("amazon", AMAZON + "?tag=afiliado-b-20")
+    assert a != b
+    assert a != product_key("amazon", AMAZON)
+    # ordem dos parâmetros não importa
+    assert product_key("amazon", AMAZON + "?tag=x&ascsubtag=y") == \
+        product_key("amazon", AMAZON + "?ascsubtag=y&tag=x&ref=z")
+
+    ml_a = product_key("mercadolivre", ML + "?matt_tool=1&matt_word=ana")
+    ml_b = product_key("mercadolivre", ML + "?matt_tool=1&matt_word=bia")
+    assert ml_a != ml_b
+
+
+def test_shopee_key_depends_on_account():
+    url = "https://shopee.com.br/fone-i.11.22"
+    assert product_key("shopee", url, "app1") != product_key("shopee", url, "app2")
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+import ratelimit
+from ratelimit import CircuitBreaker, CircuitOpenError, HostGovernor
+
+
+def tripped_breaker(cooldown=0.0):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=cooldown)
+    breaker.record(False)
+    breaker.record(False)
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = tripped_breaker(cooldown=60)
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = tripped_breaker()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_again():
+    breaker = tripped_breaker()
+    breaker.cooldown = 60
+    breaker.opened_at -= 60
+    assert breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_abandoned_probe_frees_half_open():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def governor_in_half_open(monkeypatch):
+    monkeypatch.setattr(ratelimit, "HOST_BREAKER_FAILURES", 1)
+    monkeypatch.setattr(ratelimit, "HOST_BREAKER_COOLDOWN", 0.0)
+    governor = HostGovernor("loja.test")
+    governor.breaker.record(False)
+    assert governor.breaker.state == "half_open"
+    return governor
+
+
+def test_probe_cancelled_while_waiting_for_token_frees_half_open(monkeypatch):
+    governor = governor_in_half_open(monkeypatch)
+    # sem token: a sonda fica parada no bucket
+    governor.bucket.tokens = 0
+    governor.bucket.rate = 0.1
+
+    async def main():
+        probe = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+        assert not probe.done()
+
+        # enquanto a sonda espera, ninguém mais passa
+        with pytest.raises(CircuitOpenError):
+            await governor.acquire()
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(main())
+    assert governor.breaker.allow()
+
+
+def test_probe_cancelled_while_waiting_for_slot_frees_half_open(monkeypatch):
+    governor = governor_in_half_open(monkeypatch)
+    # sem vaga no limite de concorrência
+    governor.limiter.in_flight = int(governor.limiter.limit)
+
+    async def main():
+        probe = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+        assert not probe.done()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(main())
+    assert governor.breaker.allow()
+
+
+def test_concurrent_acquires_in_half_open_send_one_probe(monkeypatch):
+    governor = governor_in_half_open(monkeypatch)
+
+    async def main():
+        return await asyncio.gather(
+            *(governor.acquire() for _ in range(5)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert sum(result is None for result in results) == 1
+    assert sum(isinstance(result, CircuitOpenError) for result in results) == 4
+    assert governor.rejected == 4
+
+    governor.release(0.01, 200)
+    assert governor.breaker.state == "closed"
+
+
+def test_cancelled_acquire_in_closed_state_keeps_other_probe(monkeypatch):
+    governor = governor_in_half_open(monkeypatch)
+    governor.breaker.record(True)
+    governor.bucket.tokens = 0
+    governor.bucket.rate = 0.1
+
+    async def main():
+        waiting = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+
+        # o host volta a falhar e outra chamada vira a sonda
+        governor.breaker.record(False)
+        assert governor.breaker.allow()
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(main())
+    # quem foi cancelado não era a sonda: não libera a vaga dela
+    assert not governor.breaker.allow()
+
+
+def test_unknown_hosts_share_one_governor(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_governors", {})
+
+    shared = ratelimit.governor_for("blog-qualquer.example")
+    for i in range(50):
+        assert ratelimit.governor_for(f"h{i}.example") is shared
+    assert shared.host == "outros"
+
+    assert ratelimit.governor_for("www.amazon.com.br").host == "www.amazon.com.br"
+    assert ratelimit.governor_for("produto.mercadolivre.com.br").host == "mercadolivre.com.br"
+    assert ratelimit.governor_for("api.encurtador.dev").host == "api.encurtador.dev"
+    assert len(ratelimit._governors) == 4
+
+
+def test_metric_label_is_bounded():
+    import httpx
+    import metrics
+
+    async def count(url):
+        await metrics.count_response(httpx.Response(200, request=httpx.Request("GET", url)))
+
+    before = metrics.UPSTREAM_RESPONSES.labels("outros", "200")._value.get()
+    asyncio.run(count("https://qualquer-coisa.example/x"))
+    asyncio.run(count("https://outra.example/y"))
+    assert metrics.UPSTREAM_RESPONSES.labels("outros", "200")._value.get() == before + 2
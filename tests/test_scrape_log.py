@@ -0,0 +1,182 @@
+import asyncio
+
+import pytest
+
+import scrape_log
+from scrape_log import ScrapeLog
+from fake_firestore import FakeFirestore
+
+RESULT = {"title": "Produto", "price": "R$ 1.745,03", "image": "https://img"}
+URL = "https://www.mercadolivre.com.br/p/MLB123"
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_BACKOFF", 0.001)
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_BACKOFF_MAX", 0.01)
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_WHEN_FULL", "drop")
+
+
+def make_log(db, maxsize=1000, batch_size=500, interval=60.0):
+    return ScrapeLog(lambda: db, "scrapes", maxsize, batch_size, interval)
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condição não aconteceu a tempo")
+        await asyncio.sleep(0.005)
+
+
+def test_full_batch_is_committed_without_waiting_for_interval():
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db, batch_size=3, interval=60)
+        log.start()
+        for _ in range(7):
+            await log.record("uid", URL, RESULT)
+
+        await wait_for(lambda: log.written == 6)
+        assert db.batch_sizes == [3, 3]
+        assert log.stats()["pending"] == 0  # o 7º está no lote em formação
+
+        await log.stop()
+        assert db.batch_sizes == [3, 3, 1]
+
+    asyncio.run(main())
+    docs = db.documents("scrapes")
+    assert len(docs) == 7
+    assert next(iter(docs.values()))["price_cents"] == 174503
+
+
+def test_partial_batch_is_committed_after_interval():
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db, batch_size=500, interval=0.05)
+        log.start()
+        await log.record("uid", URL, RESULT)
+        await log.record("uid", URL, RESULT)
+
+        await wait_for(lambda: log.written == 2)
+        assert db.batch_sizes == [2]
+        await log.stop()
+
+    asyncio.run(main())
+
+
+def test_failed_commit_is_retried():
+    db = FakeFirestore(fail_commits=2)
+
+    async def main():
+        log = make_log(db, interval=0.01)
+        log.start()
+        await log.record("uid", URL, RESULT)
+
+        await wait_for(lambda: log.written == 1)
+        await log.stop()
+        return log.stats()
+
+    stats = asyncio.run(main())
+    assert db.commits == 3
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+    assert len(db.documents("scrapes")) == 1
+
+
+def test_batch_is_counted_as_failed_after_last_retry(monkeypatch):
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_RETRIES", 1)
+    db = FakeFirestore(fail_commits=10)
+
+    async def main():
+        log = make_log(db, interval=0.01)
+        log.start()
+        await log.record("uid", URL, RESULT)
+        await log.record("uid", URL, RESULT)
+        await log.stop()
+        return log.stats()
+
+    stats = asyncio.run(main())
+    assert db.commits == 2
+    assert stats["failed"] == 2
+    assert stats["written"] == 0
+
+
+def test_full_queue_drops_records():
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db, maxsize=2)
+        log.start()
+        # sem await que suspenda: o worker não roda no meio e a fila enche
+        for _ in range(5):
+            await log.record("uid", URL, RESULT)
+        stats = log.stats()
+        await log.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["queued"] == 2
+    assert stats["dropped"] == 3
+    assert len(db.documents("scrapes")) == 2
+
+
+def test_full_queue_blocks_until_worker_makes_room(monkeypatch):
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_WHEN_FULL", "block")
+    monkeypatch.setattr(scrape_log, "SCRAPE_LOG_BLOCK_TIMEOUT", 1.0)
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db, maxsize=2, batch_size=2, interval=0.01)
+        log.start()
+        for _ in range(6):
+            await log.record("uid", URL, RESULT)
+        await log.stop()
+        return log.stats()
+
+    stats = asyncio.run(main())
+    assert stats["dropped"] == 0
+    assert stats["written"] == 6
+
+
+def test_record_is_ignored_when_not_started():
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db)
+        await log.record("uid", URL, RESULT)
+        return log.stats()
+
+    stats = asyncio.run(main())
+    assert stats["queued"] == 0
+    assert db.commits == 0
+
+
+def test_stop_flushes_queue_in_batches_of_at_most_500():
+    db = FakeFirestore()
+
+    async def main():
+        log = make_log(db, maxsize=5000, batch_size=500, interval=60)
+        log.start()
+        for _ in range(1200):
+            await log.record("uid", URL, RESULT)
+        await log.stop()
+        return log.stats()
+
+    stats = asyncio.run(main())
+    assert stats["written"] == 1200
+    assert stats["pending"] == 0
+    assert not stats["running"]
+    assert max(db.batch_sizes) <= 500
+    assert sum(db.batch_sizes) == 1200
+    assert len(db.documents("scrapes")) == 1200
+
+
+def test_error_result_is_recorded_as_error():
+    doc = scrape_log.scrape_doc("uid", URL, {"error": True, "code": "blocked"})
+    assert doc["error"] is True
+    assert doc["code"] == "blocked"
+    assert doc["store"] == "mercadolivre"
+    assert doc["price_cents"] is None
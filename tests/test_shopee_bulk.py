@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import product_info_router
+import shopee_api
+from product_info_router import ShopeeBulk
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def get_shopee_products_info(urls, app_id, secret, chunk_size=None):
+        calls.append(list(urls))
+        await asyncio.sleep(0)
+        return [{"title": url, "price": "R$ 1,00"} for url in urls]
+
+    monkeypatch.setattr(shopee_api, "get_shopee_products_info", get_shopee_products_info)
+    # prazo longo: se o lote esperar o timer, o teste estoura
+    monkeypatch.setattr(product_info_router, "SHOPEE_BULK_WAIT", 30.0)
+    return calls
+
+
+def urls(n):
+    return [f"https://shopee.com.br/p-i.1.{i}" for i in range(n)]
+
+
+def test_batch_flushes_when_all_items_arrive(calls):
+    bulk = ShopeeBulk("app", "secret", 3)
+
+    async def main():
+        results = await asyncio.wait_for(
+            asyncio.gather(*(bulk.fetch(url) for url in urls(3))), 1
+        )
+        await asyncio.sleep(0)
+        return results
+
+    results = asyncio.run(main())
+    assert calls == [urls(3)]
+    assert [r["title"] for r in results] == urls(3)
+    assert not bulk._tasks
+
+
+def test_settled_items_do_not_hold_the_batch(calls):
+    bulk = ShopeeBulk("app", "secret", 3)
+
+    async def main():
+        pending = [asyncio.ensure_future(bulk.fetch(url)) for url in urls(2)]
+        await asyncio.sleep(0)
+        assert calls == []
+        bulk.settled()  # 3º item saiu do cache
+        return await asyncio.wait_for(asyncio.gather(*pending), 1)
+
+    asyncio.run(main())
+    assert calls == [urls(2)]
+
+
+def test_timer_flushes_partial_batch(calls, monkeypatch):
+    monkeypatch.setattr(product_info_router, "SHOPEE_BULK_WAIT", 0.01)
+    bulk = ShopeeBulk("app", "secret", 3)
+
+    result = asyncio.run(asyncio.wait_for(bulk.fetch(urls(1)[0]), 1))
+    assert result["title"] == urls(1)[0]
+    assert calls == [urls(1)]
+
+
+def test_api_error_reaches_every_item(monkeypatch):
+    async def get_shopee_products_info(urls, app_id, secret, chunk_size=None):
+        raise RuntimeError("API fora")
+
+    monkeypatch.setattr(shopee_api, "get_shopee_products_info", get_shopee_products_info)
+    bulk = ShopeeBulk("app", "secret", 2)
+
+    async def main():
+        return await asyncio.gather(*(bulk.fetch(url) for url in urls(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
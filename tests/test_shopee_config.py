@@ -0,0 +1,66 @@
+import pytest
+
+import api
+from fake_firestore import FakeFirestore
+
+
+def config_path(uid):
+    return f"users/{uid}/shopee/config"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeFirestore()
+    monkeypatch.setattr(api, "get_db", lambda: db)
+    monkeypatch.setattr(api, "SHOPEE_CONFIG_WATCH", True)
+    api.stop_shopee_config_watches()
+    api._shopee_configs.clear()
+    yield db
+    api.stop_shopee_config_watches()
+    api._shopee_configs.clear()
+
+
+def test_config_is_read_once_and_cached(db):
+    db.write(config_path("u1"), {"app_id": "app", "secret": "s"})
+
+    assert api.get_user_shopee_config("u1") == ("app", "s")
+    reads = db.reads
+    assert api.get_user_shopee_config("u1") == ("app", "s")
+    assert db.reads == reads
+
+
+def test_missing_config_is_cached_too(db):
+    assert api.get_user_shopee_config("u1") == (None, None)
+    reads = db.reads
+    assert api.get_user_shopee_config("u1") == (None, None)
+    assert db.reads == reads
+
+
+def test_listener_updates_cached_config(db):
+    db.write(config_path("u1"), {"app_id": "app", "secret": "old"})
+    api.get_user_shopee_config("u1")
+
+    db.write(config_path("u1"), {"app_id": "app", "secret": "new"})
+    reads = db.reads
+    assert api.get_user_shopee_config("u1") == ("app", "new")
+    assert db.reads == reads
+
+
+def test_evicted_watch_drops_cached_config(db, monkeypatch):
+    monkeypatch.setattr(api, "SHOPEE_CONFIG_MAX_WATCHES", 2)
+    for uid in ("u1", "u2"):
+        db.write(config_path(uid), {"app_id": uid, "secret": "s"})
+        api.get_user_shopee_config(uid)
+
+    # u1 em uso (hit no cache): quem sai é o u2
+    api.get_user_shopee_config("u1")
+    db.write(config_path("u3"), {"app_id": "u3", "secret": "s"})
+    api.get_user_shopee_config("u3")
+
+    assert list(api._shopee_watches) == ["u1", "u3"]
+    assert not db.watches[config_path("u2")]
+    assert api._shopee_configs.get("u2") is None
+
+    # sem listener, a mudança do u2 só aparece relendo o Firestore
+    db.write(config_path("u2"), {"app_id": "u2", "secret": "new"})
+    assert api.get_user_shopee_config("u2") == ("u2", "new")
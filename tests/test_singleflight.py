@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, canonical_url
+
+
+def test_concurrent_callers_share_one_job():
+    flight = SingleFlight()
+    calls = 0
+
+    async def job():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"title": "Produto"}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", job) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert results == [{"title": "Produto"}] * 10
+    # cada chamador recebe a sua cópia
+    assert len({id(result) for result in results}) == 10
+    assert flight.stats()["coalesced"] == 9
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_error_is_shared_by_all_callers():
+    flight = SingleFlight()
+
+    async def job():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("loja fora")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("k", job) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_one_caller_giving_up_does_not_cancel_the_job():
+    flight = SingleFlight()
+
+    async def job():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", job))
+        second = asyncio.ensure_future(flight.do("k", job))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "ok"
+    assert flight.stats()["cancelled"] == 0
+
+
+def test_last_caller_giving_up_cancels_the_job():
+    flight = SingleFlight()
+    cancelled = False
+
+    async def job():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    async def main():
+        caller = asyncio.ensure_future(flight.do("k", job))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled
+    assert flight.stats()["cancelled"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_caller_arriving_right_after_cancel_gets_a_new_job():
+    flight = SingleFlight()
+    started = 0
+
+    async def job():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return started
+
+    async def main():
+        caller = asyncio.ensure_future(flight.do("k", job))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # o done-callback do job cancelado ainda não rodou: sem tirar a
+        # chave antes do cancel, este chamador herdaria o CancelledError
+        return await flight.do("k", job)
+
+    assert asyncio.run(main()) == 2
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_canonical_url_ignores_case_fragment_and_spaces():
+    assert (
+        canonical_url("  HTTPS://WWW.Amazon.com.br/dp/B012345678?tag=x#reviews ")
+        == "https://www.amazon.com.br/dp/B012345678?tag=x"
+    )
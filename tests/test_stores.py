@@ -0,0 +1,33 @@
+import pytest
+
+from stores import store_for_url
+
+
+@pytest.mark.parametrize("url, store", [
+    ("https://shopee.com.br/fone-i.123.456", "shopee"),
+    ("https://s.shopee.com.br/7fBq2Xyz9A", "shopee"),
+    ("https://shp.ee/abc", "shopee"),
+    ("https://www.mercadolivre.com.br/p/MLB123", "mercadolivre"),
+    ("https://produto.mercadolivre.com.br/MLB-123-x", "mercadolivre"),
+    ("https://mercadolivre.com/sec/2DeMaJG", "mercadolivre"),
+    ("https://meli.la/abc", "mercadolivre"),
+    ("https://www.magazineluiza.com.br/tv/p/237958700/", "magalu"),
+    ("https://www.magazinevoce.com.br/loja/tv/p/237958700/", "magalu"),
+    ("https://amzn.to/3xYzAbc", "amazon"),
+    ("HTTPS://WWW.AMAZON.COM.BR/dp/B0ABCDEFGH", "amazon"),
+    ("  https://a.co/d/xyz  ", "amazon"),
+])
+def test_known_stores(url, store):
+    assert store_for_url(url) == store
+
+
+@pytest.mark.parametrize("url", [
+    "https://exemplo.com/produto",
+    "https://shopee.com.br.golpe.com/x",
+    "https://notamazon.com.br/dp/B0ABCDEFGH",
+    "não é url",
+    "",
+    "http://[::1",
+])
+def test_unknown_or_invalid_urls(url):
+    assert store_for_url(url) is None
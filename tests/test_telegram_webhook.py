@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import bot
+
+
+class FakeApplication:
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "TELEGRAM_WEBHOOK_SECRET", "segredo")
+    monkeypatch.setattr(api, "_telegram", FakeApplication())
+    # sem "with": o lifespan (pool HTTP, bot real) não roda
+    return TestClient(api.app)
+
+
+UPDATE = {"update_id": 1}
+
+
+def test_webhook_rejects_missing_or_wrong_secret(client):
+    assert client.post("/telegram/webhook", json=UPDATE).status_code == 403
+    assert client.post(
+        "/telegram/webhook", json=UPDATE,
+        headers={"X-Telegram-Bot-Api-Secret-Token": "outro"},
+    ).status_code == 403
+    assert api._telegram.update_queue.empty()
+
+
+def test_webhook_accepts_matching_secret(client):
+    response = client.post(
+        "/telegram/webhook", json=UPDATE,
+        headers={"X-Telegram-Bot-Api-Secret-Token": "segredo"},
+    )
+    assert response.status_code == 200
+    assert api._telegram.update_queue.qsize() == 1
+
+
+def test_webhook_mode_needs_a_secret(monkeypatch):
+    monkeypatch.setattr(api, "TELEGRAM_WEBHOOK_URL", "https://exemplo/telegram/webhook")
+    monkeypatch.setattr(api, "TELEGRAM_WEBHOOK_SECRET", None)
+    monkeypatch.setattr(api, "_telegram", None)
+
+    asyncio.run(api.start_telegram_webhook())
+    assert api._telegram is None
+
+
+def test_bot_needs_token(monkeypatch):
+    monkeypatch.setattr(bot, "TELEGRAM_TOKEN", None)
+    with pytest.raises(RuntimeError):
+        bot.build_application()
@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+import pytest
+
+import http_client
+import ratelimit
+import url_resolver
+from url_resolver import expand_url
+
+SHORT = "https://shp.ee/abc"
+FINAL = "https://shopee.com.br/produto-i.123.456"
+
+
+@pytest.fixture(autouse=True)
+def clean(monkeypatch):
+    monkeypatch.setattr(ratelimit, "GOVERNOR_ENABLED", False)
+    url_resolver.clear_resolver_cache()
+    yield
+    url_resolver.clear_resolver_cache()
+
+
+def resolve_with(handler, url=SHORT):
+    async def main():
+        await http_client.startup(transport=httpx.MockTransport(handler))
+        try:
+            return await expand_url(url)
+        finally:
+            await http_client.shutdown()
+
+    return asyncio.run(main())
+
+
+def redirect_to(location, status=200):
+    def handler(request):
+        if request.url.host == "shp.ee":
+            return httpx.Response(302, headers={"location": location})
+        return httpx.Response(status, text="<html>produto</html>")
+    return handler
+
+
+def test_successful_redirect_is_cached():
+    assert resolve_with(redirect_to(FINAL)) == FINAL
+    assert url_resolver._resolved.get(SHORT) == FINAL
+    assert url_resolver._resolved.get(FINAL) == FINAL
+
+
+def test_error_status_is_not_cached():
+    assert resolve_with(lambda request: httpx.Response(503)) == SHORT
+    assert url_resolver._resolved.get(SHORT) is None
+
+    # host voltou: resolve de verdade
+    assert resolve_with(redirect_to(FINAL)) == FINAL
+
+
+def test_redirect_to_captcha_is_not_cached():
+    captcha = "https://www.mercadolivre.com.br/gz/account-verification?go=x"
+    assert resolve_with(redirect_to(captcha)) == captcha
+    assert url_resolver._resolved.get(SHORT) is None
+    assert url_resolver._resolved.get(captcha) is None
+
+
+def test_transport_error_returns_original_url():
+    def handler(request):
+        raise httpx.ConnectError("sem rota")
+
+    assert resolve_with(handler) == SHORT
+    assert url_resolver._resolved.get(SHORT) is None
@@ -1,15 +1,57 @@
-import requests
+import os
+
+import http_client
+from cache import TTLCache
+from block_detect import classify
+
+# ===============================
+# CACHE DE REDIRECIONAMENTOS
+# ===============================
+# link curto -> URL final (e URL final -> ela mesma), para que
+# /sec/, amzn.to, shp.ee etc. só custem um GET na primeira vez.
+_resolved = TTLCache(
+    maxsize=int(os.getenv("RESOLVER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("RESOLVER_CACHE_TTL", str(6 * 3600))),
+)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+}
+
+
+async def expand_url(url: str, timeout: float = 10) -> str:
+    cached = _resolved.get(url)
+    if cached is not None:
+        return cached
 
-def expand_url(url: str) -> str:
     try:
-        resp = requests.get(
+        # Só precisamos dos redirects: fecha a conexão sem baixar o corpo
+        async with http_client.stream(
+            "GET",
             url,
-            allow_redirects=True,
-            timeout=10,
-            headers={
-                "User-Agent": "Mozilla/5.0"
-            }
-        )
-        return resp.url
-    except:
+            follow_redirects=True,
+            timeout=timeout,
+            headers=HEADERS
+        ) as resp:
+            final_url = str(resp.url)
+            ok = resp.is_success and classify(resp.status_code, None, b"", final_url) is None
+    except Exception as e:
+        print("Erro ao resolver URL:", e)
         return url
+
+    if not ok:
+        # 5xx / captcha no fim da cadeia: usa agora, mas não guarda (o
+        # cache prenderia o link nessa resposta pelo TTL inteiro)
+        return final_url
+
+    _resolved.set(url, final_url)
+    _resolved.set(final_url, final_url)
+    return final_url
+
+
+def resolver_stats() -> dict:
+    return _resolved.stats()
+
+
+def clear_resolver_cache():
+    _resolved.clear()